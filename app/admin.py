@@ -1,5 +1,9 @@
 from sqladmin import Admin, ModelView
+from sqlalchemy import BigInteger, case, cast, func, literal_column, select, table
+from sqlalchemy.orm import load_only, object_session, selectinload
+from . import crud
 from .database import get_engine
+from .events import broker, record_change
 from .models import Member, Project
 
 
@@ -15,7 +19,89 @@ def create_admin(app):
     return admin
 
 
-class MemberAdmin(ModelView, model=Member):
+# Below this many rows (per the planner statistics) counts stay exact
+ESTIMATED_COUNT_THRESHOLD = 10_000
+
+
+class LargeTableModelView(ModelView):
+    """Model view whose pages stay fast on tables with many rows.
+
+    List pages only load the listed columns, detail and edit pages load
+    relationships with one extra IN query each instead of a row-multiplying
+    join, and on PostgreSQL the unfiltered page count comes from
+    ``pg_class.reltuples`` once a table is large.
+    """
+
+    def list_query(self, request):
+        columns = [
+            getattr(self.model, name) for name in self._list_prop_names
+            if name not in self._relation_names
+        ]
+        return select(self.model).options(load_only(*columns))
+
+    def count_query(self, request):
+        if get_engine().dialect.name != "postgresql":
+            return super().count_query(request)
+        estimate = (
+            select(cast(literal_column("reltuples"), BigInteger))
+            .select_from(table("pg_class"))
+            .where(literal_column("oid") == func.to_regclass(self.model.__tablename__))
+            .scalar_subquery()
+        )
+        exact = select(func.count()).select_from(self.model).scalar_subquery()
+        # PostgreSQL only runs the exact count when the estimate is small
+        # (or -1, for a table that has never been analyzed)
+        return select(case((estimate >= ESTIMATED_COUNT_THRESHOLD, estimate), else_=exact))
+
+    async def _get_with_relations(self, value, relations):
+        stmt = self._stmt_by_identifier(value)
+        for relation in relations:
+            stmt = stmt.options(selectinload(relation))
+        return await self._get_object_by_pk(stmt)
+
+    async def get_object_for_details(self, value):
+        return await self._get_with_relations(value, self._details_relations)
+
+    async def get_object_for_edit(self, value):
+        return await self._get_with_relations(value, self._form_relations)
+
+
+class BroadcastModelView(LargeTableModelView):
+    """Model view that publishes change events for admin edits and refuses
+    edits based on an outdated version of the row.
+
+    The project listings follow admin edits on their own: the session
+    listeners in ``app.listings`` refresh them from the flushed rows before
+    the admin session commits.
+    """
+
+    # The edit form carries the version it was rendered with
+    form_widget_args = {"version": {"readonly": True}}
+
+    async def on_model_change(self, data, model, is_created, request):
+        # The row is reloaded on submit, so the version is compared here
+        # rather than by the UPDATE; the flush then increments it
+        version = data.pop("version", None)
+        if is_created:
+            return
+        entity = self.model.__name__.lower()
+        if version is not None and int(version) != model.version:
+            raise crud.VersionConflictError(entity, model.id)
+        record_change(object_session(model), entity, "updated", model.id)
+
+    async def after_model_change(self, data, model, is_created, request):
+        if is_created:
+            broker.publish({
+                "entity": self.model.__name__.lower(), "action": "created", "id": model.id,
+            })
+
+    async def on_model_delete(self, model, request):
+        # Runs in the session that deletes the row, so the tombstone and the
+        # touched rows commit with it and the deletion is published on commit
+        crud.record_deletion(object_session(model), model)
+
+
+class MemberAdmin(BroadcastModelView, model=Member):
     """Admin interface for Member model"""
     column_list = [
         Member.id, Member.name, Member.email, Member.role, Member.created_at
@@ -30,7 +116,12 @@ class MemberAdmin(ModelView, model=Member):
         Member.id, Member.name, Member.email, Member.created_at
     ]
     column_filters = [Member.role]
-    
+
+    # Search projects as the user types instead of rendering all of them
+    form_ajax_refs = {
+        "projects": {"fields": ("title",), "order_by": Project.title},
+    }
+
     # Form configuration
     form_excluded_columns = [Member.created_at, Member.updated_at]
     
@@ -40,7 +131,7 @@ class MemberAdmin(ModelView, model=Member):
     icon = "fa-solid fa-user"
 
 
-class ProjectAdmin(ModelView, model=Project):
+class ProjectAdmin(BroadcastModelView, model=Project):
     """Admin interface for Project model"""
     column_list = [
         Project.id, Project.title, Project.status, Project.created_at
@@ -53,7 +144,11 @@ class ProjectAdmin(ModelView, model=Project):
     column_searchable_list = [Project.title, Project.description]
     column_sortable_list = [Project.id, Project.title, Project.created_at]
     column_filters = [Project.status]
-    
+
+    form_ajax_refs = {
+        "members": {"fields": ("name", "email"), "order_by": Member.name},
+    }
+
     # Form configuration
     form_excluded_columns = [Project.created_at, Project.updated_at]
     
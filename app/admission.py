@@ -0,0 +1,119 @@
+"""Admission control and load shedding.
+
+Each route group gets a cap on in-flight requests and a short, bounded
+queue. Requests that find the queue full, or wait in it past the timeout,
+are shed immediately with 503 so latency stays bounded under overload
+instead of requests piling up invisibly in the threadpool. Health checks,
+metrics, the admin interface and the debug endpoints bypass the limits, as
+do the ``/events`` streams, which stay open for as long as the client is
+connected and would otherwise hold a slot each.
+"""
+import asyncio
+from typing import Dict, Optional, Tuple
+
+from app.deadlines import send_unavailable
+from app.metrics import registry
+
+PRIORITY_PATH_PREFIXES = ("/health", "/admin", "/metrics", "/debug", "/events")
+
+# Route groups with a limiter of their own; every other path shares OTHER_GROUP,
+# so unknown paths cannot create limiters and metric series without bound
+ROUTE_GROUPS = ("/members", "/projects", "/changes", "/media")
+OTHER_GROUP = "other"
+
+in_flight_gauge = registry.gauge(
+    "lamfo_admission_in_flight", "Requests currently admitted per route group"
+)
+queue_depth_gauge = registry.gauge(
+    "lamfo_admission_queue_depth", "Requests waiting for admission per route group"
+)
+shed_counter = registry.counter(
+    "lamfo_admission_shed_total", "Requests rejected by admission control"
+)
+
+
+class RouteLimiter:
+    """In-flight cap with a bounded wait queue for one route group"""
+
+    def __init__(self, route: str, max_in_flight: int, max_queue: int,
+                 queue_timeout: float):
+        self.route = route
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+
+    async def acquire(self) -> Optional[str]:
+        """Admit the request, or return the reason it was shed"""
+        if not self._semaphore.locked():
+            await self._semaphore.acquire()
+        elif self.waiting >= self.max_queue:
+            return "queue_full"
+        else:
+            self.waiting += 1
+            queue_depth_gauge.inc(route=self.route)
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                return "queue_timeout"
+            finally:
+                self.waiting -= 1
+                queue_depth_gauge.dec(route=self.route)
+        in_flight_gauge.inc(route=self.route)
+        return None
+
+    def release(self) -> None:
+        in_flight_gauge.dec(route=self.route)
+        self._semaphore.release()
+
+
+class AdmissionControlMiddleware:
+    """ASGI middleware applying a RouteLimiter per route group"""
+
+    def __init__(
+        self,
+        app,
+        max_in_flight: int,
+        max_queue: int,
+        queue_timeout: float,
+        route_limits: Optional[Dict[str, Tuple[int, int]]] = None,
+        priority_prefixes: Tuple[str, ...] = PRIORITY_PATH_PREFIXES,
+        route_groups: Tuple[str, ...] = ROUTE_GROUPS,
+    ):
+        self.app = app
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.route_limits = route_limits or {}
+        self.priority_prefixes = priority_prefixes
+        self.route_groups = frozenset(route_groups)
+        self._limiters: Dict[str, RouteLimiter] = {}
+
+    def _limiter(self, path: str) -> RouteLimiter:
+        route = "/" + path.strip("/").split("/")[0]
+        if route not in self.route_groups:
+            route = OTHER_GROUP
+        limiter = self._limiters.get(route)
+        if limiter is None:
+            max_in_flight, max_queue = self.route_limits.get(
+                route, (self.max_in_flight, self.max_queue)
+            )
+            limiter = RouteLimiter(route, max_in_flight, max_queue, self.queue_timeout)
+            self._limiters[route] = limiter
+        return limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(self.priority_prefixes):
+            await self.app(scope, receive, send)
+            return
+
+        limiter = self._limiter(scope["path"])
+        reason = await limiter.acquire()
+        if reason is not None:
+            shed_counter.inc(route=limiter.route, reason=reason)
+            await send_unavailable(send, "Server is overloaded, retry shortly")
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
@@ -0,0 +1,27 @@
+"""Authentication for operator-only endpoints.
+
+Debug endpoints and image uploads require ``Authorization: Bearer
+<ADMIN_TOKEN>``. When ``ADMIN_TOKEN`` is unset they are disabled and answer
+404, so nothing is exposed by default.
+"""
+import hmac
+from typing import Optional
+
+from fastapi import Header, HTTPException
+
+from app.database import settings
+
+
+def require_admin_token(authorization: Optional[str] = Header(None)) -> None:
+    """FastAPI dependency rejecting requests without the admin token"""
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(
+        token.encode(), settings.ADMIN_TOKEN.encode()
+    ):
+        raise HTTPException(
+            status_code=401,
+            detail="Invalid admin token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
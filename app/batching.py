@@ -0,0 +1,153 @@
+"""Group commit for concurrent writes.
+
+With ``WRITE_BATCH_ENABLED``, create and update requests hand their CRUD
+call to a single writer thread instead of committing on their own. The
+writer gathers calls for up to ``WRITE_BATCH_MAX_WAIT_MS`` or
+``WRITE_BATCH_MAX_ITEMS`` calls, runs each in a SAVEPOINT of one shared
+transaction and commits once, so a burst of edits costs one fsync instead of
+one per request. A failing call only rolls back its own savepoint, and its
+exception is raised in the request that submitted it.
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.database import begin_write, get_session_local, settings
+from app.events import PENDING_EVENTS_KEY
+from app.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Session.info key holding the savepoint of the call being run; CRUD only
+# flushes while it is set and leaves the commit to the batch
+SAVEPOINT_KEY = "write_batch_savepoint"
+
+Write = Callable[[Session], Any]
+Job = Tuple[Write, Future]
+
+batches_counter = registry.counter(
+    "lamfo_write_batches_total", "Transactions committed by the write batcher"
+)
+batched_writes_counter = registry.counter(
+    "lamfo_batched_writes_total", "Writes run by the write batcher"
+)
+
+
+class WriteBatcher:
+    """Runs submitted writes on one thread, committing them in groups"""
+
+    def __init__(self, session_factory: Callable[[], Session], max_items: int = 50,
+                 max_wait: float = 0.005):
+        self.session_factory = session_factory
+        self.max_items = max_items
+        self.max_wait = max_wait
+        self._queue: "queue.Queue[Optional[Job]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, write: Write) -> Any:
+        """Run `write(session)` in the next batch and return its result once committed"""
+        future: Future = Future()
+        self._ensure_started()
+        self._queue.put((write, future))
+        return future.result()
+
+    def stop(self, timeout: float = 5) -> None:
+        """Finish the queued writes and stop the writer thread"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join(timeout)
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="write-batcher", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            self._run_batch(batch)
+
+    def _collect(self) -> Optional[List[Job]]:
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_items:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                job = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if job is None:
+                # Stop once this batch is done
+                self._queue.put(None)
+                break
+            batch.append(job)
+        return batch
+
+    def _run_batch(self, batch: List[Job]) -> None:
+        with self.session_factory() as db:
+            try:
+                begin_write(db)
+                outcomes = [self._run_one(db, write) for write, _ in batch]
+                db.commit()
+            except Exception as e:
+                logger.error(f"Write batch of {len(batch)} failed: {e}")
+                db.rollback()
+                for _, future in batch:
+                    future.set_exception(e)
+                return
+        batches_counter.inc()
+        batched_writes_counter.inc(len(batch))
+        for (_, future), (result, error) in zip(batch, outcomes):
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def _run_one(self, db: Session, write: Write) -> Tuple[Any, Optional[Exception]]:
+        recorded = len(db.info.get(PENDING_EVENTS_KEY, []))
+        savepoint = db.begin_nested()
+        db.info[SAVEPOINT_KEY] = savepoint
+        try:
+            result = write(db)
+            savepoint.commit()
+        except Exception as e:
+            # CRUD may already have rolled it back to recover from an error
+            if db.get_nested_transaction() is savepoint:
+                savepoint.rollback()
+            # Events of a rolled back write must not be published
+            del db.info.get(PENDING_EVENTS_KEY, [])[recorded:]
+            return None, e
+        finally:
+            db.info.pop(SAVEPOINT_KEY, None)
+        return result, None
+
+
+def create_write_batcher() -> Optional[WriteBatcher]:
+    if not settings.WRITE_BATCH_ENABLED:
+        return None
+    return WriteBatcher(
+        lambda: get_session_local()(),
+        max_items=settings.WRITE_BATCH_MAX_ITEMS,
+        max_wait=settings.WRITE_BATCH_MAX_WAIT_MS / 1000,
+    )
+
+
+batcher: Optional[WriteBatcher] = create_write_batcher()
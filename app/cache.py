@@ -0,0 +1,303 @@
+"""Read-through cache for member and project reads.
+
+Entries live in a pluggable backend: an in-process dictionary or a shared
+Redis-protocol server for multi-replica deployments. Every key is prefixed
+with a generation number, so invalidation is a single INCR that makes all
+older entries unreachable. Concurrent misses on the same key are coalesced
+so only one caller hits the database.
+"""
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from app.database import settings
+from app.events import broker
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional encoding
+    msgpack = None
+
+
+# Value encoding
+class JSONCodec:
+    def encode(self, value: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(value)
+        return json.dumps(value, separators=(",", ":")).encode()
+
+    def decode(self, data: bytes) -> Any:
+        if orjson is not None:
+            return orjson.loads(data)
+        return json.loads(data)
+
+
+class MsgpackCodec:
+    def __init__(self):
+        if msgpack is None:
+            raise RuntimeError("msgpack is not installed")
+
+    def encode(self, value: Any) -> bytes:
+        return msgpack.packb(value, use_bin_type=True)
+
+    def decode(self, data: bytes) -> Any:
+        return msgpack.unpackb(data, raw=False)
+
+
+# Backends
+class CacheBackend:
+    """Minimal key-value interface the read-through cache needs"""
+
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes, ttl: int) -> None:
+        raise NotImplementedError
+
+    def incr(self, key: str) -> int:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    @contextmanager
+    def lock(self, key: str, timeout: float) -> Iterator[bool]:
+        """Try to become the only loader of `key` across processes"""
+        yield True
+
+
+class MemoryCache(CacheBackend):
+    """Per-process backend with TTLs and LRU eviction"""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        # Counters are kept apart so LRU eviction can never reset them
+        self._counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            if key in self._counters:
+                return str(self._counters[key]).encode()
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: int) -> None:
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._counters.clear()
+
+
+class RedisCache(CacheBackend):
+    """Shared backend for any Redis-protocol server.
+
+    Use a ``volatile-*`` eviction policy so the generation counter, which
+    has no TTL, is never evicted.
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisCache":
+        import redis
+
+        return cls(redis.Redis.from_url(url))
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(key)
+
+    def set(self, key: str, value: bytes, ttl: int) -> None:
+        self.client.set(key, value, ex=ttl or None)
+
+    def incr(self, key: str) -> int:
+        return self.client.incr(key)
+
+    def clear(self) -> None:
+        self.client.flushdb()
+
+    @contextmanager
+    def lock(self, key: str, timeout: float) -> Iterator[bool]:
+        lock = self.client.lock(f"{key}:lock", timeout=timeout)
+        acquired = lock.acquire(blocking=False)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                try:
+                    lock.release()
+                except Exception:
+                    # The lock expired while loading; another loader took over
+                    pass
+
+
+class ReadThroughCache:
+    """Generation-keyed read-through cache with request coalescing"""
+
+    def __init__(
+        self,
+        backend: CacheBackend,
+        codec=None,
+        ttl: int = 300,
+        namespace: str = "lamfo",
+        lock_timeout: float = 5.0,
+    ):
+        self.backend = backend
+        self.codec = codec or JSONCodec()
+        self.ttl = ttl
+        self.namespace = namespace
+        self.lock_timeout = lock_timeout
+        self._loading: Dict[str, threading.Lock] = {}
+        self._loading_lock = threading.Lock()
+
+    @property
+    def _generation_key(self) -> str:
+        return f"{self.namespace}:generation"
+
+    def _key(self, key: str) -> str:
+        generation = self.backend.get(self._generation_key) or b"0"
+        return f"{self.namespace}:{generation.decode()}:{key}"
+
+    def _lookup(self, full_key: str):
+        data = self.backend.get(full_key)
+        if data is None:
+            return False, None
+        return True, self.codec.decode(data)
+
+    def get_or_load(self, key: str, loader: Callable[[], Any]) -> Any:
+        full_key = self._key(key)
+        found, value = self._lookup(full_key)
+        if found:
+            return value
+
+        # Single-flight within this process: one thread loads, others wait
+        with self._loading_lock:
+            key_lock = self._loading.setdefault(full_key, threading.Lock())
+        with key_lock:
+            try:
+                found, value = self._lookup(full_key)
+                if found:
+                    return value
+                return self._load(full_key, loader)
+            finally:
+                with self._loading_lock:
+                    self._loading.pop(full_key, None)
+
+    def _load(self, full_key: str, loader: Callable[[], Any]) -> Any:
+        # Single-flight across processes when the backend is shared
+        with self.backend.lock(full_key, self.lock_timeout) as acquired:
+            if not acquired:
+                deadline = time.monotonic() + self.lock_timeout
+                while time.monotonic() < deadline:
+                    found, value = self._lookup(full_key)
+                    if found:
+                        return value
+                    time.sleep(0.01)
+            value = loader()
+            self.backend.set(full_key, self.codec.encode(value), self.ttl)
+            return value
+
+    def invalidate(self) -> None:
+        """Make every cached entry unreachable"""
+        try:
+            self.backend.incr(self._generation_key)
+        except Exception as e:
+            logger.error(f"Failed to invalidate cache: {e}")
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+
+def cache_backend_name() -> str:
+    """CACHE_BACKEND, or the safe default for the configured EVENTS_BACKEND"""
+    if settings.CACHE_BACKEND:
+        return settings.CACHE_BACKEND
+    # A per-process cache only hears about writes on other replicas when
+    # events are relayed between them
+    return "memory" if settings.EVENTS_BACKEND == "postgres" else "none"
+
+
+def create_cache() -> Optional[ReadThroughCache]:
+    """Build the cache configured by CACHE_BACKEND, or None if disabled"""
+    backend_name = cache_backend_name()
+    if backend_name == "none":
+        return None
+    if backend_name == "redis":
+        backend = RedisCache.from_url(settings.CACHE_URL)
+    else:
+        if settings.EVENTS_BACKEND != "postgres":
+            logger.warning(
+                "CACHE_BACKEND=memory without EVENTS_BACKEND=postgres: other "
+                "replicas' writes are only seen after CACHE_TTL_SECONDS"
+            )
+        backend = MemoryCache()
+    codec = MsgpackCodec() if settings.CACHE_CODEC == "msgpack" else JSONCodec()
+    return ReadThroughCache(backend, codec=codec, ttl=settings.CACHE_TTL_SECONDS)
+
+
+cache = create_cache()
+
+
+def cached(key: str, loader: Callable[[], Any]) -> Any:
+    """Read `key` through the configured cache"""
+    if cache is None:
+        return loader()
+
+    loader_failed = False
+
+    def tracked_loader():
+        nonlocal loader_failed
+        try:
+            return loader()
+        except Exception:
+            loader_failed = True
+            raise
+
+    try:
+        return cache.get_or_load(key, tracked_loader)
+    except Exception as e:
+        if loader_failed:
+            raise
+        # A broken cache must not take reads down with it
+        logger.error(f"Cache read failed for {key}: {e}")
+        return loader()
+
+
+def _invalidate_on_change(event: Dict[str, Any]) -> None:
+    if cache is not None:
+        cache.invalidate()
+
+
+broker.add_listener(_invalidate_on_change)
@@ -0,0 +1,88 @@
+"""Single-flight coalescing of identical concurrent GET requests.
+
+When many identical reads arrive together (a CDN miss storm), only the
+first one runs the route and checks out a database connection; the others
+wait for it and receive a copy of its response. The copy is only shared once
+the leader has sent its whole response; if the route or the leader's client
+fails first, each follower runs the route itself.
+"""
+import asyncio
+from typing import Dict, List, Optional, Tuple
+
+from app.metrics import registry
+
+# Public read routes whose responses only depend on the path and query
+COALESCED_PATH_PREFIXES = ("/members", "/projects", "/changes")
+
+# Request headers that can change the response and so are part of the key
+VARY_HEADERS = (b"accept-encoding", b"if-none-match")
+
+leaders = registry.counter(
+    "lamfo_coalescing_leaders_total",
+    "GET requests that ran the route on behalf of identical requests",
+)
+coalesced = registry.counter(
+    "lamfo_coalesced_requests_total",
+    "GET requests answered with the response of an identical in-flight request",
+)
+
+
+class CoalescingMiddleware:
+    """ASGI middleware sharing one response among identical GET requests"""
+
+    def __init__(self, app, path_prefixes: Tuple[str, ...] = COALESCED_PATH_PREFIXES):
+        self.app = app
+        self.path_prefixes = path_prefixes
+        self._in_flight: Dict[tuple, asyncio.Future] = {}
+
+    def _key(self, scope) -> Optional[tuple]:
+        if scope["type"] != "http" or scope["method"] != "GET":
+            return None
+        path = scope["path"]
+        if not path.startswith(self.path_prefixes):
+            return None
+        headers = dict(scope["headers"])
+        return (
+            path,
+            scope["query_string"],
+            *(headers.get(name, b"") for name in VARY_HEADERS),
+        )
+
+    async def __call__(self, scope, receive, send):
+        key = self._key(scope)
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+
+        route = "/" + scope["path"].strip("/").split("/")[0]
+        flight = self._in_flight.get(key)
+        if flight is not None:
+            messages = await asyncio.shield(flight)
+            if messages is not None:
+                coalesced.inc(path=route)
+                for message in messages:
+                    await send(message)
+                return
+            # The leader failed; run the request ourselves
+            await self.app(scope, receive, send)
+            return
+
+        flight = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = flight
+        leaders.inc(path=route)
+        messages: List[dict] = []
+        finished = False
+
+        async def capture(message):
+            nonlocal finished
+            await send(message)
+            messages.append(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                finished = True
+
+        try:
+            await self.app(scope, receive, capture)
+        finally:
+            del self._in_flight[key]
+            complete = finished and messages[0].get("status", 500) < 500
+            flight.set_result(messages if complete else None)
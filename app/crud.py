@@ -1,18 +1,220 @@
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from datetime import datetime, timedelta, timezone
+from itertools import chain
+from sqlalchemy import (
+    DateTime, delete, event, func, insert, inspect, literal, or_, select, text, tuple_,
+    type_coerce, union_all, update
+)
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.orm.exc import StaleDataError
+from typing import Iterable, List, NamedTuple, Optional, Set, Tuple
 
-from app.models import Member, Project
+from app.batching import SAVEPOINT_KEY
+from app.database import settings
+from app.events import PENDING_EVENTS_KEY, record_change
+from app.media import remove_after_commit
+from app.models import (
+    ARCHIVED_PROJECT_STATUSES, Image, Member, Project, ProjectListing, Tombstone,
+    member_project_association
+)
 from app.schemas import MemberCreate, MemberUpdate, ProjectCreate, ProjectUpdate
 
+class UnknownMemberIdsError(ValueError):
+    """Raised when a project references member IDs that do not exist"""
+
+    def __init__(self, member_ids: Iterable[int]):
+        self.member_ids = sorted(set(member_ids))
+        super().__init__(f"Unknown member IDs: {self.member_ids}")
+
+
+class VersionConflictError(ValueError):
+    """Raised when an update is based on a version of the row that is no longer current"""
+
+    def __init__(self, entity: str, entity_id: int):
+        self.entity = entity
+        self.entity_id = entity_id
+        super().__init__(f"{entity.capitalize()} {entity_id} was modified by another request")
+
+
+class DuplicateEmailError(ValueError):
+    """Raised when a member is created with an email that is already registered"""
+
+    def __init__(self, email: str):
+        self.email = email
+        super().__init__(f"Email already registered: {email}")
+
+
+# Timestamps come from the database clock: whole seconds on SQLite and
+# transaction start time on PostgreSQL. The change feed re-reads this window
+# before the watermark so a change committed at the boundary is never missed.
+CHANGE_FEED_OVERLAP = timedelta(seconds=1)
+# Changes returned per /changes page by default, and at most
+CHANGE_FEED_PAGE_SIZE = 500
+CHANGE_FEED_MAX_PAGE_SIZE = 5000
+
+
+class ChangeKey(NamedTuple):
+    """Position in the change feed, which is ordered by (changed_at, kind, id)"""
+    changed_at: datetime
+    kind: str  # member, project or tombstone; "" sorts before all of them
+    id: int
+
+
+class ChangePage(NamedTuple):
+    members: List[Member]
+    projects: List[Project]
+    tombstones: List[Tombstone]
+    next_key: Optional[ChangeKey]
+    has_more: bool
+
+
+class ChangeTokenExpiredError(ValueError):
+    """Raised when a change feed position is older than the kept tombstones"""
+
+
+_ENTITY_NAMES = {Member: "member", Project: "project"}
+
+
+def _commit(db: Session) -> None:
+    """Commit, or only flush inside a write batch, which commits for all its writes"""
+    if SAVEPOINT_KEY in db.info:
+        db.flush()
+    else:
+        db.commit()
+
+def _rollback(db: Session) -> None:
+    """Roll back, or only undo the current write when inside a write batch"""
+    savepoint = db.info.get(SAVEPOINT_KEY)
+    if savepoint is None:
+        db.rollback()
+    elif db.get_nested_transaction() is savepoint:
+        savepoint.rollback()
+
+
+def _commit_versioned(db: Session, entity: str, entity_id: int) -> None:
+    """Commit an update whose UPDATE only applies if the row kept its version"""
+    try:
+        _commit(db)
+    except StaleDataError:
+        _rollback(db)
+        raise VersionConflictError(entity, entity_id)
+
+def _check_version(entity: str, db_obj, expected_version: Optional[int]) -> None:
+    if expected_version is not None and db_obj.version != expected_version:
+        raise VersionConflictError(entity, db_obj.id)
+
+
+def _touch(db: Session, model, ids: Iterable[int]) -> None:
+    """Bump updated_at and the version of rows whose relationships changed"""
+    ids = set(ids)
+    if ids:
+        db.execute(
+            update(model).where(model.id.in_(ids))
+            .values(updated_at=func.now(), version=model.version + 1)
+        )
+        pending = db.info.get(PENDING_EVENTS_KEY, [])
+        for entity_id in sorted(ids):
+            change = {"entity": _ENTITY_NAMES[model], "action": "updated", "id": entity_id}
+            if change not in pending:
+                record_change(db, change["entity"], "updated", entity_id)
+
+# Session.info key of the rows whose memberships a flush changed through ORM
+# collections, as in the admin views; CRUD writes the association directly
+_MEMBERSHIP_TOUCH_KEY = "membership_touch"
+
+def _needs_touch(session: Session, obj) -> bool:
+    # A row with column changes gets its own UPDATE, which bumps both already
+    state = inspect(obj)
+    return (
+        state.persistent and obj not in session.deleted
+        and not session.is_modified(obj, include_collections=False)
+    )
+
+@event.listens_for(Session, "before_flush")
+def _collect_membership_changes(session: Session, flush_context, instances) -> None:
+    touch = {Member: set(), Project: set()}
+    for obj in chain(session.new, session.dirty):
+        if not isinstance(obj, (Member, Project)):
+            continue
+        relation = "projects" if isinstance(obj, Member) else "members"
+        history = inspect(obj).attrs[relation].history
+        if not history.has_changes():
+            continue
+        for row in chain([obj], history.added, history.deleted):
+            if _needs_touch(session, row):
+                touch[type(row)].add(row.id)
+    if touch[Member] or touch[Project]:
+        session.info[_MEMBERSHIP_TOUCH_KEY] = touch
+
+@event.listens_for(Session, "after_flush_postexec")
+def _touch_changed_memberships(session: Session, flush_context) -> None:
+    touch = session.info.pop(_MEMBERSHIP_TOUCH_KEY, None)
+    if touch:
+        with session.no_autoflush:
+            for model, ids in touch.items():
+                _touch(session, model, ids)
+
+def _add_tombstone(db: Session, entity_type: str, entity_id: int) -> None:
+    db.add(Tombstone(entity_type=entity_type, entity_id=entity_id))
+
+def record_deletion(db: Session, obj) -> None:
+    """Tombstone a member or project about to be deleted and touch the rows it was linked to.
+
+    Shared by the CRUD deletes and the admin views, so change feed clients
+    and snapshots learn about deletions made through either.
+    """
+    if isinstance(obj, Member):
+        _touch(db, Project, (p.id for p in obj.projects))
+    else:
+        _touch(db, Member, (m.id for m in obj.members))
+    entity = _ENTITY_NAMES[type(obj)]
+    _add_tombstone(db, entity, obj.id)
+    record_change(db, entity, "deleted", obj.id)
+    _delete_images(db, entity, obj.id)
+    # Clients that have not synced for this long must do a full sync anyway
+    db.execute(delete(Tombstone).where(Tombstone.deleted_at < _tombstone_cutoff()))
+
+def _delete_images(db: Session, entity_type: str, entity_id: int) -> None:
+    digests = set(db.scalars(
+        delete(Image)
+        .where(Image.entity_type == entity_type, Image.entity_id == entity_id)
+        .returning(Image.digest)
+        .execution_options(synchronize_session=False)
+    ))
+    if digests:
+        # Files are shared by every upload of the same content
+        still_used = set(db.scalars(select(Image.digest).where(Image.digest.in_(digests))))
+        remove_after_commit(db, digests - still_used)
+
+def _tombstone_cutoff() -> datetime:
+    # Naive UTC, like SQLite's CURRENT_TIMESTAMP
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    return now - timedelta(days=settings.TOMBSTONE_RETENTION_DAYS)
+
+
 # Member CRUD
 def get_member(db: Session, member_id: int) -> Optional[Member]:
-    return db.query(Member).filter(Member.id == member_id).first()
+    return db.query(Member).options(selectinload(Member.projects)).filter(
+        Member.id == member_id
+    ).first()
 
 def get_member_by_email(db: Session, email: str) -> Optional[Member]:
     return db.query(Member).filter(Member.email == email).first()
 
 def get_members(db: Session, skip: int = 0, limit: int = 100) -> List[Member]:
-    return db.query(Member).offset(skip).limit(limit).all()
+    return db.query(Member).options(selectinload(Member.projects)).offset(skip).limit(limit).all()
+
+def _get_by_ids(db: Session, model, relationship, ids: Iterable[int]) -> Tuple[list, List[int]]:
+    """Load rows by ID in one query, in request order, plus the IDs not found"""
+    ids = list(dict.fromkeys(ids))
+    rows = db.scalars(
+        select(model).where(model.id.in_(ids)).options(selectinload(relationship))
+    )
+    found = {row.id: row for row in rows}
+    return [found[i] for i in ids if i in found], [i for i in ids if i not in found]
+
+def get_members_by_ids(db: Session, member_ids: Iterable[int]) -> Tuple[List[Member], List[int]]:
+    return _get_by_ids(db, Member, Member.projects, member_ids)
 
 def create_member(db: Session, member: MemberCreate) -> Member:
     db_member = Member(
@@ -22,16 +224,30 @@ def create_member(db: Session, member: MemberCreate) -> Member:
         bio=member.bio,
         github_username=member.github_username,
         # Convert HttpUrl to string if present
-        linkedin_url=str(member.linkedin_url) if member.linkedin_url else None
+        linkedin_url=str(member.linkedin_url) if member.linkedin_url else None,
+        # A new member has no projects; setting it spares a lazy load later
+        projects=[]
     )
     db.add(db_member)
-    db.commit()
-    db.refresh(db_member)
+    # Insert first and let the unique index arbitrate concurrent creates
+    # instead of checking for the email beforehand
+    try:
+        db.flush()
+    except IntegrityError:
+        _rollback(db)
+        if get_member_by_email(db, member.email) is not None:
+            raise DuplicateEmailError(member.email)
+        raise
+    record_change(db, "member", "created", db_member.id)
+    _commit(db)
     return db_member
 
-def update_member(db: Session, member_id: int, member: MemberUpdate) -> Optional[Member]:
-    db_member = db.query(Member).filter(Member.id == member_id).first()
+def update_member(db: Session, member_id: int, member: MemberUpdate,
+                  expected_version: Optional[int] = None) -> Optional[Member]:
+    """Apply `member`, if the row is still at `expected_version` when one is given"""
+    db_member = get_member(db, member_id)
     if db_member:
+        _check_version("member", db_member, expected_version)
         update_data = member.model_dump(exclude_unset=True)
         # Convert HttpUrl to string if present in update
         if 'linkedin_url' in update_data and update_data['linkedin_url']:
@@ -40,24 +256,87 @@ def update_member(db: Session, member_id: int, member: MemberUpdate) -> Optional
         for field, value in update_data.items():
             setattr(db_member, field, value)
         
-        db.commit()
-        db.refresh(db_member)
+        record_change(db, "member", "updated", member_id)
+        _commit_versioned(db, "member", member_id)
+        # Sessions keep objects loaded after commit; reload the server-side
+        # timestamp and the projects, which the listings refresh resets
+        db.refresh(db_member, ["updated_at", "projects"])
     return db_member
 
 def delete_member(db: Session, member_id: int) -> bool:
     db_member = get_member(db, member_id)
     if db_member:
+        record_deletion(db, db_member)
         db.delete(db_member)
-        db.commit()
+        _commit(db)
         return True
     return False
 
+# Project membership helpers
+def _ensure_members_exist(db: Session, member_ids: Iterable[int]) -> None:
+    member_ids = set(member_ids)
+    if not member_ids:
+        return
+    found = set(db.scalars(select(Member.id).where(Member.id.in_(member_ids))))
+    if found != member_ids:
+        raise UnknownMemberIdsError(member_ids - found)
+
+def _get_project_member_ids(db: Session, project_id: int) -> Set[int]:
+    return set(db.scalars(
+        select(member_project_association.c.member_id).where(
+            member_project_association.c.project_id == project_id
+        )
+    ))
+
+def _add_project_members(db: Session, project_id: int, member_ids: Set[int]) -> None:
+    if member_ids:
+        db.execute(
+            insert(member_project_association),
+            [{"member_id": m, "project_id": project_id} for m in sorted(member_ids)]
+        )
+
+def _remove_project_members(db: Session, project_id: int, member_ids: Set[int]) -> None:
+    if member_ids:
+        db.execute(
+            delete(member_project_association).where(
+                member_project_association.c.project_id == project_id,
+                member_project_association.c.member_id.in_(member_ids)
+            )
+        )
+
+def _expire_memberships(db: Session, db_project: Project, member_ids: Set[int]) -> None:
+    # The association rows were written behind the ORM's back, so drop any
+    # collections already loaded in this session on either side
+    db.expire(db_project, ["members"])
+    for obj in list(db.identity_map.values()):
+        if isinstance(obj, Member) and obj.id in member_ids:
+            db.expire(obj, ["projects"])
+
 # Project CRUD
 def get_project(db: Session, project_id: int) -> Optional[Project]:
-    return db.query(Project).filter(Project.id == project_id).first()
+    return db.query(Project).options(selectinload(Project.members)).filter(
+        Project.id == project_id
+    ).first()
 
 def get_projects(db: Session, skip: int = 0, limit: int = 100) -> List[Project]:
-    return db.query(Project).offset(skip).limit(limit).all()
+    return db.query(Project).options(selectinload(Project.members)).offset(skip).limit(limit).all()
+
+def get_project_listings(db: Session, skip: int = 0, limit: int = 100,
+                         include_archived: bool = False) -> List[str]:
+    """Pre-rendered Project JSON documents, in ID order"""
+    stmt = select(ProjectListing.payload)
+    if not include_archived:
+        # The planner only uses the partial ix_project_listings_hot when the
+        # statuses are inlined like in its predicate, not bound as parameters
+        stmt = stmt.where(ProjectListing.status.not_in([
+            literal(status, literal_execute=True) for status in ARCHIVED_PROJECT_STATUSES
+        ]))
+    return list(db.scalars(
+        stmt.order_by(ProjectListing.project_id).offset(skip).limit(limit)
+    ))
+
+def get_projects_by_ids(db: Session, project_ids: Iterable[int]) -> Tuple[List[Project], List[int]]:
+    return _get_by_ids(db, Project, Project.members, project_ids)
 
 def create_project(db: Session, project: ProjectCreate) -> Project:
     project_data = project.model_dump()
@@ -69,23 +348,32 @@ def create_project(db: Session, project: ProjectCreate) -> Project:
     if 'demo_url' in project_data and project_data['demo_url']:
         project_data['demo_url'] = str(project_data['demo_url'])
     
-    db_project = Project(**project_data)
+    db_project = Project(**project_data, members=[])
     
     # Add members to project
     if member_ids:
         members = db.query(Member).filter(Member.id.in_(member_ids)).all()
+        if len(members) != len(set(member_ids)):
+            raise UnknownMemberIdsError(set(member_ids) - {m.id for m in members})
+        # The flush bumps the members, whose project lists change too
         db_project.members = members
     
     db.add(db_project)
-    db.commit()
-    db.refresh(db_project)
+    db.flush()
+    record_change(db, "project", "created", db_project.id)
+    _commit(db)
     return db_project
 
-def update_project(db: Session, project_id: int, project: ProjectUpdate) -> Optional[Project]:
+def update_project(db: Session, project_id: int, project: ProjectUpdate,
+                   expected_version: Optional[int] = None) -> Optional[Project]:
+    """Apply `project`, if the row is still at `expected_version` when one is given"""
     db_project = get_project(db, project_id)
     if db_project:
+        _check_version("project", db_project, expected_version)
         update_data = project.model_dump(exclude_unset=True)
         member_ids = update_data.pop("member_ids", None)
+        add_member_ids = set(update_data.pop("add_member_ids", None) or [])
+        remove_member_ids = set(update_data.pop("remove_member_ids", None) or [])
         
         # Convert HttpUrl objects to strings if present in update
         if 'github_url' in update_data and update_data['github_url']:
@@ -97,19 +385,151 @@ def update_project(db: Session, project_id: int, project: ProjectUpdate) -> Opti
         for field, value in update_data.items():
             setattr(db_project, field, value)
         
-        # Update members if provided
-        if member_ids is not None:
-            members = db.query(Member).filter(Member.id.in_(member_ids)).all()
-            db_project.members = members
+        # Update members incrementally on the association table instead of
+        # replacing the whole collection through the ORM
+        if member_ids is not None or add_member_ids or remove_member_ids:
+            _ensure_members_exist(db, add_member_ids | set(member_ids or []))
+            current_ids = _get_project_member_ids(db, project_id)
+            if member_ids is not None:
+                target_ids = set(member_ids)
+            else:
+                target_ids = (current_ids | add_member_ids) - remove_member_ids
+            _add_project_members(db, project_id, target_ids - current_ids)
+            _remove_project_members(db, project_id, current_ids - target_ids)
+            if target_ids != current_ids:
+                db_project.updated_at = func.now()
+                _touch(db, Member, target_ids ^ current_ids)
+            _expire_memberships(db, db_project, target_ids ^ current_ids)
         
-        db.commit()
-        db.refresh(db_project)
+        record_change(db, "project", "updated", project_id)
+        _commit_versioned(db, "project", project_id)
+        db.refresh(db_project, ["updated_at", "members"])
     return db_project
 
 def delete_project(db: Session, project_id: int) -> bool:
     db_project = get_project(db, project_id)
     if db_project:
+        record_deletion(db, db_project)
         db.delete(db_project)
-        db.commit()
+        _commit(db)
         return True
     return False
+
+# Images
+def get_images(db: Session, entity_type: str, entity_id: int) -> List[Image]:
+    return db.query(Image).filter(
+        Image.entity_type == entity_type, Image.entity_id == entity_id
+    ).order_by(Image.id).all()
+
+def create_image(db: Session, entity_type: str, entity_id: int, stored) -> Image:
+    """Attach a file saved by the media storage to a member or project"""
+    db_image = Image(
+        entity_type=entity_type,
+        entity_id=entity_id,
+        digest=stored.digest,
+        extension=stored.extension,
+        content_type=stored.content_type,
+        size=stored.size,
+        width=stored.width,
+        height=stored.height,
+    )
+    db.add(db_image)
+    _commit(db)
+    return db_image
+
+# Change feed
+def change_horizon(db: Session) -> Optional[datetime]:
+    """Start of the oldest other transaction still open, on PostgreSQL.
+
+    Rows are stamped with their transaction's start time, so a change that
+    has not committed yet carries a timestamp at or after this one and the
+    feed must not move past it.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return None
+    return db.scalar(text(
+        "SELECT min(xact_start) FROM pg_stat_activity "
+        "WHERE datname = current_database() AND pid <> pg_backend_pid()"
+    ))
+
+def _feed_time(db: Session, value):
+    # SQLite stores timestamps as text, with and without fractional seconds
+    if db.get_bind().dialect.name == "sqlite":
+        return type_coerce(func.datetime(value), DateTime)
+    return value
+
+def get_changes(db: Session, after: Optional[ChangeKey] = None,
+                limit: int = CHANGE_FEED_PAGE_SIZE) -> ChangePage:
+    """Return up to `limit` members, projects and tombstones changed after `after`"""
+    if after is not None:
+        changed_at = after.changed_at
+        cutoff = _tombstone_cutoff()
+        if changed_at.tzinfo is not None:
+            cutoff = cutoff.replace(tzinfo=timezone.utc)
+        if changed_at < cutoff:
+            raise ChangeTokenExpiredError("Change token is older than the kept deletions")
+
+    parts = [
+        select(
+            func.coalesce(Member.updated_at, Member.created_at).label("changed_at"),
+            literal("member").label("kind"), Member.id.label("id"),
+        ),
+        select(
+            func.coalesce(Project.updated_at, Project.created_at),
+            literal("project"), Project.id,
+        ),
+        select(Tombstone.deleted_at, literal("tombstone"), Tombstone.id),
+    ]
+    if after is not None:
+        # Index-friendly prefilter; the exact position is compared below
+        since = after.changed_at - CHANGE_FEED_OVERLAP
+        parts[0] = parts[0].where(or_(Member.created_at >= since, Member.updated_at >= since))
+        parts[1] = parts[1].where(or_(Project.created_at >= since, Project.updated_at >= since))
+        parts[2] = parts[2].where(Tombstone.deleted_at >= since)
+    changes = union_all(*parts).subquery()
+    changed_at = _feed_time(db, changes.c.changed_at)
+    stmt = select(changed_at, changes.c.kind, changes.c.id)
+    if after is not None:
+        stmt = stmt.where(tuple_(changed_at, changes.c.kind, changes.c.id) > tuple_(
+            _feed_time(db, literal(after.changed_at, DateTime)), literal(after.kind), literal(after.id)
+        ))
+    keys = [ChangeKey(*row) for row in db.execute(
+        stmt.order_by(changed_at, changes.c.kind, changes.c.id).limit(limit + 1)
+    )]
+    has_more = len(keys) > limit
+    keys = keys[:limit]
+
+    if has_more:
+        next_key = keys[-1]
+    elif keys:
+        # Caught up: start the next sync a little earlier, for changes that
+        # were stamped before the last one but committed after it
+        next_key = ChangeKey(keys[-1].changed_at - CHANGE_FEED_OVERLAP, "", 0)
+        if after is not None:
+            next_key = max(next_key, after)
+    else:
+        next_key = after
+    horizon = change_horizon(db)
+    if next_key is not None and horizon is not None and next_key.changed_at >= horizon:
+        # An open transaction may still commit changes stamped before this
+        next_key = ChangeKey(horizon - CHANGE_FEED_OVERLAP, "", 0)
+        if after is not None:
+            next_key = max(next_key, after)
+        has_more = False
+
+    def load(model, kind, *options):
+        ids = [key.id for key in keys if key.kind == kind]
+        if not ids:
+            return []
+        rows = {row.id: row for row in db.scalars(
+            select(model).where(model.id.in_(ids)).options(*options)
+        )}
+        return [rows[i] for i in ids if i in rows]
+
+    return ChangePage(
+        members=load(Member, "member", selectinload(Member.projects)),
+        projects=load(Project, "project", selectinload(Project.members)),
+        tombstones=load(Tombstone, "tombstone"),
+        next_key=next_key,
+        has_more=has_more,
+    )
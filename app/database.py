@@ -1,12 +1,12 @@
-from sqlalchemy import create_engine, text
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.schema import CreateColumn
 from pydantic_settings import BaseSettings
 import os
 import logging
 from app.models import Base
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class Settings(BaseSettings):
@@ -15,6 +15,10 @@ class Settings(BaseSettings):
     
     # SQLite settings for testing
     SQLITE_URL: str = os.getenv("SQLITE_URL", "sqlite:///./test.db")
+    SQLITE_BUSY_TIMEOUT_MS: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    # Negative values are KiB, as in PRAGMA cache_size
+    SQLITE_CACHE_SIZE: int = int(os.getenv("SQLITE_CACHE_SIZE", "-20000"))
+    SQLITE_MMAP_SIZE: int = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
     
     # PostgreSQL connection settings
     POSTGRES_USER: str = os.getenv("POSTGRES_USER", "lamfo")
@@ -25,6 +29,72 @@ class Settings(BaseSettings):
     POSTGRES_PORT: str = os.getenv("POSTGRES_PORT", "5432")
     POSTGRES_DB: str = os.getenv("POSTGRES_DB", "lamfo_db")
     
+    # Query and request budgets
+    DB_STATEMENT_TIMEOUT_MS: int = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "5000"))
+    DB_POOL_TIMEOUT_SECONDS: float = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "5"))
+    REQUEST_TIMEOUT_SECONDS: float = float(os.getenv("REQUEST_TIMEOUT_SECONDS", "10"))
+    
+    # Admission control per route group
+    ADMISSION_MAX_IN_FLIGHT: int = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "32"))
+    ADMISSION_MAX_QUEUE: int = int(os.getenv("ADMISSION_MAX_QUEUE", "64"))
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: float = float(
+        os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", "1")
+    )
+    
+    # Token-bucket rate limiting per API key or client IP
+    RATE_LIMIT_ENABLED: bool = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    RATE_LIMIT_CAPACITY: int = int(os.getenv("RATE_LIMIT_CAPACITY", "120"))
+    RATE_LIMIT_PER_SECOND: float = float(os.getenv("RATE_LIMIT_PER_SECOND", "10"))
+    # "memory" (per process) or "redis" (shared through CACHE_URL)
+    RATE_LIMIT_BACKEND: str = os.getenv("RATE_LIMIT_BACKEND", "memory")
+    # Comma-separated API keys given their own bucket; other X-API-Key
+    # values are ignored and the client is limited by IP
+    RATE_LIMIT_API_KEYS: str = os.getenv("RATE_LIMIT_API_KEYS", "")
+    
+    # Bearer token for the /debug endpoints; they are disabled when empty
+    ADMIN_TOKEN: str = os.getenv("ADMIN_TOKEN", "")
+    
+    # Logging: root level, per-logger overrides such as
+    # "app.database=WARNING,sqlalchemy.engine=INFO", and output format
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    LOG_LEVELS: str = os.getenv("LOG_LEVELS", "")
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "json")
+    # Fraction of successful requests written to the access log
+    ACCESS_LOG_SAMPLE_RATE: float = float(os.getenv("ACCESS_LOG_SAMPLE_RATE", "1.0"))
+    
+    # Change event fan-out: "memory" (single process) or "postgres"
+    # (LISTEN/NOTIFY relay between replicas)
+    EVENTS_BACKEND: str = os.getenv("EVENTS_BACKEND", "memory")
+    
+    # Read cache: "memory" (per process), "redis" (shared) or "none". Unset,
+    # it is "memory" only when writes on other replicas reach this one
+    # through EVENTS_BACKEND=postgres, and "none" otherwise
+    CACHE_BACKEND: str = os.getenv("CACHE_BACKEND", "")
+    CACHE_URL: str = os.getenv("CACHE_URL", "redis://localhost:6379/0")
+    CACHE_TTL_SECONDS: int = int(os.getenv("CACHE_TTL_SECONDS", "300"))
+    # Value encoding: "json" (orjson when installed) or "msgpack"
+    CACHE_CODEC: str = os.getenv("CACHE_CODEC", "json")
+    
+    # Uploaded images and their resized variants
+    MEDIA_ROOT: str = os.getenv("MEDIA_ROOT", "./media")
+    MEDIA_MAX_UPLOAD_BYTES: int = int(os.getenv("MEDIA_MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+    IMAGE_WORKERS: int = int(os.getenv("IMAGE_WORKERS", "2"))
+    
+    # Group commit: queue concurrent creates and updates for up to
+    # WRITE_BATCH_MAX_WAIT_MS or WRITE_BATCH_MAX_ITEMS and commit them together
+    WRITE_BATCH_ENABLED: bool = os.getenv("WRITE_BATCH_ENABLED", "false").lower() == "true"
+    WRITE_BATCH_MAX_ITEMS: int = int(os.getenv("WRITE_BATCH_MAX_ITEMS", "50"))
+    WRITE_BATCH_MAX_WAIT_MS: float = float(os.getenv("WRITE_BATCH_MAX_WAIT_MS", "5"))
+    
+    # How long responses to requests with an Idempotency-Key are replayed
+    IDEMPOTENCY_TTL_SECONDS: int = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+    # How long a claimed key waits for its response before a retry may take
+    # it over, e.g. after the replay that claimed it crashed mid-request
+    IDEMPOTENCY_LEASE_SECONDS: int = int(os.getenv("IDEMPOTENCY_LEASE_SECONDS", "60"))
+    
+    # How long deletions are kept for the change feed; older tokens must resync
+    TOMBSTONE_RETENTION_DAYS: int = int(os.getenv("TOMBSTONE_RETENTION_DAYS", "30"))
+    
     # Construct the database URL
     @property
     def database_url(self) -> str:
@@ -46,29 +116,49 @@ engine = None
 SessionLocal = None
 
 
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """Tune every new SQLite connection for concurrent readers and writers"""
+    cursor = dbapi_connection.cursor()
+    # WAL lets readers proceed while a writer commits; NORMAL only fsyncs
+    # at checkpoints, which is still safe against corruption in WAL mode
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA cache_size={settings.SQLITE_CACHE_SIZE}")
+    cursor.execute(f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}")
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+def create_sqlite_engine(url: str):
+    """Create a SQLite engine with the tuned connection profile.
+
+    In-memory databases share a single connection through StaticPool so
+    every session sees the same data.
+    """
+    options = {"connect_args": {"check_same_thread": False}}
+    if url in ("sqlite://", "sqlite:///:memory:"):
+        options["poolclass"] = StaticPool
+    sqlite_engine = create_engine(url, **options)
+    event.listen(sqlite_engine, "connect", _apply_sqlite_pragmas)
+    return sqlite_engine
+
+
 def create_database_engine():
     """Create and return a database engine, with fallback logic"""
     
     if settings.TEST_MODE:
         # SQLite for testing
         logger.info("Using SQLite database for testing")
-        return create_engine(
-            settings.database_url,
-            connect_args={"check_same_thread": False}
-        )
+        return create_sqlite_engine(settings.database_url)
     
     # Try PostgreSQL for production
-    logger.info("Attempting to connect to PostgreSQL...")
-    logger.info(f"Host: {settings.POSTGRES_HOST}")
-    logger.info(f"Port: {settings.POSTGRES_PORT}")
-    logger.info(f"Database: {settings.POSTGRES_DB}")
-    logger.info(f"User: {settings.POSTGRES_USER}")
     db_url_masked = (
         f"postgresql://{settings.POSTGRES_USER}:***@"
         f"{settings.POSTGRES_HOST}:{settings.POSTGRES_PORT}/"
         f"{settings.POSTGRES_DB}"
     )
-    logger.info(f"Database URL: {db_url_masked}")
+    logger.info(f"Connecting to PostgreSQL at {db_url_masked}")
     
     try:
         pg_engine = create_engine(
@@ -77,7 +167,13 @@ def create_database_engine():
             pool_recycle=3600,   # Recycle connections after 1 hour
             pool_size=10,        # Connection pool size
             max_overflow=20,     # Max connections beyond pool_size
-            connect_args={"connect_timeout": 30}  # 30 seconds timeout
+            # Fail fast instead of queueing forever when the pool is exhausted
+            pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+            connect_args={
+                "connect_timeout": 30,  # 30 seconds timeout
+                # Server-side cap on every statement of every session
+                "options": f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"
+            }
         )
         # Only test connection in non-production or when explicitly requested
         env = os.getenv("ENVIRONMENT", "production").lower()
@@ -86,10 +182,8 @@ def create_database_engine():
         )
         
         if env != "production" or test_connection:
-            logger.info("Testing database connection...")
             with pg_engine.connect() as connection:
-                result = connection.execute(text("SELECT 1"))
-                logger.info(f"Connection test result: {result.fetchone()}")
+                connection.execute(text("SELECT 1"))
             logger.info("✅ Successfully connected to PostgreSQL!")
         else:
             logger.info(
@@ -110,10 +204,63 @@ def create_database_engine():
         
         # For development, fall back to SQLite
         logger.warning("Falling back to SQLite database for development")
-        return create_engine(
-            settings.SQLITE_URL,
-            connect_args={"check_same_thread": False}
-        )
+        return create_sqlite_engine(settings.SQLITE_URL)
+
+
+def set_statement_timeout(db, timeout_ms: int) -> None:
+    """Override the statement timeout for the rest of `db`'s transaction.
+
+    Only PostgreSQL supports this; other databases are left unchanged.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text(f"SET LOCAL statement_timeout = {int(timeout_ms)}"))
+
+
+def begin_write(db) -> None:
+    """Start `db`'s transaction as a writer before any savepoint is taken.
+
+    pysqlite only emits BEGIN ahead of the first INSERT, UPDATE or DELETE, so
+    a leading SAVEPOINT would open a transaction of its own that its RELEASE
+    commits. Taking SQLite's write lock up front also keeps the transaction
+    from failing to upgrade a stale read snapshot.
+    """
+    connection = db.connection()
+    if connection.dialect.name == "sqlite":
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+def add_missing_columns(bind) -> None:
+    """Add the model columns that existing tables lack.
+
+    Only columns that are nullable or have a server default can be added to
+    a table with rows; others are logged and left to a manual migration.
+    """
+    inspector = inspect(bind)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            if not column.nullable and column.server_default is None:
+                logger.error(f"Cannot add {table.name}.{column.name} without a default")
+                continue
+            ddl = CreateColumn(column).compile(dialect=bind.dialect)
+            with bind.begin() as connection:
+                connection.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {ddl}")
+            logger.info(f"Added column {table.name}.{column.name}")
+
+
+def create_missing_indexes(bind) -> None:
+    """Create the model indexes that existing tables lack.
+
+    create_all skips tables that already exist, so indexes added to a model
+    later would otherwise never reach a database created before them.
+    """
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind, checkfirst=True)
 
 
 def get_engine():
@@ -124,6 +271,8 @@ def get_engine():
         # Create tables when engine is first created
         try:
             Base.metadata.create_all(bind=engine)
+            add_missing_columns(engine)
+            create_missing_indexes(engine)
             logger.info("Database tables created successfully")
         except Exception as e:
             logger.error(f"Error creating database tables: {e}")
@@ -131,18 +280,40 @@ def get_engine():
     return engine
 
 
+def create_session_factory(bind):
+    """Sessions for request handlers.
+
+    A session only checks out a connection when it first runs a query, and
+    keeps its objects loaded after commit so responses can be serialized
+    without reloading them.
+    """
+    return sessionmaker(
+        autocommit=False,
+        autoflush=False,
+        expire_on_commit=False,
+        bind=bind
+    )
+
+
 def get_session_local():
     """Get the SessionLocal class, creating it if necessary"""
     global SessionLocal
     if SessionLocal is None:
-        SessionLocal = sessionmaker(
-            autocommit=False,
-            autoflush=False,
-            bind=get_engine()
-        )
+        SessionLocal = create_session_factory(get_engine())
     return SessionLocal
 
 
+def release_connection(db: Session) -> None:
+    """Return `db`'s connection to the pool once a handler is done with it.
+
+    Ends the transaction with a commit, which leaves loaded objects usable.
+    Sessions with unflushed changes are left alone so closing the session
+    still rolls them back.
+    """
+    if db.in_transaction() and not (db.new or db.dirty or db.deleted):
+        db.commit()
+
+
 def get_db():
     """Get a database session"""
     SessionLocal = get_session_local()
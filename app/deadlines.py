@@ -0,0 +1,112 @@
+"""Per-request deadlines.
+
+Requests that have not started their response within their budget get a
+503 instead of holding a client (and a pooled connection) indefinitely;
+once the response starts, streaming its body is not timed. A sync route
+keeps running in its worker thread until its current statement finishes,
+which PostgreSQL bounds with ``statement_timeout``, and a queued batched
+write still commits. So only idempotent methods are told to retry with
+``Retry-After``: a retried POST could create the same row twice.
+"""
+import asyncio
+import json
+import logging
+from typing import Dict, Optional, Tuple
+
+from app.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Long-lived or operator routes that must not be cut off
+EXEMPT_PATH_PREFIXES = ("/events", "/admin", "/health", "/debug")
+
+RETRY_AFTER_SECONDS = 1
+
+# Methods that are safe to repeat after a write may have gone through
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+deadlines_exceeded = registry.counter(
+    "lamfo_request_deadlines_exceeded_total",
+    "Requests answered with 503 because they ran past their deadline",
+)
+
+
+async def send_unavailable(send, detail: str, status_code: int = 503,
+                           retry_after: Optional[int] = RETRY_AFTER_SECONDS,
+                           headers: Optional[list] = None) -> None:
+    """Send a small JSON error response on a raw ASGI channel"""
+    body = json.dumps({"detail": detail}).encode()
+    headers = [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(body)).encode()),
+        *(headers or []),
+    ]
+    if retry_after is not None:
+        headers.append((b"retry-after", str(retry_after).encode()))
+    await send({"type": "http.response.start", "status": status_code, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+class DeadlineMiddleware:
+    """ASGI middleware enforcing a time budget on every request"""
+
+    def __init__(
+        self,
+        app,
+        timeout: float,
+        route_timeouts: Optional[Dict[str, float]] = None,
+        exempt_prefixes: Tuple[str, ...] = EXEMPT_PATH_PREFIXES,
+    ):
+        self.app = app
+        self.timeout = timeout
+        self.route_timeouts = route_timeouts or {}
+        self.exempt_prefixes = exempt_prefixes
+
+    def _budget(self, path: str) -> Optional[float]:
+        if path.startswith(self.exempt_prefixes):
+            return None
+        for prefix, timeout in self.route_timeouts.items():
+            if path.startswith(prefix):
+                return timeout
+        return self.timeout
+
+    async def __call__(self, scope, receive, send):
+        budget = self._budget(scope["path"]) if scope["type"] == "http" else None
+        if not budget:
+            await self.app(scope, receive, send)
+            return
+
+        response_started = asyncio.Event()
+
+        async def tracking_send(message):
+            if message["type"] == "http.response.start":
+                response_started.set()
+            await send(message)
+
+        handler = asyncio.ensure_future(self.app(scope, receive, tracking_send))
+        started = asyncio.ensure_future(response_started.wait())
+        try:
+            await asyncio.wait({handler, started}, timeout=budget,
+                               return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            handler.cancel()
+            raise
+        finally:
+            started.cancel()
+
+        if not handler.done() and not response_started.is_set():
+            handler.cancel()
+            try:
+                await handler
+            except asyncio.CancelledError:
+                pass
+            logger.warning(f"Deadline of {budget}s exceeded for {scope['path']}")
+            deadlines_exceeded.inc()
+            if not response_started.is_set():
+                retry_after = (
+                    RETRY_AFTER_SECONDS if scope["method"] in IDEMPOTENT_METHODS else None
+                )
+                await send_unavailable(send, "Request deadline exceeded", retry_after=retry_after)
+            return
+        # The response has started: let the body stream without a deadline
+        await handler
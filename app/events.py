@@ -0,0 +1,191 @@
+"""Change events for members and projects.
+
+CRUD functions record changes on the session and they are published once
+the transaction commits. Events fan out in-process to asyncio subscribers
+(the ``/events`` SSE stream) and to synchronous listeners. With
+``EVENTS_BACKEND=postgres`` they are also relayed through PostgreSQL
+LISTEN/NOTIFY so every replica sees changes made on any other one.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import select
+import threading
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+PENDING_EVENTS_KEY = "pending_events"
+NOTIFY_CHANNEL = "lamfo_events"
+
+
+class Subscription:
+    """A bounded queue of events bound to the subscriber's event loop"""
+
+    def __init__(self, broker: "EventBroker", maxsize: int):
+        self._broker = broker
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+
+    def offer(self, event: Dict[str, Any]) -> None:
+        # Slow consumers lose the oldest events rather than growing forever
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+    async def get(self) -> Dict[str, Any]:
+        return await self.queue.get()
+
+    def close(self) -> None:
+        self._broker.unsubscribe(self)
+
+
+class EventBroker:
+    """Broadcast change events to listeners and subscribers"""
+
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self._subscriptions: set = set()
+        self._listeners: List[Callable[[Dict[str, Any]], None]] = []
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.relay: Optional["PostgresRelay"] = None
+
+    def add_listener(self, listener: Callable[[Dict[str, Any]], None]) -> None:
+        """Call `listener` synchronously for every event, local or remote"""
+        self._listeners.append(listener)
+
+    def subscribe(self) -> Subscription:
+        subscription = Subscription(self, self.queue_size)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, event: Dict[str, Any]) -> None:
+        """Publish an event that originated in this process"""
+        self.dispatch(event)
+        if self.relay is not None:
+            self.relay.notify(event)
+
+    def dispatch(self, event: Dict[str, Any]) -> None:
+        """Deliver an event locally; safe to call from any thread"""
+        event = dict(event, seq=next(self._ids))
+        for listener in self._listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                logger.error(f"Event listener failed: {e}")
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.offer, event)
+            except RuntimeError:
+                # The subscriber's loop is gone
+                self.unsubscribe(subscription)
+
+
+class PostgresRelay:
+    """Relay events between replicas with PostgreSQL LISTEN/NOTIFY"""
+
+    def __init__(self, broker: EventBroker, dsn: str, channel: str = NOTIFY_CHANNEL):
+        self.broker = broker
+        self.dsn = dsn
+        self.channel = channel
+        self.origin = uuid.uuid4().hex
+        self._notify_conn = None
+        self._notify_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _connect(self):
+        import psycopg2
+
+        conn = psycopg2.connect(self.dsn)
+        conn.autocommit = True
+        return conn
+
+    def start(self) -> None:
+        self._thread = threading.Thread(
+            target=self._listen, name="events-listen", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        if self._notify_conn is not None:
+            self._notify_conn.close()
+
+    def notify(self, event: Dict[str, Any]) -> None:
+        payload = json.dumps({"origin": self.origin, "event": event})
+        try:
+            with self._notify_lock:
+                if self._notify_conn is None or self._notify_conn.closed:
+                    self._notify_conn = self._connect()
+                with self._notify_conn.cursor() as cursor:
+                    cursor.execute("SELECT pg_notify(%s, %s)", (self.channel, payload))
+        except Exception as e:
+            logger.error(f"Failed to relay event through PostgreSQL: {e}")
+
+    def _listen(self) -> None:
+        while not self._stop.is_set():
+            try:
+                conn = self._connect()
+                with conn.cursor() as cursor:
+                    cursor.execute(f'LISTEN "{self.channel}"')
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], 1.0) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self._receive(conn.notifies.pop(0).payload)
+                conn.close()
+            except Exception as e:
+                logger.error(f"Event relay connection lost: {e}")
+                self._stop.wait(5)
+
+    def _receive(self, payload: str) -> None:
+        message = json.loads(payload)
+        if message.get("origin") != self.origin:
+            self.broker.dispatch(message["event"])
+
+
+broker = EventBroker()
+
+
+def record_change(db: Session, entity: str, action: str, entity_id: int) -> None:
+    """Queue an event to be published when `db` commits"""
+    db.info.setdefault(PENDING_EVENTS_KEY, []).append(
+        {"entity": entity, "action": action, "id": entity_id}
+    )
+
+
+def format_sse(event: Dict[str, Any]) -> str:
+    """Render an event as a Server-Sent Events message"""
+    return (
+        f"id: {event['seq']}\n"
+        f"event: {event['entity']}.{event['action']}\n"
+        f"data: {json.dumps(event)}\n\n"
+    )
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_pending_events(session: Session) -> None:
+    for pending in session.info.pop(PENDING_EVENTS_KEY, []):
+        broker.publish(pending)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_events(session: Session) -> None:
+    session.info.pop(PENDING_EVENTS_KEY, None)
@@ -0,0 +1,120 @@
+"""Idempotency-Key support for POST endpoints.
+
+The first request with a key claims it by inserting a row, runs the write
+and stores the response. Retries with the same key and payload replay the
+stored response without touching the write path again. A claim that never
+gets its response (the replica crashed mid-request) is a lease: after
+IDEMPOTENCY_LEASE_SECONDS a retry takes it over and runs the write.
+"""
+import hashlib
+import itertools
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import delete, func, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.database import settings
+from app.models import IdempotencyKey
+
+# Expired keys are purged on every Nth claim
+PURGE_EVERY = 100
+
+_claims = itertools.count(1)
+
+
+def fingerprint(method: str, path: str, body: str) -> str:
+    """Hash the parts of a request that must match for a replay"""
+    return hashlib.sha256(f"{method} {path}\n{body}".encode()).hexdigest()
+
+
+def _cutoff(seconds: int = None) -> datetime:
+    if seconds is None:
+        seconds = settings.IDEMPOTENCY_TTL_SECONDS
+    return datetime.now(timezone.utc) - timedelta(seconds=seconds)
+
+
+def _is_expired(record: IdempotencyKey, seconds: int = None) -> bool:
+    created_at = record.created_at
+    if created_at is None:
+        return False
+    if created_at.tzinfo is None:
+        # SQLite stores CURRENT_TIMESTAMP as naive UTC
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    return created_at < _cutoff(seconds)
+
+
+def _take_over(db: Session, record: IdempotencyKey) -> bool:
+    """Renew an abandoned claim for this request, unless another retry won it"""
+    result = db.execute(
+        update(IdempotencyKey)
+        .where(
+            IdempotencyKey.key == record.key,
+            IdempotencyKey.status_code.is_(None),
+            IdempotencyKey.created_at < _cutoff(settings.IDEMPOTENCY_LEASE_SECONDS),
+        )
+        .values(created_at=func.now())
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount == 1
+
+
+def purge_expired(db: Session) -> int:
+    result = db.execute(
+        delete(IdempotencyKey).where(IdempotencyKey.created_at < _cutoff())
+    )
+    db.commit()
+    return result.rowcount
+
+
+def claim(db: Session, key: str, request_fingerprint: str) -> Optional[IdempotencyKey]:
+    """Claim `key` for a new request.
+
+    Returns None when the key was claimed, or the existing record when the
+    key has already been used and not yet expired. An in-progress claim older
+    than the lease is taken over when the request matches.
+    """
+    if next(_claims) % PURGE_EVERY == 0:
+        purge_expired(db)
+
+    existing = db.get(IdempotencyKey, key)
+    if existing is not None and _is_expired(existing):
+        db.delete(existing)
+        db.commit()
+        existing = None
+    if (
+        existing is not None
+        and existing.status_code is None
+        and existing.fingerprint == request_fingerprint
+        and _is_expired(existing, settings.IDEMPOTENCY_LEASE_SECONDS)
+        and _take_over(db, existing)
+    ):
+        return None
+    if existing is not None:
+        return existing
+
+    db.add(IdempotencyKey(key=key, fingerprint=request_fingerprint))
+    try:
+        db.commit()
+    except IntegrityError:
+        # A concurrent request claimed the same key first
+        db.rollback()
+        return db.get(IdempotencyKey, key)
+    return None
+
+
+def complete(db: Session, key: str, status_code: int, response_body: str) -> None:
+    record = db.get(IdempotencyKey, key)
+    if record is not None:
+        record.status_code = status_code
+        record.response_body = response_body
+        db.commit()
+
+
+def release(db: Session, key: str) -> None:
+    """Forget a claim whose request failed so the client can retry"""
+    db.rollback()
+    db.execute(delete(IdempotencyKey).where(IdempotencyKey.key == key))
+    db.commit()
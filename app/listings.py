@@ -0,0 +1,165 @@
+"""Denormalized project listings.
+
+``project_listings`` holds every project rendered with its member summaries
+as JSON, so ``GET /projects/`` is a single primary-key range scan instead of
+a join across ``projects``, ``member_projects`` and ``members``. Rows are
+refreshed in the same transaction as the write that changed them, from the
+changes recorded on the session by CRUD and from the members and projects
+any ORM writer (CRUD, the admin views, scripts) flushed in it, and rebuilt
+in full on startup. Writes that bypass the ORM, such as raw SQL, are only
+picked up by that rebuild. Projects inserted in the transaction are
+rendered from the objects already in the session rather than read back.
+
+Completed and cancelled projects stay in the table but are cold: the
+default list filters them out through a partial index over the remaining
+rows, so it does not slow down as finished projects accumulate.
+"""
+import logging
+from itertools import chain
+from typing import Collection, Iterable, Set
+
+from sqlalchemy import delete, event, insert, inspect, select
+from sqlalchemy.orm import Session, selectinload
+
+from app import schemas
+from app.events import PENDING_EVENTS_KEY
+from app.models import (
+    Member, Project, ProjectListing, ProjectStatus, member_project_association
+)
+
+logger = logging.getLogger(__name__)
+
+# Listings inserted per statement during a rebuild
+REBUILD_BATCH_SIZE = 500
+
+# Session.info keys of the projects and members flushed since the last commit
+FLUSHED_PROJECTS_KEY = "listing_flushed_projects"
+FLUSHED_MEMBERS_KEY = "listing_flushed_members"
+# Session.info key of the projects inserted since the last commit, by id
+INSERTED_PROJECTS_KEY = "listing_inserted_projects"
+
+
+def _listing_row(project: Project) -> dict:
+    return {
+        "project_id": project.id,
+        # A project without a status is treated as active rather than archived
+        "status": project.status or ProjectStatus.ACTIVE.value,
+        "payload": schemas.Project.model_validate(project).model_dump_json(),
+    }
+
+
+def member_project_ids(db: Session, member_ids: Iterable[int]) -> Set[int]:
+    """IDs of the projects whose listings embed any of `member_ids`"""
+    member_ids = set(member_ids)
+    if not member_ids:
+        return set()
+    return set(db.scalars(
+        select(member_project_association.c.project_id)
+        .where(member_project_association.c.member_id.in_(member_ids))
+    ))
+
+
+def _is_current(project: Project) -> bool:
+    """Whether `project` and the member fields its listing embeds are loaded"""
+    state = inspect(project)
+    if not state.persistent or state.expired_attributes or "members" in state.unloaded:
+        return False
+    # Touching members expires their version and updated_at, not their summary
+    summary_fields = schemas.MemberSummary.model_fields.keys()
+    return all(
+        inspect(member).persistent
+        and not summary_fields & inspect(member).expired_attributes
+        for member in project.members
+    )
+
+
+def refresh_project_listings(db: Session, project_ids: Iterable[int],
+                             loaded: Collection[Project] = ()) -> None:
+    """Re-render the listings of `project_ids`, dropping deleted projects.
+
+    Projects in `loaded` are rendered as they are in the session; the rest
+    are read back from the database.
+    """
+    project_ids = set(project_ids)
+    if not project_ids:
+        return
+    # Delete first: the row locks make a concurrent refresh of the same
+    # projects wait for this transaction and then render from a snapshot
+    # that includes it, instead of overwriting it with an older rendering
+    db.execute(delete(ProjectListing).where(ProjectListing.project_id.in_(project_ids)))
+    projects = [p for p in loaded if p.id in project_ids]
+    stale_ids = project_ids - {p.id for p in projects}
+    if stale_ids:
+        projects += db.scalars(
+            select(Project)
+            .where(Project.id.in_(stale_ids))
+            .options(selectinload(Project.members))
+            .execution_options(populate_existing=True)
+        ).all()
+    if projects:
+        db.execute(insert(ProjectListing), [_listing_row(p) for p in projects])
+
+
+def rebuild_project_listings(db: Session) -> int:
+    """Replace every listing from the normalized tables"""
+    db.execute(delete(ProjectListing))
+    count = 0
+    batch = []
+    stmt = select(Project).options(selectinload(Project.members)).order_by(Project.id)
+    for project in db.scalars(stmt.execution_options(yield_per=REBUILD_BATCH_SIZE)):
+        batch.append(_listing_row(project))
+        if len(batch) == REBUILD_BATCH_SIZE:
+            db.execute(insert(ProjectListing), batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        db.execute(insert(ProjectListing), batch)
+        count += len(batch)
+    db.commit()
+    return count
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_flushed_changes(session: Session, flush_context) -> None:
+    projects = session.info.setdefault(FLUSHED_PROJECTS_KEY, set())
+    members = session.info.setdefault(FLUSHED_MEMBERS_KEY, set())
+    inserted = session.info.setdefault(INSERTED_PROJECTS_KEY, {})
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, Project):
+            projects.add(obj.id)
+            if obj in session.new:
+                inserted[obj.id] = obj
+        elif isinstance(obj, Member):
+            if obj in session.dirty:
+                # Its summary may have changed in every project it belongs to
+                members.add(obj.id)
+            # Memberships the flush removed, including those of a deleted
+            # member, are gone from the association table by commit time
+            history = inspect(obj).attrs.projects.history
+            linked = chain(history.added, history.deleted, history.unchanged or ())
+            projects.update(p.id for p in linked if p.id is not None)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_flushed_changes(session: Session) -> None:
+    session.info.pop(FLUSHED_PROJECTS_KEY, None)
+    session.info.pop(FLUSHED_MEMBERS_KEY, None)
+    session.info.pop(INSERTED_PROJECTS_KEY, None)
+
+
+@event.listens_for(Session, "before_commit")
+def _refresh_changed_listings(session: Session) -> None:
+    session.flush()
+    pending = session.info.get(PENDING_EVENTS_KEY, [])
+    project_ids = session.info.pop(FLUSHED_PROJECTS_KEY, set())
+    member_ids = session.info.pop(FLUSHED_MEMBERS_KEY, set())
+    inserted = session.info.pop(INSERTED_PROJECTS_KEY, {})
+    project_ids.update(e["id"] for e in pending if e["entity"] == "project")
+    # Renamed or re-roled members change the summaries embedded in projects
+    member_ids.update(
+        e["id"] for e in pending if e["entity"] == "member" and e["action"] == "updated"
+    )
+    refresh_project_listings(
+        session, project_ids | member_project_ids(session, member_ids),
+        loaded=[p for p in inserted.values() if _is_current(p)],
+    )
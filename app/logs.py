@@ -0,0 +1,224 @@
+"""Non-blocking structured logging.
+
+Every record is put on a bounded in-memory queue by a ``QueueHandler`` and
+written out by a ``QueueListener`` thread, so a slow or blocked stderr never
+stalls a request; when the queue is full records are dropped and counted
+instead. Records are emitted as one compact JSON object per line carrying
+the ID of the request that produced them. Per-request access logs can be
+sampled, and each logger's level can be set through ``LOG_LEVELS``.
+"""
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import re
+import sys
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from app.metrics import registry
+
+ACCESS_LOGGER = "app.access"
+REQUEST_ID_HEADER = b"x-request-id"
+QUEUE_SIZE = 10_000
+
+# Client-supplied request IDs are reused only if they look harmless
+_REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+dropped_records = registry.counter(
+    "lamfo_log_records_dropped_total", "Log records dropped because the queue was full"
+)
+
+# Attributes every LogRecord has; anything else was passed through `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "request_id"}
+
+
+class JSONFormatter(logging.Formatter):
+    """One compact JSON object per record"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, separators=(",", ":"), default=str)
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamp records with the current request ID before they change threads"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class AccessSampler(logging.Filter):
+    """Keep a fraction of successful access logs; always keep failures"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.name != ACCESS_LOGGER or self.rate >= 1:
+            return True
+        if getattr(record, "status", 0) >= 500 or record.levelno >= logging.WARNING:
+            return True
+        return random.random() < self.rate
+
+
+_traceback_formatter = logging.Formatter()
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of blocking on a full queue"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge args and render tracebacks in the calling thread, but leave
+        # formatting to the listener's handler
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _traceback_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            dropped_records.inc()
+
+
+def parse_levels(spec: str) -> Dict[str, str]:
+    """Parse ``"app.database=WARNING,sqlalchemy.engine=INFO"``"""
+    levels = {}
+    for item in spec.split(","):
+        name, sep, level = item.partition("=")
+        if sep and name.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def configure_logging(
+    level: str = "INFO",
+    levels: str = "",
+    fmt: str = "json",
+    access_sample_rate: float = 1.0,
+) -> None:
+    """Route all logging through the background queue. Safe to call again."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+
+    output = logging.StreamHandler(sys.stderr)
+    if fmt == "json":
+        output.setFormatter(JSONFormatter())
+    else:
+        output.setFormatter(logging.Formatter(
+            "%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"
+        ))
+    log_queue: queue.Queue = queue.Queue(QUEUE_SIZE)
+    _listener = logging.handlers.QueueListener(log_queue, output)
+    _listener.start()
+
+    handler = DroppingQueueHandler(log_queue)
+    handler.addFilter(RequestIdFilter())
+    handler.addFilter(AccessSampler(access_sample_rate))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        # Only replace basicConfig's handler and our own, not e.g. pytest's
+        if type(existing) is logging.StreamHandler or isinstance(existing, DroppingQueueHandler):
+            root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level.upper())
+
+    # Uvicorn installs its own synchronous handlers; send its records here too
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers.clear()
+        uvicorn_logger.propagate = True
+
+    for name, logger_level in parse_levels(levels).items():
+        logging.getLogger(name).setLevel(logger_level)
+
+
+@atexit.register
+def _flush_queue() -> None:
+    if _listener is not None:
+        _listener.stop()
+
+
+def _request_id(scope) -> str:
+    for name, value in scope["headers"]:
+        if name == REQUEST_ID_HEADER:
+            candidate = value.decode("latin-1")
+            if _REQUEST_ID_PATTERN.match(candidate):
+                return candidate
+    return uuid.uuid4().hex
+
+
+class RequestLoggingMiddleware:
+    """Assign each request an ID, echo it back and write an access log"""
+
+    def __init__(self, app):
+        self.app = app
+        self.access_logger = logging.getLogger(ACCESS_LOGGER)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = _request_id(scope)
+        token = request_id_var.set(request_id)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_request_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (REQUEST_ID_HEADER, request_id.encode())
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            if self.access_logger.isEnabledFor(logging.INFO):
+                self.access_logger.info(
+                    f"{scope['method']} {scope['path']} {status}",
+                    extra={
+                        "method": scope["method"],
+                        "path": scope["path"],
+                        "status": status,
+                        "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+                    },
+                )
+            request_id_var.reset(token)
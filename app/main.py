@@ -1,32 +1,224 @@
-from fastapi import FastAPI, HTTPException, Depends, Response, Request
+from fastapi import (
+    FastAPI, HTTPException, Depends, File, Header, Query, Response, Request, UploadFile
+)
+from fastapi.routing import APIRoute
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import RedirectResponse, FileResponse
+from fastapi.responses import (
+    RedirectResponse, FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
+)
+from sqlalchemy.exc import OperationalError, TimeoutError as PoolTimeoutError
 from sqlalchemy.orm import Session
-from typing import List
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import List, Literal, Optional
+import asyncio
+import base64
+import functools
 import uvicorn
 import logging
 import os
-from . import models, schemas, crud
-from .database import get_db
+from . import batching, models, schemas, crud, idempotency, media, memory, profiling
+from .admission import AdmissionControlMiddleware
+from .auth import require_admin_token
+from .cache import cached
+from .coalescing import CoalescingMiddleware
+from .database import (
+    get_db, get_session_local, release_connection, set_statement_timeout, settings
+)
+from .deadlines import RETRY_AFTER_SECONDS, DeadlineMiddleware
 from .admin import create_admin
+from .events import PostgresRelay, broker, format_sse
+from .listings import rebuild_project_listings
+from .logs import RequestLoggingMiddleware, configure_logging
+from .metrics import registry
+from . import ratelimit
+from .response_cache import cached_response
 
 # Set up logging
-logging.basicConfig(level=logging.INFO)
+configure_logging(
+    level=settings.LOG_LEVEL,
+    levels=settings.LOG_LEVELS,
+    fmt=settings.LOG_FORMAT,
+    access_sample_rate=settings.ACCESS_LOG_SAMPLE_RATE
+)
 logger = logging.getLogger(__name__)
 
+# Seconds between keep-alive comments on idle event streams
+EVENTS_KEEPALIVE = 15
+
+# Full syncs of the change feed legitimately take longer than other reads
+CHANGES_TIMEOUT_SECONDS = 30
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    try:
+        with get_session_local()() as db:
+            count = rebuild_project_listings(db)
+        logger.info(f"Rebuilt {count} project listings")
+    except Exception as e:
+        logger.error(f"Error rebuilding project listings: {e}")
+    if settings.EVENTS_BACKEND == "postgres" and not settings.TEST_MODE:
+        broker.relay = PostgresRelay(broker, settings.database_url)
+        broker.relay.start()
+        logger.info("Relaying change events through PostgreSQL LISTEN/NOTIFY")
+    yield
+    media.storage.shutdown()
+    if batching.batcher is not None:
+        batching.batcher.stop()
+    if broker.relay is not None:
+        broker.relay.stop()
+        broker.relay = None
+
+
+class SessionReleasingRoute(APIRoute):
+    """Releases the handler's database connection before the response is serialized.
+
+    FastAPI only closes the session from ``get_db`` after the response has
+    been sent, so without this the connection stays checked out while the
+    body is validated, encoded and written to the client.
+    """
+
+    def get_route_handler(self):
+        endpoint = self.dependant.call
+        # Async routes do not take a session; sync ones run in the threadpool,
+        # where the commit that releases the connection may block
+        if not asyncio.iscoroutinefunction(endpoint):
+            @functools.wraps(endpoint)
+            def call(**values):
+                result = endpoint(**values)
+                for value in values.values():
+                    if isinstance(value, Session):
+                        release_connection(value)
+                return result
+
+            self.dependant.call = call
+        return super().get_route_handler()
+
+
 # Create a FastAPI app
 # Use root_path for production, but allow override via environment variable
 root_path = os.getenv("ROOT_PATH", "")
 app = FastAPI(
     title="LAMFO API",
     description="API for managing LAMFO members and projects",
-    root_path=root_path
+    root_path=root_path,
+    lifespan=lifespan
 )
+app.router.route_class = SessionReleasingRoute
+
+# Lets a route-scoped profile know when matching requests run
+app.add_middleware(profiling.ProfilingMiddleware)
+
+# Answer with 503 instead of letting slow requests pile up
+app.add_middleware(
+    DeadlineMiddleware,
+    timeout=settings.REQUEST_TIMEOUT_SECONDS,
+    route_timeouts={"/changes": CHANGES_TIMEOUT_SECONDS}
+)
+
+# Shed load quickly once a route group is saturated
+app.add_middleware(
+    AdmissionControlMiddleware,
+    max_in_flight=settings.ADMISSION_MAX_IN_FLIGHT,
+    max_queue=settings.ADMISSION_MAX_QUEUE,
+    queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT_SECONDS
+)
+
+# Share one response among identical concurrent reads
+app.add_middleware(CoalescingMiddleware)
+
+# Outermost, so throttled clients never reach coalescing or admission
+if ratelimit.store is not None:
+    app.add_middleware(
+        ratelimit.RateLimitMiddleware,
+        store=ratelimit.store,
+        capacity=settings.RATE_LIMIT_CAPACITY,
+        rate=settings.RATE_LIMIT_PER_SECOND,
+        api_keys=ratelimit.parse_api_keys(settings.RATE_LIMIT_API_KEYS)
+    )
+
+# Request IDs and access logs cover every response, including rejections
+app.add_middleware(RequestLoggingMiddleware)
+
+
+def _service_unavailable(detail: str) -> Response:
+    return Response(
+        content=f'{{"detail": "{detail}"}}',
+        status_code=503,
+        media_type="application/json",
+        headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
+    )
+
+
+@app.exception_handler(PoolTimeoutError)
+async def pool_timeout_handler(request: Request, exc: PoolTimeoutError):
+    logger.warning(f"Timed out waiting for a database connection: {exc}")
+    return _service_unavailable("Database is busy")
+
+
+@app.exception_handler(OperationalError)
+async def operational_error_handler(request: Request, exc: OperationalError):
+    # 57014 is PostgreSQL's query_canceled, raised by statement_timeout
+    if getattr(exc.orig, "pgcode", None) == "57014":
+        logger.warning(f"Statement timeout on {request.url.path}")
+        return _service_unavailable("Query took too long")
+    raise exc
 
 # Initialize SQLAdmin
 admin = create_admin(app)
 
 
+def _write(db, write, response_schema):
+    """Run a CRUD write, through the group-commit batcher when it is enabled.
+
+    Batched writes run in the batcher's session, which may reload related
+    rows before committing, so their result is validated inside the batch.
+    """
+    if batching.batcher is None:
+        return write(db)
+    return batching.batcher.submit(
+        lambda session: response_schema.model_validate(write(session))
+    )
+
+
+def _run_idempotent(db, key, path, payload, write, response_schema):
+    """Run a create once per Idempotency-Key and replay its response"""
+    if key is None:
+        return write()
+
+    request_fingerprint = idempotency.fingerprint(
+        "POST", path, payload.model_dump_json()
+    )
+    record = idempotency.claim(db, key, request_fingerprint)
+    if record is not None:
+        if record.fingerprint != request_fingerprint:
+            raise HTTPException(
+                status_code=422,
+                detail="Idempotency-Key was already used with a different request"
+            )
+        if record.status_code is None:
+            raise HTTPException(
+                status_code=409,
+                detail="A request with this Idempotency-Key is in progress"
+            )
+        return Response(
+            content=record.response_body,
+            status_code=record.status_code,
+            media_type="application/json",
+            headers={"Idempotent-Replayed": "true"}
+        )
+
+    try:
+        result = write()
+    except Exception:
+        idempotency.release(db, key)
+        raise
+    body = response_schema.model_validate(result).model_dump_json()
+    idempotency.complete(db, key, 201, body)
+    return Response(content=body, status_code=201, media_type="application/json")
+
+
 @app.get("/")
 def root():
     return {"message": "LAMFO API is running", "status": "operational"}
@@ -52,35 +244,206 @@ def health_check():
         )
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def read_metrics():
+    """Process metrics in the Prometheus text format"""
+    return PlainTextResponse(
+        registry.render(), media_type="text/plain; version=0.0.4"
+    )
+
+
+@app.get("/debug/profile", dependencies=[Depends(require_admin_token)])
+async def profile(
+    seconds: float = 10,
+    interval: float = profiling.DEFAULT_INTERVAL_SECONDS,
+    route: Optional[str] = None,
+    requests: int = 0,
+    format: Literal["collapsed", "speedscope"] = "collapsed"
+):
+    """Sample every thread's stack for `seconds` (at most 60).
+
+    With ``route`` and ``requests``, sample only while requests under that
+    path prefix are running and stop once that many have finished.
+    """
+    if requests and not route:
+        raise HTTPException(status_code=422, detail="requests needs a route")
+    try:
+        profiler = await profiling.session.run(
+            seconds, interval=interval, route=route, requests=requests
+        )
+    except profiling.ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    headers = {"X-Profile-Samples": str(profiler.samples)}
+    if format == "speedscope":
+        headers["Content-Disposition"] = 'attachment; filename="profile.speedscope.json"'
+        return JSONResponse(profiler.speedscope(), headers=headers)
+    return PlainTextResponse(profiler.collapsed(), headers=headers)
+
+
+@app.get("/debug/memory", dependencies=[Depends(require_admin_token)])
+def read_memory_status():
+    """Live sessions, identity-map sizes, RSS and tracemalloc state"""
+    return memory.status()
+
+
+@app.post("/debug/memory/snapshot", dependencies=[Depends(require_admin_token)])
+def take_memory_snapshot(frames: int = 1, limit: int = 20):
+    """Start tracemalloc if needed and record the baseline for /diff"""
+    return memory.take_baseline(frames=max(1, min(frames, 25)), limit=limit)
+
+
+@app.get("/debug/memory/diff", dependencies=[Depends(require_admin_token)])
+def read_memory_diff(
+    limit: int = 20, group_by: Literal["lineno", "traceback"] = "lineno"
+):
+    """Top allocation sites by growth since the baseline snapshot"""
+    report = memory.diff(limit=limit, group_by=group_by)
+    if report is None:
+        raise HTTPException(status_code=409, detail="Take a snapshot first")
+    return report
+
+
+@app.delete("/debug/memory/snapshot", dependencies=[Depends(require_admin_token)])
+def stop_memory_tracing():
+    """Stop tracemalloc, removing its overhead"""
+    memory.stop()
+    return {"message": "Memory tracing stopped"}
+
+
+@app.get("/events")
+async def stream_events(request: Request):
+    """Server-Sent Events stream of member and project changes"""
+    subscription = broker.subscribe()
+
+    async def event_stream():
+        try:
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(
+                        subscription.get(), timeout=EVENTS_KEEPALIVE
+                    )
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_sse(event)
+        finally:
+            subscription.close()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.get("/members/", response_model=List[schemas.Member])
 def read_members(
-    skip: int = 0, limit: int = 100, db: Session = Depends(get_db)
+    request: Request, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)
 ):
     try:
-        members = crud.get_members(db, skip=skip, limit=limit)
-        return members
+        return cached_response(
+            request, "members", {"skip": skip, "limit": limit},
+            lambda: cached(f"members:{skip}:{limit}", lambda: [
+                schemas.Member.model_validate(member).model_dump(mode="json")
+                for member in crud.get_members(db, skip=skip, limit=limit)
+            ])
+        )
     except Exception as e:
         logger.error(f"Error fetching members: {e}")
         # Return an empty list instead of failing
         return []
 
 
+def _parse_ids(ids: str) -> List[int]:
+    try:
+        parsed = [int(i) for i in ids.split(",") if i.strip()]
+    except ValueError:
+        raise HTTPException(status_code=422, detail="ids must be comma-separated integers")
+    if not parsed or len(parsed) > schemas.MAX_BATCH_IDS:
+        raise HTTPException(
+            status_code=422, detail=f"Pass between 1 and {schemas.MAX_BATCH_IDS} ids"
+        )
+    return parsed
+
+
+def _redirect_to_list(request: Request) -> RedirectResponse:
+    return RedirectResponse(
+        str(request.url.replace(path=request.url.path + "/")), status_code=307
+    )
+
+
+@app.get("/members", response_model=schemas.MemberBatch)
+def read_members_by_ids(
+    request: Request, ids: Optional[str] = None, db: Session = Depends(get_db)
+):
+    """Several members at once, e.g. ``/members?ids=3,1,2``, in request order"""
+    if ids is None:
+        return _redirect_to_list(request)
+    members, missing = crud.get_members_by_ids(db, _parse_ids(ids))
+    return schemas.MemberBatch(items=members, missing=missing)
+
+
+@app.post("/members/batch-get", response_model=schemas.MemberBatch)
+def batch_get_members(batch: schemas.BatchGetRequest, db: Session = Depends(get_db)):
+    members, missing = crud.get_members_by_ids(db, batch.ids)
+    return schemas.MemberBatch(items=members, missing=missing)
+
+
+def _etag(version: int) -> str:
+    return f'"{version}"'
+
+
+def _expected_version(if_match: Optional[str], version: int) -> Optional[int]:
+    """Version a PUT's If-Match header refers to, or None for ``*``"""
+    if if_match is None:
+        raise HTTPException(
+            status_code=428, detail="If-Match is required; send the ETag of the resource"
+        )
+    tags = [tag.strip() for tag in if_match.split(",")]
+    if "*" in tags:
+        return None
+    if _etag(version) not in tags:
+        raise HTTPException(status_code=412, detail="The resource has been modified")
+    return version
+
+
 @app.get("/members/{member_id}", response_model=schemas.Member)
-def read_member(member_id: int, db: Session = Depends(get_db)):
-    member = crud.get_member(db, member_id=member_id)
+def read_member(member_id: int, response: Response, db: Session = Depends(get_db)):
+    def load():
+        member = crud.get_member(db, member_id=member_id)
+        if member is None:
+            return None
+        return schemas.Member.model_validate(member).model_dump(mode="json")
+
+    member = cached(f"member:{member_id}", load)
     if member is None:
         raise HTTPException(status_code=404, detail="Member not found")
+    response.headers["ETag"] = _etag(member["version"])
     return member
 
 
 @app.put("/members/{member_id}", response_model=schemas.Member)
 def update_member(
-    member_id: int, member: schemas.MemberUpdate, db: Session = Depends(get_db)
+    member_id: int,
+    member: schemas.MemberUpdate,
+    response: Response,
+    db: Session = Depends(get_db),
+    if_match: Optional[str] = Header(None, alias="If-Match")
 ):
     db_member = crud.get_member(db, member_id=member_id)
     if db_member is None:
         raise HTTPException(status_code=404, detail="Member not found")
-    return crud.update_member(db=db, member_id=member_id, member=member)
+    expected_version = _expected_version(if_match, db_member.version)
+    try:
+        updated = _write(
+            db,
+            lambda session: crud.update_member(session, member_id, member, expected_version),
+            schemas.Member
+        )
+    except crud.VersionConflictError as e:
+        raise HTTPException(status_code=412, detail=str(e))
+    response.headers["ETag"] = _etag(updated.version)
+    return updated
 
 
 @app.delete("/members/{member_id}")
@@ -93,37 +456,99 @@ def delete_member(member_id: int, db: Session = Depends(get_db)):
 
 
 @app.post("/members/", response_model=schemas.Member, status_code=201)
-def create_member(member: schemas.MemberCreate, db: Session = Depends(get_db)):
-    db_member = crud.get_member_by_email(db, email=member.email)
-    if db_member:
-        raise HTTPException(status_code=400, detail="Email already registered")
-    return crud.create_member(db=db, member=member)
+def create_member(
+    member: schemas.MemberCreate,
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255)
+):
+    def write():
+        try:
+            return _write(
+                db, lambda session: crud.create_member(session, member), schemas.Member
+            )
+        except crud.DuplicateEmailError:
+            raise HTTPException(status_code=400, detail="Email already registered")
+
+    return _run_idempotent(
+        db, idempotency_key, "/members/", member, write, schemas.Member
+    )
 
 
 @app.get("/projects/", response_model=List[schemas.Project])
 def read_projects(
-    skip: int = 0, limit: int = 100, db: Session = Depends(get_db)
+    request: Request, skip: int = 0, limit: int = 100, include_archived: bool = False,
+    db: Session = Depends(get_db)
+):
+    # Served from the denormalized listings, already rendered as JSON; completed
+    # and cancelled projects are left out unless include_archived is set
+    return cached_response(
+        request, "projects",
+        {"skip": skip, "limit": limit, "include_archived": include_archived},
+        lambda: cached(f"projects:{skip}:{limit}:{include_archived}", lambda: (
+            "[" + ",".join(crud.get_project_listings(
+                db, skip=skip, limit=limit, include_archived=include_archived
+            )) + "]"
+        )).encode()
+    )
+
+
+@app.get("/projects", response_model=schemas.ProjectBatch)
+def read_projects_by_ids(
+    request: Request, ids: Optional[str] = None, db: Session = Depends(get_db)
 ):
-    projects = crud.get_projects(db, skip=skip, limit=limit)
-    return projects
+    """Several projects at once, e.g. ``/projects?ids=3,1,2``, in request order"""
+    if ids is None:
+        return _redirect_to_list(request)
+    projects, missing = crud.get_projects_by_ids(db, _parse_ids(ids))
+    return schemas.ProjectBatch(items=projects, missing=missing)
+
+
+@app.post("/projects/batch-get", response_model=schemas.ProjectBatch)
+def batch_get_projects(batch: schemas.BatchGetRequest, db: Session = Depends(get_db)):
+    projects, missing = crud.get_projects_by_ids(db, batch.ids)
+    return schemas.ProjectBatch(items=projects, missing=missing)
 
 
 @app.get("/projects/{project_id}", response_model=schemas.Project)
-def read_project(project_id: int, db: Session = Depends(get_db)):
-    project = crud.get_project(db, project_id=project_id)
+def read_project(project_id: int, response: Response, db: Session = Depends(get_db)):
+    def load():
+        project = crud.get_project(db, project_id=project_id)
+        if project is None:
+            return None
+        return schemas.Project.model_validate(project).model_dump(mode="json")
+
+    project = cached(f"project:{project_id}", load)
     if project is None:
         raise HTTPException(status_code=404, detail="Project not found")
+    response.headers["ETag"] = _etag(project["version"])
     return project
 
 
 @app.put("/projects/{project_id}", response_model=schemas.Project)
 def update_project(
-    project_id: int, project: schemas.ProjectUpdate, db: Session = Depends(get_db)
+    project_id: int,
+    project: schemas.ProjectUpdate,
+    response: Response,
+    db: Session = Depends(get_db),
+    if_match: Optional[str] = Header(None, alias="If-Match")
 ):
     db_project = crud.get_project(db, project_id=project_id)
     if db_project is None:
         raise HTTPException(status_code=404, detail="Project not found")
-    return crud.update_project(db=db, project_id=project_id, project=project)
+    expected_version = _expected_version(if_match, db_project.version)
+    try:
+        updated = _write(
+            db,
+            lambda session: crud.update_project(session, project_id, project, expected_version),
+            schemas.Project
+        )
+    except crud.UnknownMemberIdsError as e:
+        db.rollback()
+        raise HTTPException(status_code=422, detail=str(e))
+    except crud.VersionConflictError as e:
+        raise HTTPException(status_code=412, detail=str(e))
+    response.headers["ETag"] = _etag(updated.version)
+    return updated
 
 
 @app.delete("/projects/{project_id}")
@@ -137,9 +562,155 @@ def delete_project(project_id: int, db: Session = Depends(get_db)):
 
 @app.post("/projects/", response_model=schemas.Project, status_code=201)
 def create_project(
-    project: schemas.ProjectCreate, db: Session = Depends(get_db)
+    project: schemas.ProjectCreate,
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255)
 ):
-    return crud.create_project(db=db, project=project)
+    def write():
+        try:
+            return _write(
+                db, lambda session: crud.create_project(session, project), schemas.Project
+            )
+        except crud.UnknownMemberIdsError as e:
+            db.rollback()
+            raise HTTPException(status_code=422, detail=str(e))
+
+    return _run_idempotent(
+        db, idempotency_key, "/projects/", project, write, schemas.Project
+    )
+
+
+# Media files never change once written, since names are content digests
+MEDIA_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Served in place of a variant that has not been rendered yet
+MEDIA_FALLBACK_CACHE_CONTROL = "public, max-age=60"
+
+
+def _upload_image(db: Session, entity_type: str, entity_id: int, file: UploadFile):
+    data = file.file.read(settings.MEDIA_MAX_UPLOAD_BYTES + 1)
+    if len(data) > settings.MEDIA_MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail="Image is too large")
+    try:
+        stored = media.storage.save(data)
+    except media.UnsupportedImageError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    media.storage.schedule_variants(stored.digest, stored.extension)
+    return crud.create_image(db, entity_type, entity_id, stored)
+
+
+# Uploads write to disk, so only operators may add images
+@app.post(
+    "/members/{member_id}/images", response_model=schemas.Image, status_code=201,
+    dependencies=[Depends(require_admin_token)]
+)
+def upload_member_image(
+    member_id: int, file: UploadFile = File(...), db: Session = Depends(get_db)
+):
+    if crud.get_member(db, member_id=member_id) is None:
+        raise HTTPException(status_code=404, detail="Member not found")
+    return _upload_image(db, "member", member_id, file)
+
+
+@app.get("/members/{member_id}/images", response_model=List[schemas.Image])
+def read_member_images(member_id: int, db: Session = Depends(get_db)):
+    return crud.get_images(db, "member", member_id)
+
+
+@app.post(
+    "/projects/{project_id}/images", response_model=schemas.Image, status_code=201,
+    dependencies=[Depends(require_admin_token)]
+)
+def upload_project_image(
+    project_id: int, file: UploadFile = File(...), db: Session = Depends(get_db)
+):
+    if crud.get_project(db, project_id=project_id) is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return _upload_image(db, "project", project_id, file)
+
+
+@app.get("/projects/{project_id}/images", response_model=List[schemas.Image])
+def read_project_images(project_id: int, db: Session = Depends(get_db)):
+    return crud.get_images(db, "project", project_id)
+
+
+@app.get("/media/{name}")
+def read_media(name: str, request: Request):
+    """Serve an uploaded image or one of its resized variants"""
+    parsed = media.parse_name(name)
+    if parsed is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    digest, variant, extension = parsed
+    cache_control = MEDIA_CACHE_CONTROL
+    if variant is not None and not os.path.exists(media.storage.path(name)):
+        name = media.storage.find_original(digest)
+        if name is None:
+            raise HTTPException(status_code=404, detail="Image not found")
+        extension = name.rsplit(".", 1)[1]
+        # Re-queue in case the variant was lost, e.g. by a restart
+        media.storage.schedule_variants(digest, extension)
+        cache_control = MEDIA_FALLBACK_CACHE_CONTROL
+    elif not os.path.exists(media.storage.path(name)):
+        raise HTTPException(status_code=404, detail="Image not found")
+    return media.serve_file(
+        request,
+        media.storage.path(name),
+        etag=f'"{name.rsplit(".", 1)[0]}"',
+        content_type=media.CONTENT_TYPES[extension],
+        cache_control=cache_control,
+    )
+
+
+def _encode_change_token(key: crud.ChangeKey) -> str:
+    value = f"{key.changed_at.isoformat()}|{key.kind}|{key.id}"
+    return base64.urlsafe_b64encode(value.encode()).decode()
+
+
+def _decode_change_token(token: str) -> crud.ChangeKey:
+    try:
+        changed_at, _, rest = base64.urlsafe_b64decode(token).decode().partition("|")
+        changed_at = datetime.fromisoformat(changed_at)
+        if not rest:
+            # Tokens from before pagination hold only the watermark
+            return crud.ChangeKey(changed_at - crud.CHANGE_FEED_OVERLAP, "", 0)
+        kind, _, entity_id = rest.partition("|")
+        return crud.ChangeKey(changed_at, kind, int(entity_id))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid change token")
+
+
+@app.get("/changes", response_model=schemas.ChangeFeed)
+def read_changes(
+    since: Optional[str] = None,
+    limit: int = Query(crud.CHANGE_FEED_PAGE_SIZE, ge=1, le=crud.CHANGE_FEED_MAX_PAGE_SIZE),
+    db: Session = Depends(get_db),
+):
+    """Members, projects and deletions changed since a previous sync.
+
+    Pass the returned ``next_token`` as ``since`` on the next call, right
+    away while ``has_more`` is true. Changes near the end of the feed may be
+    returned again, so apply them idempotently. A token older than the kept
+    deletions gets 410: drop local data and sync again without ``since``.
+    """
+    after = _decode_change_token(since) if since else None
+    set_statement_timeout(db, CHANGES_TIMEOUT_SECONDS * 1000)
+    try:
+        page = crud.get_changes(db, after=after, limit=limit)
+    except crud.ChangeTokenExpiredError as e:
+        raise HTTPException(status_code=410, detail=str(e))
+    if page.next_key is None:
+        # Nothing has changed yet: do a full sync again
+        next_token = ""
+    elif page.next_key == after:
+        next_token = since
+    else:
+        next_token = _encode_change_token(page.next_key)
+    return schemas.ChangeFeed(
+        members=page.members,
+        projects=page.projects,
+        deleted=page.tombstones,
+        next_token=next_token,
+        has_more=page.has_more,
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,285 @@
+"""Content-addressed image storage.
+
+Uploads are stored once under their SHA-256 digest, so re-uploading the same
+file costs nothing and every URL is immutable. Resized WebP variants are
+rendered once, by a background thread pool, when Pillow is installed
+(``pip install -e ".[images]"``); until a variant exists the original is
+served in its place. Files are removed once the last image row that
+references their digest is deleted with its member or project.
+"""
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from io import BytesIO
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.responses import FileResponse
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.database import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - exercised only without Pillow
+    Image = None
+    ImageOps = None
+
+# Longest side in pixels of each generated variant
+VARIANT_SIZES: Dict[str, int] = {"thumb": 256, "medium": 1024}
+VARIANT_EXTENSION = "webp"
+VARIANT_QUALITY = 80
+
+# Sniffed from the file itself, never from the client's Content-Type
+_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "image/png", "png"),
+    (b"\xff\xd8\xff", "image/jpeg", "jpg"),
+    (b"GIF87a", "image/gif", "gif"),
+    (b"GIF89a", "image/gif", "gif"),
+)
+CONTENT_TYPES = {
+    "png": "image/png", "jpg": "image/jpeg", "gif": "image/gif", "webp": "image/webp",
+}
+
+# Session.info key for digests whose files go once the transaction commits
+ORPHANED_DIGESTS_KEY = "orphaned_image_digests"
+
+# {digest}.{ext} for originals, {digest}-{variant}.webp for variants
+_NAME_PATTERN = re.compile(r"^([0-9a-f]{64})(?:-([a-z]+))?\.([a-z]+)$")
+
+
+class UnsupportedImageError(ValueError):
+    """Raised when an upload is not a PNG, JPEG, GIF or WebP image"""
+
+
+class StoredImage(NamedTuple):
+    digest: str
+    extension: str
+    content_type: str
+    size: int
+    width: Optional[int]
+    height: Optional[int]
+
+
+def sniff_image_type(data: bytes) -> Tuple[str, str]:
+    """Return the content type and extension of an image from its bytes"""
+    for signature, content_type, extension in _SIGNATURES:
+        if data.startswith(signature):
+            return content_type, extension
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp", "webp"
+    raise UnsupportedImageError("Only PNG, JPEG, GIF and WebP images are supported")
+
+
+def parse_name(name: str) -> Optional[Tuple[str, Optional[str], str]]:
+    """Split a media file name into digest, variant and extension"""
+    match = _NAME_PATTERN.match(name)
+    if match is None:
+        return None
+    digest, variant, extension = match.groups()
+    if variant is not None and (variant not in VARIANT_SIZES or extension != VARIANT_EXTENSION):
+        return None
+    if variant is None and extension not in CONTENT_TYPES:
+        return None
+    return digest, variant, extension
+
+
+class MediaStorage:
+    """Files laid out as ``{root}/ab/cd/{name}`` by the digest's first bytes"""
+
+    def __init__(self, root: str, workers: int = 2):
+        self.root = root
+        self.workers = workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # One render per digest at a time, however many requests miss it
+        self._rendering: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def path(self, name: str) -> str:
+        # Two levels of fan-out keep directories small
+        return os.path.join(self.root, name[:2], name[2:4], name)
+
+    def _write(self, name: str, data: bytes) -> None:
+        path = self.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def save(self, data: bytes) -> StoredImage:
+        """Store `data` under its digest, if it is not stored already"""
+        content_type, extension = sniff_image_type(data)
+        width = height = None
+        if Image is not None:
+            try:
+                with Image.open(BytesIO(data)) as image:
+                    width, height = image.size
+            except Exception as e:
+                raise UnsupportedImageError(f"Unreadable image: {e}")
+        digest = hashlib.sha256(data).hexdigest()
+        name = f"{digest}.{extension}"
+        if not os.path.exists(self.path(name)):
+            self._write(name, data)
+        return StoredImage(digest, extension, content_type, len(data), width, height)
+
+    def variant_name(self, digest: str, variant: str) -> str:
+        return f"{digest}-{variant}.{VARIANT_EXTENSION}"
+
+    def render_variants(self, digest: str, extension: str) -> None:
+        """Render every missing variant of an original"""
+        if Image is None:
+            return
+        missing = [
+            v for v in VARIANT_SIZES
+            if not os.path.exists(self.path(self.variant_name(digest, v)))
+        ]
+        if not missing:
+            return
+        with Image.open(self.path(f"{digest}.{extension}")) as original:
+            original = ImageOps.exif_transpose(original)
+            if original.mode not in ("RGB", "RGBA"):
+                original = original.convert("RGBA")
+            for variant in missing:
+                resized = original.copy()
+                resized.thumbnail((VARIANT_SIZES[variant],) * 2)
+                out = BytesIO()
+                resized.save(out, VARIANT_EXTENSION, quality=VARIANT_QUALITY)
+                self._write(self.variant_name(digest, variant), out.getvalue())
+
+    def schedule_variants(self, digest: str, extension: str) -> Optional[Future]:
+        """Render variants in the background pool, unless already under way"""
+        if Image is None:
+            return None
+        with self._lock:
+            future = self._rendering.get(digest)
+            if future is not None:
+                return future
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="image-variants"
+                )
+            future = self._rendering[digest] = self._executor.submit(
+                self.render_variants, digest, extension
+            )
+        future.add_done_callback(lambda f: self._rendered(digest, f))
+        return future
+
+    def _rendered(self, digest: str, future: Future) -> None:
+        with self._lock:
+            self._rendering.pop(digest, None)
+        _log_failure(future)
+
+    def remove(self, digest: str) -> None:
+        """Delete the original and every variant stored under `digest`"""
+        names = [f"{digest}.{extension}" for extension in CONTENT_TYPES]
+        names += [self.variant_name(digest, variant) for variant in VARIANT_SIZES]
+        for name in names:
+            try:
+                os.remove(self.path(name))
+            except FileNotFoundError:
+                pass
+
+    def find_original(self, digest: str) -> Optional[str]:
+        """Name of the stored original with `digest`, whatever its type"""
+        for extension in CONTENT_TYPES:
+            name = f"{digest}.{extension}"
+            if os.path.exists(self.path(name)):
+                return name
+        return None
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+def _log_failure(future: Future) -> None:
+    if future.exception() is not None:
+        logger.error(f"Error rendering image variants: {future.exception()}")
+
+
+storage = MediaStorage(settings.MEDIA_ROOT, workers=settings.IMAGE_WORKERS)
+
+
+def remove_after_commit(db: Session, digests: Iterable[str]) -> None:
+    """Delete the files of `digests` once `db` commits"""
+    db.info.setdefault(ORPHANED_DIGESTS_KEY, set()).update(digests)
+
+
+@event.listens_for(Session, "after_commit")
+def _remove_orphaned_files(session: Session) -> None:
+    for digest in session.info.pop(ORPHANED_DIGESTS_KEY, ()):
+        try:
+            storage.remove(digest)
+        except OSError as e:
+            logger.error(f"Failed to remove image {digest}: {e}")
+
+
+@event.listens_for(Session, "after_rollback")
+def _keep_orphaned_files(session: Session) -> None:
+    session.info.pop(ORPHANED_DIGESTS_KEY, None)
+
+
+class RangeNotSatisfiable(ValueError):
+    """Raised for a Range header that lies outside the file"""
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Inclusive byte range requested by `header`, or None for the whole file.
+
+    Only single ranges are honoured; anything else is ignored, as RFC 9110
+    allows, and the whole file is sent.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, _, last = header[len("bytes="):].strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+        else:
+            # Suffix range: the last N bytes
+            start, end = max(size - int(last), 0), size - 1
+    except ValueError:
+        return None
+    if start > end or start >= size:
+        raise RangeNotSatisfiable(header)
+    return start, end
+
+
+def serve_file(request: Request, path: str, etag: str, content_type: str,
+               cache_control: str) -> Response:
+    """Respond with a stored file, honouring If-None-Match and Range"""
+    headers = {"ETag": etag, "Cache-Control": cache_control, "Accept-Ranges": "bytes"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if if_none_match == "*" or etag in (t.strip() for t in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+
+    stat_result = os.stat(path)
+    if_range = request.headers.get("if-range")
+    try:
+        byte_range = None if if_range not in (None, etag) else parse_range(
+            request.headers.get("range"), stat_result.st_size
+        )
+    except RangeNotSatisfiable:
+        headers["Content-Range"] = f"bytes */{stat_result.st_size}"
+        return Response(status_code=416, headers=headers)
+
+    if byte_range is None:
+        return FileResponse(
+            path, headers=headers, media_type=content_type, stat_result=stat_result
+        )
+    start, end = byte_range
+    with open(path, "rb") as f:
+        f.seek(start)
+        body = f.read(end - start + 1)
+    headers["Content-Range"] = f"bytes {start}-{end}/{stat_result.st_size}"
+    return Response(content=body, status_code=206, headers=headers, media_type=content_type)
@@ -0,0 +1,148 @@
+"""Memory diagnostics.
+
+Tracks every SQLAlchemy ``Session`` that has started a transaction in a
+weak set, so the number of sessions still alive and the objects held in
+their identity maps show up in ``/metrics`` and reveal sessions that outlive
+their request. ``tracemalloc`` snapshots can be taken and diffed on demand
+through the ``/debug/memory`` endpoints; tracing is only switched on while a
+baseline snapshot exists, because it slows allocations down noticeably.
+"""
+import gc
+import os
+import resource
+import sys
+import threading
+import tracemalloc
+import weakref
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.metrics import registry
+
+# Allocations made by the diagnostics themselves are left out of reports
+_IGNORED_FILES = (tracemalloc.__file__, "<frozen importlib._bootstrap>",
+                  "<frozen importlib._bootstrap_external>", "<unknown>")
+
+_live_sessions: "weakref.WeakSet[Session]" = weakref.WeakSet()
+_lock = threading.Lock()
+_baseline: Optional[tracemalloc.Snapshot] = None
+
+live_sessions_gauge = registry.gauge(
+    "lamfo_sessions_live", "Database sessions not yet garbage collected"
+)
+identity_map_gauge = registry.gauge(
+    "lamfo_session_identity_map_objects", "Objects held in identity maps of live sessions"
+)
+rss_gauge = registry.gauge(
+    "lamfo_process_resident_memory_bytes", "Resident set size of this process"
+)
+
+
+@event.listens_for(Session, "after_begin")
+def _track_session(session, transaction, connection) -> None:
+    _live_sessions.add(session)
+
+
+def session_stats() -> Dict[str, int]:
+    sessions = list(_live_sessions)
+    sizes = [len(s.identity_map) for s in sessions]
+    return {
+        "live_sessions": len(sessions),
+        "identity_map_objects": sum(sizes),
+        "largest_identity_map": max(sizes, default=0),
+    }
+
+
+def resident_memory_bytes() -> int:
+    """Current RSS on Linux, peak RSS elsewhere"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and KiB on Linux and BSD
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _collect() -> None:
+    stats = session_stats()
+    live_sessions_gauge.set(stats["live_sessions"])
+    identity_map_gauge.set(stats["identity_map_objects"])
+    rss_gauge.set(resident_memory_bytes())
+
+
+registry.add_collector(_collect)
+
+
+def _take_snapshot() -> tracemalloc.Snapshot:
+    gc.collect()
+    return tracemalloc.take_snapshot().filter_traces(
+        [tracemalloc.Filter(False, name) for name in _IGNORED_FILES]
+    )
+
+
+def _site(stat) -> str:
+    frame = stat.traceback[0]
+    return f"{frame.filename}:{frame.lineno}"
+
+
+def _traceback(stat) -> List[str]:
+    return [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback]
+
+
+def status() -> Dict[str, Any]:
+    current, peak = tracemalloc.get_traced_memory()
+    return {
+        **session_stats(),
+        "rss_bytes": resident_memory_bytes(),
+        "tracing": tracemalloc.is_tracing(),
+        "traced_bytes": current,
+        "traced_peak_bytes": peak,
+        "has_baseline": _baseline is not None,
+    }
+
+
+def take_baseline(frames: int = 1, limit: int = 20) -> Dict[str, Any]:
+    """Start tracing if needed and remember a snapshot to diff against"""
+    global _baseline
+    with _lock:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        _baseline = _take_snapshot()
+        top = _baseline.statistics("lineno")[:limit]
+    return {
+        **status(),
+        "top": [{"site": _site(s), "size": s.size, "count": s.count} for s in top],
+    }
+
+
+def diff(limit: int = 20, group_by: str = "lineno") -> Optional[Dict[str, Any]]:
+    """Largest allocation growth since the baseline, or None without one"""
+    with _lock:
+        if _baseline is None:
+            return None
+        stats = _take_snapshot().compare_to(_baseline, group_by)[:limit]
+    return {
+        **status(),
+        "top": [
+            {
+                "site": _site(s),
+                "traceback": _traceback(s) if group_by == "traceback" else None,
+                "size_diff": s.size_diff,
+                "count_diff": s.count_diff,
+                "size": s.size,
+            }
+            for s in stats
+        ],
+    }
+
+
+def stop() -> None:
+    """Stop tracing and drop the baseline"""
+    global _baseline
+    with _lock:
+        _baseline = None
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
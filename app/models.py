@@ -1,6 +1,6 @@
 from typing import Optional
 from pydantic import BaseModel
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Table
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index, Table
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -33,6 +33,9 @@ class ProjectStatus(str, Enum):
     ON_HOLD = "on_hold"
     CANCELLED = "cancelled"
 
+# Finished projects, left out of the project list unless asked for
+ARCHIVED_PROJECT_STATUSES = (ProjectStatus.COMPLETED.value, ProjectStatus.CANCELLED.value)
+
 class Member(Base):
     __tablename__ = "members"
     
@@ -43,8 +46,15 @@ class Member(Base):
     bio = Column(Text, nullable=True)
     github_username = Column(String(100), nullable=True)
     linkedin_url = Column(String(255), nullable=True)  # Changed from HttpUrl to String
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now(), index=True)
+    # Bumped by every ORM update, which only applies if the row still has
+    # the version it was loaded with; exposed as the ETag
+    version = Column(Integer, nullable=False, server_default="1")
+    
+    # Server defaults such as created_at come back from INSERT ... RETURNING
+    # (PostgreSQL, SQLite 3.35+), so creates need no SELECT afterwards
+    __mapper_args__ = {"eager_defaults": "auto", "version_id_col": version}
     
     # Relationships
     projects = relationship("Project", secondary=member_project_association, back_populates="members")
@@ -66,8 +76,11 @@ class Project(Base):
     status = Column(String(50), default="active")  # active, completed, paused
     github_url = Column(String(255), nullable=True)
     demo_url = Column(String(255), nullable=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now(), index=True)
+    version = Column(Integer, nullable=False, server_default="1")
+    
+    __mapper_args__ = {"eager_defaults": "auto", "version_id_col": version}
     
     # Relationships
     members = relationship(
@@ -82,3 +95,76 @@ class Project(Base):
     def __repr__(self):
         return (f"<Project(id={self.id}, title='{self.title}', "
                 f"status='{self.status}')>")
+
+
+class Tombstone(Base):
+    """Record of a deleted member or project, kept for the change feed"""
+    __tablename__ = "tombstones"
+    
+    id = Column(Integer, primary_key=True)
+    entity_type = Column(String(20), nullable=False)  # member, project
+    entity_id = Column(Integer, nullable=False)
+    deleted_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    
+    def __repr__(self):
+        return (f"<Tombstone(entity_type='{self.entity_type}', "
+                f"entity_id={self.entity_id})>")
+
+
+class IdempotencyKey(Base):
+    """Stored response for a POST request retried with the same Idempotency-Key"""
+    __tablename__ = "idempotency_keys"
+    
+    key = Column(String(255), primary_key=True)
+    fingerprint = Column(String(64), nullable=False)
+    status_code = Column(Integer, nullable=True)  # NULL while in progress
+    response_body = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    
+    def __repr__(self):
+        return (f"<IdempotencyKey(key='{self.key}', "
+                f"status_code={self.status_code})>")
+
+
+class ProjectListing(Base):
+    """Denormalized read model of a project with its member summaries"""
+    __tablename__ = "project_listings"
+    
+    project_id = Column(Integer, primary_key=True)
+    status = Column(String(50), nullable=True, index=True)
+    payload = Column(Text, nullable=False)  # Project schema as JSON
+    
+    # The default list only pages through projects that are not archived, so
+    # it only walks this index however many finished projects pile up
+    __table_args__ = (
+        Index(
+            "ix_project_listings_hot", "project_id",
+            sqlite_where=status.not_in(ARCHIVED_PROJECT_STATUSES),
+            postgresql_where=status.not_in(ARCHIVED_PROJECT_STATUSES),
+        ),
+    )
+    
+    def __repr__(self):
+        return f"<ProjectListing(project_id={self.project_id})>"
+
+
+class Image(Base):
+    """Uploaded image of a member or project, stored by content digest"""
+    __tablename__ = "images"
+    __table_args__ = (Index("ix_images_entity", "entity_type", "entity_id"),)
+    __mapper_args__ = {"eager_defaults": "auto"}
+    
+    id = Column(Integer, primary_key=True)
+    entity_type = Column(String(20), nullable=False)  # member, project
+    entity_id = Column(Integer, nullable=False)
+    digest = Column(String(64), nullable=False)  # SHA-256 of the file
+    extension = Column(String(10), nullable=False)
+    content_type = Column(String(50), nullable=False)
+    size = Column(Integer, nullable=False)
+    width = Column(Integer, nullable=True)
+    height = Column(Integer, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    def __repr__(self):
+        return (f"<Image(entity_type='{self.entity_type}', "
+                f"entity_id={self.entity_id}, digest='{self.digest[:12]}')>")
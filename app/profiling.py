@@ -0,0 +1,197 @@
+"""On-demand sampling profiler.
+
+A daemon thread snapshots the stack of every thread with
+``sys._current_frames()`` at a fixed interval and counts identical stacks.
+Nothing is traced between samples, so the overhead is a few microseconds
+per thread per sample and the profiler is safe to run on a production
+replica; intervals are at least 5 ms and only one profiler samples a
+process at a time, which keeps the sampling thread off the GIL. Profiles cover either a fixed duration or the next N requests to a
+route, and are rendered as collapsed stacks (for ``flamegraph.pl`` and
+speedscope) or as a native speedscope file.
+"""
+import asyncio
+import os
+import sys
+import sysconfig
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+MAX_DURATION_SECONDS = 60
+MIN_INTERVAL_SECONDS = 0.005
+DEFAULT_INTERVAL_SECONDS = 0.01
+MAX_STACK_DEPTH = 128
+
+_PATH_PREFIXES = sorted(
+    {os.path.dirname(os.path.dirname(os.path.abspath(__file__)))}
+    | {p for p in sysconfig.get_paths().values() if p},
+    key=len,
+    reverse=True,
+)
+
+
+class ProfilerBusyError(RuntimeError):
+    """Raised when a profile is requested while another one is running"""
+
+
+# Held by the profiler that is sampling this process
+_sampling = threading.Lock()
+
+
+def _short_path(filename: str) -> str:
+    for prefix in _PATH_PREFIXES:
+        if filename.startswith(prefix + os.sep):
+            return filename[len(prefix) + 1:]
+    return filename
+
+
+class SamplingProfiler:
+    def __init__(self, interval: float = DEFAULT_INTERVAL_SECONDS,
+                 route: Optional[str] = None):
+        self.interval = max(interval, MIN_INTERVAL_SECONDS)
+        # When set, only sample while a request under this prefix is running
+        self.route = route
+        self.in_flight = 0
+        self.completed = 0
+        self.samples = 0
+        self.duration = 0.0
+        self.stacks: Counter = Counter()
+        self._frame_names: Dict[object, str] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _frame_name(self, code) -> str:
+        name = self._frame_names.get(code)
+        if name is None:
+            name = f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})"
+            # Semicolons separate frames in the collapsed format
+            name = self._frame_names[code] = name.replace(";", ":")
+        return name
+
+    def _sample(self) -> None:
+        own_id = threading.get_ident()
+        thread_names = {t.ident: t.name for t in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            stack = []
+            while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                stack.append(self._frame_name(frame.f_code))
+                frame = frame.f_back
+            stack.append(thread_names.get(thread_id, str(thread_id)))
+            self.stacks[tuple(reversed(stack))] += 1
+        self.samples += 1
+
+    def _run(self) -> None:
+        started = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            if self.route is None or self.in_flight > 0:
+                self._sample()
+        self.duration = time.perf_counter() - started
+
+    def start(self) -> None:
+        if not _sampling.acquire(blocking=False):
+            raise ProfilerBusyError("A profile is already running")
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+            _sampling.release()
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's collapsed-stack format, one stack per line"""
+        return "".join(
+            f"{';'.join(stack)} {count}\n" for stack, count in self.stacks.most_common()
+        )
+
+    def speedscope(self) -> dict:
+        """A sampled profile in speedscope's file format"""
+        frame_index: Dict[str, int] = {}
+        samples: List[List[int]] = []
+        weights: List[float] = []
+        for stack, count in self.stacks.most_common():
+            samples.append([frame_index.setdefault(name, len(frame_index)) for name in stack])
+            weights.append(round(count * self.interval, 6))
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": [{"name": name} for name in frame_index]},
+            "profiles": [{
+                "type": "sampled",
+                "name": f"lamfo-api {self.route or 'all requests'}",
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": round(sum(weights), 6),
+                "samples": samples,
+                "weights": weights,
+            }],
+            "name": "lamfo-api",
+            "exporter": "lamfo-api",
+        }
+
+
+class ProfilerSession:
+    """The single profile allowed to run in this process at a time"""
+
+    def __init__(self):
+        self.active: Optional[SamplingProfiler] = None
+        self.target_requests = 0
+        self.done: Optional[asyncio.Event] = None
+
+    async def run(self, seconds: float, interval: float = DEFAULT_INTERVAL_SECONDS,
+                  route: Optional[str] = None, requests: int = 0) -> SamplingProfiler:
+        """Profile for `seconds`, or until `requests` requests to `route` finish"""
+        if self.active is not None:
+            raise ProfilerBusyError("A profile is already running")
+        profiler = SamplingProfiler(interval, route if requests else None)
+        profiler.start()
+        self.active = profiler
+        self.target_requests = requests
+        self.done = asyncio.Event()
+        try:
+            await asyncio.wait_for(self.done.wait(), min(seconds, MAX_DURATION_SECONDS))
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            profiler.stop()
+            self.active = None
+        return profiler
+
+    def request_started(self, path: str) -> Optional[SamplingProfiler]:
+        """The profiler to notify when the request finishes, if it is tracked"""
+        profiler = self.active
+        if profiler is None or profiler.route is None or not path.startswith(profiler.route):
+            return None
+        profiler.in_flight += 1
+        return profiler
+
+    def request_finished(self, profiler: SamplingProfiler) -> None:
+        profiler.in_flight -= 1
+        profiler.completed += 1
+        if profiler is self.active and profiler.completed >= self.target_requests:
+            self.done.set()
+
+
+session = ProfilerSession()
+
+
+class ProfilingMiddleware:
+    """Tell a route-scoped profile when matching requests start and finish"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if session.active is None or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        profiler = session.request_started(scope["path"])
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if profiler is not None:
+                session.request_finished(profiler)
@@ -0,0 +1,232 @@
+"""Token-bucket rate limiting for the public API.
+
+Clients are identified by their ``X-API-Key`` header when it is one of the
+configured ``RATE_LIMIT_API_KEYS``, and otherwise by their IP address (which uvicorn resolves from the proxy
+headers when run with ``--proxy-headers``). Buckets live in memory, or in
+a Redis-protocol server so all replicas share one budget per client; while
+that server is unreachable requests are let through rather than failed.
+Responses carry ``RateLimit-Limit``, ``RateLimit-Remaining`` and
+``RateLimit-Reset`` headers.
+"""
+import hashlib
+import logging
+import math
+import threading
+import time
+from typing import AbstractSet, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from app.database import settings
+from app.deadlines import send_unavailable
+from app.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMITED_PATH_PREFIXES = ("/members", "/projects")
+
+limited_counter = registry.counter(
+    "lamfo_rate_limited_requests_total", "Requests rejected by the rate limiter"
+)
+
+
+class BucketState(NamedTuple):
+    allowed: bool
+    remaining: int
+    # Seconds until the bucket is full again, and until one token is available
+    reset: float
+    retry_after: float
+
+
+def _refill(tokens: float, last: float, now: float, capacity: int,
+            rate: float) -> float:
+    return min(capacity, tokens + (now - last) * rate)
+
+
+def _state(allowed: bool, tokens: float, capacity: int, rate: float) -> BucketState:
+    return BucketState(
+        allowed=allowed,
+        remaining=int(tokens),
+        reset=(capacity - tokens) / rate,
+        retry_after=0 if tokens >= 1 else (1 - tokens) / rate,
+    )
+
+
+class MemoryBucketStore:
+    """O(1) per-process buckets with periodic eviction of idle clients"""
+
+    # Cheap enough to call on the event loop
+    blocking = False
+
+    def __init__(self, evict_interval: float = 60):
+        self.evict_interval = evict_interval
+        self._buckets: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+        self._next_eviction = time.monotonic() + evict_interval
+
+    def hit(self, key: str, capacity: int, rate: float) -> BucketState:
+        now = time.monotonic()
+        with self._lock:
+            if now >= self._next_eviction:
+                self._evict(now, capacity / rate)
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [capacity, now]
+            tokens = _refill(bucket[0], bucket[1], now, capacity, rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            bucket[0], bucket[1] = tokens, now
+        return _state(allowed, tokens, capacity, rate)
+
+    def _evict(self, now: float, refill_time: float) -> None:
+        # A bucket idle for a full refill is full again, so it is
+        # indistinguishable from a new one and can be dropped
+        idle = [k for k, (_, last) in self._buckets.items() if now - last >= refill_time]
+        for key in idle:
+            del self._buckets[key]
+        self._next_eviction = now + self.evict_interval
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+# Atomic refill-and-take on the server. Returns {allowed, tokens * 1000}.
+_REDIS_TOKEN_BUCKET = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000))
+return {allowed, math.floor(tokens * 1000)}
+"""
+
+
+class RedisBucketStore:
+    """Buckets shared by all replicas through a Redis-protocol server"""
+
+    # Each hit is a network round trip, so it runs in the threadpool
+    blocking = True
+
+    def __init__(self, client, prefix: str = "lamfo:ratelimit"):
+        self.client = client
+        self.prefix = prefix
+        self._script = client.register_script(_REDIS_TOKEN_BUCKET)
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisBucketStore":
+        import redis
+
+        return cls(redis.Redis.from_url(url))
+
+    def hit(self, key: str, capacity: int, rate: float) -> Optional[BucketState]:
+        """Take a token, or return None when the server cannot be reached"""
+        from redis import RedisError
+
+        try:
+            allowed, millitokens = self._script(
+                keys=[f"{self.prefix}:{key}"], args=[capacity, rate, time.time()]
+            )
+        except RedisError as e:
+            logger.error(f"Rate limit store unavailable, allowing request: {e}")
+            return None
+        return _state(bool(allowed), millitokens / 1000, capacity, rate)
+
+    def clear(self) -> None:
+        for key in self.client.scan_iter(f"{self.prefix}:*"):
+            self.client.delete(key)
+
+
+def parse_api_keys(value: str) -> AbstractSet[bytes]:
+    """Split a comma-separated RATE_LIMIT_API_KEYS value"""
+    return frozenset(key.strip().encode() for key in value.split(",") if key.strip())
+
+
+def client_key(scope, api_keys: AbstractSet[bytes] = frozenset()) -> str:
+    """Identify the client by a known API key, falling back to its IP address.
+
+    Unknown keys are ignored: otherwise a client could send a new key with
+    every request and get a fresh bucket each time.
+    """
+    for name, value in scope["headers"]:
+        if name == b"x-api-key" and value in api_keys:
+            return "key:" + hashlib.sha256(value).hexdigest()[:32]
+    client = scope.get("client")
+    return "ip:" + (client[0] if client else "unknown")
+
+
+class RateLimitMiddleware:
+    """ASGI middleware applying a token bucket per client"""
+
+    def __init__(
+        self,
+        app,
+        store,
+        capacity: int,
+        rate: float,
+        path_prefixes: Tuple[str, ...] = RATE_LIMITED_PATH_PREFIXES,
+        api_keys: Iterable[bytes] = (),
+    ):
+        self.app = app
+        self.store = store
+        self.capacity = capacity
+        self.rate = rate
+        self.path_prefixes = path_prefixes
+        self.api_keys = frozenset(api_keys)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefixes):
+            await self.app(scope, receive, send)
+            return
+
+        key = client_key(scope, self.api_keys)
+        if self.store.blocking:
+            state = await run_in_threadpool(self.store.hit, key, self.capacity, self.rate)
+        else:
+            state = self.store.hit(key, self.capacity, self.rate)
+        if state is None:
+            # Fail open: an outage of the store must not take the API down
+            await self.app(scope, receive, send)
+            return
+
+        headers = [
+            (b"ratelimit-limit", str(self.capacity).encode()),
+            (b"ratelimit-remaining", str(state.remaining).encode()),
+            (b"ratelimit-reset", str(math.ceil(state.reset)).encode()),
+        ]
+        if not state.allowed:
+            limited_counter.inc()
+            await send_unavailable(
+                send, "Rate limit exceeded", status_code=429,
+                retry_after=math.ceil(state.retry_after), headers=headers
+            )
+            return
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+
+def create_bucket_store():
+    if settings.RATE_LIMIT_BACKEND == "redis":
+        return RedisBucketStore.from_url(settings.CACHE_URL)
+    return MemoryBucketStore()
+
+
+store: Optional[object] = create_bucket_store() if settings.RATE_LIMIT_ENABLED else None
@@ -0,0 +1,128 @@
+"""Cache of fully encoded list responses.
+
+Entries are keyed by route, query parameters and a data version that every
+committed write bumps, and hold the final JSON bytes with their ETag, so a
+hit skips validation and encoding entirely. Total size is capped with LRU
+eviction.
+
+The version is only bumped by writes this process hears about, which with
+the in-memory event backend means its own. Entries therefore also expire
+after ``CACHE_TTL_SECONDS``, bounding how long a replica keeps serving a
+page another replica has since changed.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, NamedTuple, Optional
+
+from fastapi import Request, Response
+
+from app.cache import JSONCodec
+from app.database import settings
+from app.events import broker
+from app.metrics import registry
+
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+hits = registry.counter(
+    "lamfo_response_cache_hits_total", "List responses served from encoded bytes"
+)
+misses = registry.counter(
+    "lamfo_response_cache_misses_total", "List responses that had to be encoded"
+)
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+    # time.monotonic() after which the entry is no longer served
+    expires: float
+
+
+class ResponseCache:
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, ttl: float = 300):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self.version = 0
+        self._entries: "OrderedDict[tuple, CachedResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, route: str, params: Dict[str, Any]) -> tuple:
+        return (route, tuple(sorted(params.items())), self.version)
+
+    def get(self, key: tuple) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() >= entry.expires:
+                del self._entries[key]
+                self.size -= len(entry.body)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: tuple, body: bytes) -> CachedResponse:
+        etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        entry = CachedResponse(body, etag, time.monotonic() + self.ttl)
+        if len(body) > self.max_bytes:
+            return entry
+        with self._lock:
+            if key[-1] != self.version:
+                # The data changed while this response was being built
+                return entry
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous.body)
+            self._entries[key] = entry
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted.body)
+        return entry
+
+    def bump_version(self) -> None:
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+            self.size = 0
+
+    def clear(self) -> None:
+        self.bump_version()
+
+
+response_cache = ResponseCache(ttl=settings.CACHE_TTL_SECONDS)
+_codec = JSONCodec()
+
+
+def cached_response(
+    request: Request, route: str, params: Dict[str, Any], build: Callable[[], Any]
+) -> Response:
+    """Serve `build()` as JSON from the encoded response cache.
+
+    `build` may return already encoded JSON as ``bytes``.
+    """
+    key = response_cache.key(route, params)
+    entry = response_cache.get(key)
+    if entry is None:
+        misses.inc(route=route)
+        body = build()
+        if not isinstance(body, bytes):
+            body = _codec.encode(body)
+        entry = response_cache.put(key, body)
+    else:
+        hits.inc(route=route)
+
+    headers = {"ETag": entry.etag}
+    if request.headers.get("if-none-match") == entry.etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+def _bump_on_change(event: Dict[str, Any]) -> None:
+    response_cache.bump_version()
+
+
+broker.add_listener(_bump_on_change)
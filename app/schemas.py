@@ -1,18 +1,16 @@
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field, computed_field, model_validator
 from typing import List, Optional
 from datetime import datetime
 import logging
 
 from app.models import MemberRole, ProjectStatus
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Try to import EmailStr and HttpUrl, fall back to str if not available
 try:
     from pydantic import EmailStr, HttpUrl
-    logger.info("Successfully imported EmailStr and HttpUrl from pydantic")
+    logger.debug("Successfully imported EmailStr and HttpUrl from pydantic")
 except ImportError:
     logger.warning("email-validator not installed, using str types instead of EmailStr")
     # Create fallback types that are just aliases for str
@@ -45,6 +43,7 @@ class Member(MemberBase):
     id: int
     created_at: datetime
     updated_at: Optional[datetime] = None
+    version: int = 1
     projects: List["ProjectSummary"] = []
 
 # Project schemas
@@ -64,7 +63,20 @@ class ProjectUpdate(BaseModel):
     status: Optional[str] = None
     github_url: Optional[HttpUrl] = None
     demo_url: Optional[HttpUrl] = None
+    # Either replace the whole member list or patch it incrementally
     member_ids: Optional[List[int]] = None
+    add_member_ids: Optional[List[int]] = None
+    remove_member_ids: Optional[List[int]] = None
+
+    @model_validator(mode="after")
+    def check_member_operations(self):
+        if self.member_ids is not None and (
+            self.add_member_ids or self.remove_member_ids
+        ):
+            raise ValueError(
+                "member_ids cannot be combined with add_member_ids/remove_member_ids"
+            )
+        return self
 
 class ProjectSummary(BaseModel):
     model_config = ConfigDict(from_attributes=True)
@@ -79,6 +91,7 @@ class Project(ProjectBase):
     id: int
     created_at: datetime
     updated_at: Optional[datetime] = None
+    version: int = 1
     members: List["MemberSummary"] = []
 
 class MemberSummary(BaseModel):
@@ -89,6 +102,63 @@ class MemberSummary(BaseModel):
     email: str
     role: Optional[str] = None
 
+# Change feed schemas
+class Tombstone(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    
+    entity_type: str
+    entity_id: int
+    deleted_at: datetime
+
+class ChangeFeed(BaseModel):
+    members: List[Member] = []
+    projects: List[Project] = []
+    deleted: List[Tombstone] = []
+    next_token: str
+    has_more: bool = False
+
+# Image schemas
+class Image(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    
+    id: int
+    entity_type: str
+    entity_id: int
+    digest: str
+    extension: str
+    content_type: str
+    size: int
+    width: Optional[int] = None
+    height: Optional[int] = None
+    created_at: datetime
+    
+    @computed_field
+    @property
+    def url(self) -> str:
+        return f"/media/{self.digest}.{self.extension}"
+    
+    @computed_field
+    @property
+    def thumbnail_url(self) -> str:
+        return f"/media/{self.digest}-thumb.webp"
+
+# Batch lookup schemas
+MAX_BATCH_IDS = 100
+
+class BatchGetRequest(BaseModel):
+    ids: List[int] = Field(min_length=1, max_length=MAX_BATCH_IDS)
+
+class MemberBatch(BaseModel):
+    items: List[Member] = []
+    missing: List[int] = []
+
+class ProjectBatch(BaseModel):
+    items: List[Project] = []
+    missing: List[int] = []
+
 # Update forward references
 Member.model_rebuild()
-Project.model_rebuild()
\ No newline at end of file
+Project.model_rebuild()
+ChangeFeed.model_rebuild()
+MemberBatch.model_rebuild()
+ProjectBatch.model_rebuild()
\ No newline at end of file
@@ -0,0 +1,194 @@
+"""Export the public API as a directory of static, precompressed JSON files.
+
+Usage:
+    python -m app.snapshot OUTPUT_DIR [--full]
+
+Every public GET route is rendered to a file next to a gzip copy for
+``gzip_static``, and ``manifest.json`` records the ETag of each file and the
+watermark of the export. Later runs only re-render entities changed since
+that watermark and remove the files of deleted ones. Rows are streamed from
+the database in batches, so memory does not grow with the catalogue.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Set
+
+from sqlalchemy import DateTime, func, or_, select
+from sqlalchemy.orm import Session, selectinload
+
+from app import schemas
+from app.crud import CHANGE_FEED_OVERLAP, change_horizon
+from app.database import get_session_local
+from app.models import (
+    ARCHIVED_PROJECT_STATUSES, Member, Project, Tombstone, member_project_association
+)
+
+MANIFEST_NAME = "manifest.json"
+# Rows fetched per round trip while streaming
+BATCH_SIZE = 500
+# Items in the list pages, matching the API's default `limit`
+LIST_PAGE_SIZE = 100
+
+
+class SnapshotWriter:
+    def __init__(self, output_dir: str):
+        self.output_dir = output_dir
+        self.manifest = self._load_manifest()
+        self.written = 0
+        self.removed = 0
+
+    def _load_manifest(self) -> dict:
+        path = os.path.join(self.output_dir, MANIFEST_NAME)
+        if not os.path.exists(path):
+            return {"generated_at": None, "files": {}}
+        with open(path) as f:
+            return json.load(f)
+
+    @property
+    def watermark(self) -> Optional[datetime]:
+        generated_at = self.manifest.get("generated_at")
+        return datetime.fromisoformat(generated_at) if generated_at else None
+
+    def _replace(self, path: str, data: bytes) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def write(self, name: str, body: bytes) -> None:
+        """Write `name` and its gzip copy, skipping unchanged content"""
+        etag = hashlib.sha256(body).hexdigest()[:32]
+        if self.manifest["files"].get(name, {}).get("etag") == etag:
+            return
+        path = os.path.join(self.output_dir, name)
+        self._replace(path, body)
+        self._replace(f"{path}.gz", gzip.compress(body, mtime=0))
+        self.manifest["files"][name] = {"etag": etag, "size": len(body)}
+        self.written += 1
+
+    def remove(self, name: str) -> None:
+        if self.manifest["files"].pop(name, None) is None:
+            return
+        for path in (name, f"{name}.gz"):
+            try:
+                os.unlink(os.path.join(self.output_dir, path))
+            except FileNotFoundError:
+                pass
+        self.removed += 1
+
+    def save_manifest(self, generated_at: datetime) -> None:
+        self.manifest["generated_at"] = generated_at.isoformat()
+        body = json.dumps(self.manifest, indent=2, sort_keys=True).encode()
+        self._replace(os.path.join(self.output_dir, MANIFEST_NAME), body)
+
+
+def _stream(db: Session, stmt) -> Iterable:
+    return db.execute(stmt.execution_options(yield_per=BATCH_SIZE)).scalars()
+
+
+def _changed_ids(db: Session, model, cutoff: datetime) -> Set[int]:
+    return set(db.scalars(
+        select(model.id).where(or_(model.created_at >= cutoff, model.updated_at >= cutoff))
+    ))
+
+
+def _linked_ids(db: Session, ids: Set[int], from_column, to_column) -> Set[int]:
+    if not ids:
+        return set()
+    return set(db.scalars(select(to_column).where(from_column.in_(ids))))
+
+
+def _write_list(writer: SnapshotWriter, name: str, items: Iterable, schema) -> None:
+    body = b"[" + b",".join(
+        schema.model_validate(item).model_dump_json().encode() for item in items
+    ) + b"]"
+    writer.write(name, body)
+
+
+def export_snapshot(db: Session, output_dir: str, full: bool = False) -> Dict[str, int]:
+    """Render the public API into `output_dir` and return write counts"""
+    writer = SnapshotWriter(output_dir)
+    started_at = db.scalar(select(func.now(type_=DateTime(timezone=True))))
+    # Changes still uncommitted in older transactions are stamped before now()
+    horizon = change_horizon(db)
+    if horizon is not None:
+        started_at = min(started_at, horizon)
+    since = None if full else writer.watermark
+
+    member_stmt = select(Member).options(selectinload(Member.projects)).order_by(Member.id)
+    project_stmt = select(Project).options(selectinload(Project.members)).order_by(Project.id)
+
+    if since is not None:
+        cutoff = since - CHANGE_FEED_OVERLAP
+        member_ids = _changed_ids(db, Member, cutoff)
+        project_ids = _changed_ids(db, Project, cutoff)
+        # Summaries of the other side are embedded in each file
+        linked_members = _linked_ids(
+            db, project_ids,
+            member_project_association.c.project_id, member_project_association.c.member_id
+        )
+        linked_projects = _linked_ids(
+            db, member_ids,
+            member_project_association.c.member_id, member_project_association.c.project_id
+        )
+        member_stmt = member_stmt.where(Member.id.in_(member_ids | linked_members))
+        project_stmt = project_stmt.where(Project.id.in_(project_ids | linked_projects))
+
+        for tombstone in _stream(db, select(Tombstone).where(Tombstone.deleted_at >= cutoff)):
+            writer.remove(f"{tombstone.entity_type}s/{tombstone.entity_id}.json")
+
+    for member in _stream(db, member_stmt):
+        writer.write(
+            f"members/{member.id}.json",
+            schemas.Member.model_validate(member).model_dump_json().encode()
+        )
+    for project in _stream(db, project_stmt):
+        writer.write(
+            f"projects/{project.id}.json",
+            schemas.Project.model_validate(project).model_dump_json().encode()
+        )
+
+    _write_list(
+        writer, "members/index.json",
+        _stream(db, select(Member).options(selectinload(Member.projects))
+                .order_by(Member.id).limit(LIST_PAGE_SIZE)),
+        schemas.Member
+    )
+    # Like GET /projects/, the list leaves out archived projects
+    _write_list(
+        writer, "projects/index.json",
+        _stream(db, select(Project).options(selectinload(Project.members))
+                .where(or_(Project.status.is_(None),
+                           Project.status.not_in(ARCHIVED_PROJECT_STATUSES)))
+                .order_by(Project.id).limit(LIST_PAGE_SIZE)),
+        schemas.Project
+    )
+
+    writer.save_manifest(started_at)
+    return {"written": writer.written, "removed": writer.removed}
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("output_dir", help="Directory to write the snapshot to")
+    parser.add_argument(
+        "--full", action="store_true", help="Re-render everything, ignoring the manifest"
+    )
+    args = parser.parse_args(argv)
+
+    db = get_session_local()()
+    try:
+        counts = export_snapshot(db, args.output_dir, full=args.full)
+    finally:
+        db.close()
+    print(f"✅ Snapshot written to {args.output_dir}: "
+          f"{counts['written']} files updated, {counts['removed']} removed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Compare write throughput with and without group commit.
+
+Usage:
+    python scripts/bench_group_commit.py [--writes N] [--threads N] [--url URL]
+
+Concurrent threads create members through the CRUD layer, once committing
+each write on its own and once through a WriteBatcher. Runs against a
+temporary file-backed SQLite database unless --url names another database,
+which must already have the tables (its members are not cleaned up).
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine  # noqa: E402
+
+import app.crud as crud  # noqa: E402
+import app.schemas as schemas  # noqa: E402
+from app.batching import WriteBatcher, batches_counter  # noqa: E402
+from app.database import create_session_factory, create_sqlite_engine  # noqa: E402
+from app.models import Base  # noqa: E402
+
+
+def member(run: str, i: int) -> schemas.MemberCreate:
+    return schemas.MemberCreate(name=f"Member {i}", email=f"{run}-{i}@example.com")
+
+
+def run(write, writes: int, threads: int) -> float:
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(write, range(writes)))
+    return writes / (time.perf_counter() - started)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--writes", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--max-items", type=int, default=50)
+    parser.add_argument("--max-wait-ms", type=float, default=5)
+    parser.add_argument("--url", help="Database URL (default: a temporary SQLite file)")
+    args = parser.parse_args(argv)
+
+    if args.url:
+        engine = create_engine(args.url, pool_size=args.threads)
+    else:
+        path = os.path.join(tempfile.mkdtemp(prefix="lamfo-bench-"), "bench.db")
+        engine = create_sqlite_engine(f"sqlite:///{path}")
+        Base.metadata.create_all(bind=engine)
+    factory = create_session_factory(engine)
+    run_id = str(int(time.time()))
+
+    def write_alone(i):
+        with factory() as db:
+            crud.create_member(db, member(f"alone-{run_id}", i))
+
+    batcher = WriteBatcher(factory, args.max_items, args.max_wait_ms / 1000)
+
+    def write_batched(i):
+        batcher.submit(lambda db: crud.create_member(db, member(f"batched-{run_id}", i)))
+
+    alone = run(write_alone, args.writes, args.threads)
+    batched = run(write_batched, args.writes, args.threads)
+    batcher.stop()
+    print(f"{engine.dialect.name}, {args.writes} creates from {args.threads} threads")
+    print(f"  one commit per write: {alone:8.0f} writes/s")
+    print(f"  group commit:         {batched:8.0f} writes/s "
+          f"({args.writes / batches_counter.value():.1f} writes per commit)")
+
+
+if __name__ == "__main__":
+    main()
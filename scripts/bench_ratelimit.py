@@ -0,0 +1,65 @@
+"""Measure the per-request overhead of the rate-limit middleware.
+
+Usage:
+    python scripts/bench_ratelimit.py [--requests N] [--clients N] [--redis URL]
+
+Drives a bare ASGI app directly, with and without RateLimitMiddleware, so the
+difference is the limiter's own cost rather than routing or serialization.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.ratelimit import MemoryBucketStore, RateLimitMiddleware, RedisBucketStore  # noqa: E402
+
+
+async def bare_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"[]"})
+
+
+async def receive():
+    return {"type": "http.request", "body": b""}
+
+
+async def send(message):
+    pass
+
+
+async def run(app, requests: int, clients: int) -> float:
+    scopes = [
+        {"type": "http", "path": "/members/", "headers": [],
+         "client": (f"10.0.{i // 256}.{i % 256}", 1234)}
+        for i in range(clients)
+    ]
+    started = time.perf_counter()
+    for i in range(requests):
+        await app(scopes[i % clients], receive, send)
+    return (time.perf_counter() - started) / requests
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200_000)
+    parser.add_argument("--clients", type=int, default=10_000)
+    parser.add_argument("--redis", help="Benchmark the Redis store at this URL")
+    args = parser.parse_args(argv)
+
+    store = RedisBucketStore.from_url(args.redis) if args.redis else MemoryBucketStore()
+    # Large enough that nothing is rejected, so both runs do the same work
+    limited = RateLimitMiddleware(bare_app, store=store, capacity=10**9, rate=10**9)
+
+    baseline = asyncio.run(run(bare_app, args.requests, args.clients))
+    with_limiter = asyncio.run(run(limited, args.requests, args.clients))
+    print(f"{type(store).__name__}, {args.requests} requests over {args.clients} clients")
+    print(f"  baseline:     {baseline * 1e6:8.2f} µs/request")
+    print(f"  rate limited: {with_limiter * 1e6:8.2f} µs/request")
+    print(f"  overhead:     {(with_limiter - baseline) * 1e6:8.2f} µs/request")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Run thousands of API requests in-process and check that memory stays bounded.
+
+Usage:
+    python scripts/soak_test.py [--requests N] [--max-growth-mb MB]
+
+The app runs against a temporary SQLite database with rate limiting off.
+After a warm-up round, traced Python memory, RSS and the number of live
+database sessions are measured, the main workload is replayed, and the
+script exits non-zero if traced memory grew by more than the allowed budget
+or sessions were left alive. The read and response caches are emptied before
+each measurement: they are bounded, but stale generations linger in them
+until evicted and would otherwise hide or fake a leak.
+"""
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import tracemalloc
+
+_db_dir = tempfile.mkdtemp(prefix="lamfo-soak-")
+os.environ.update({
+    "TEST_MODE": "true",
+    "SQLITE_URL": f"sqlite:///{_db_dir}/soak.db",
+    "RATE_LIMIT_ENABLED": "false",
+    "LOG_LEVEL": "WARNING",
+})
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app import memory  # noqa: E402
+from app.cache import cache  # noqa: E402
+from app.main import app  # noqa: E402
+from app.response_cache import response_cache  # noqa: E402
+
+MEMBERS = 50
+PROJECTS = 20
+
+
+def seed(client: TestClient) -> None:
+    member_ids = [
+        client.post("/members/", json={
+            "name": f"Member {i}", "email": f"soak{i}@example.com", "role": "Researcher",
+        }).json()["id"]
+        for i in range(MEMBERS)
+    ]
+    for i in range(PROJECTS):
+        client.post("/projects/", json={
+            "title": f"Project {i}", "member_ids": member_ids[i::PROJECTS],
+        })
+
+
+def workload(client: TestClient, requests: int) -> None:
+    for i in range(requests):
+        step = i % 8
+        if step == 0:
+            client.get("/members/")
+        elif step == 1:
+            client.get("/projects/")
+        elif step == 2:
+            client.get(f"/members/{i % MEMBERS + 1}")
+        elif step == 3:
+            client.get(f"/projects/{i % PROJECTS + 1}")
+        elif step == 4:
+            client.get("/members", params={"ids": "1,2,3,999"})
+        elif step == 5:
+            # Writes invalidate the caches, so reads keep hitting the database
+            client.put(
+                f"/members/{i % MEMBERS + 1}", json={"bio": f"bio {i}"},
+                headers={"If-Match": "*"}
+            )
+        elif step == 6:
+            client.get("/changes")
+        else:
+            client.get("/health")
+
+
+def measure() -> dict:
+    if cache is not None:
+        cache.clear()
+    response_cache.clear()
+    gc.collect()
+    return {
+        "traced_bytes": tracemalloc.get_traced_memory()[0],
+        "rss_bytes": memory.resident_memory_bytes(),
+        **memory.session_stats(),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--max-growth-mb", type=float, default=5.0)
+    args = parser.parse_args(argv)
+
+    tracemalloc.start()
+    with TestClient(app) as client:
+        seed(client)
+        workload(client, args.requests // 5)
+        before = measure()
+        workload(client, args.requests)
+        after = measure()
+
+    mib = 1024 * 1024
+    growth = (after["traced_bytes"] - before["traced_bytes"]) / mib
+    print(f"{args.requests} requests")
+    print(f"  traced memory: {before['traced_bytes'] / mib:.1f} -> "
+          f"{after['traced_bytes'] / mib:.1f} MiB ({growth:+.2f} MiB)")
+    print(f"  RSS:           {before['rss_bytes'] / mib:.1f} -> {after['rss_bytes'] / mib:.1f} MiB")
+    print(f"  live sessions: {before['live_sessions']} -> {after['live_sessions']} "
+          f"({after['identity_map_objects']} objects in identity maps)")
+
+    failures = []
+    if growth > args.max_growth_mb:
+        failures.append(f"traced memory grew by {growth:.2f} MiB")
+    if after["live_sessions"] > before["live_sessions"]:
+        failures.append("database sessions were left alive")
+    for failure in failures:
+        print(f"❌ {failure}")
+    if not failures:
+        print("✅ Memory stayed bounded")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
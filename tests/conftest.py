@@ -6,6 +6,8 @@ import tempfile
 
 # Set the TEST_MODE environment variable before importing any app modules
 os.environ["TEST_MODE"] = "true"
+# Tests run in one process, so the per-process read cache is always fresh
+os.environ.setdefault("CACHE_BACKEND", "memory")
 
 # Add the project root directory to Python path so 'app' module can be found
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -13,43 +15,59 @@ if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine, text
-from sqlalchemy.orm import sessionmaker
 
 # Now import from the app modules
 from app.main import app
-from app.database import get_db
+from app.cache import cache
+from app import ratelimit
+from app.database import create_session_factory, create_sqlite_engine, get_db
+from app.response_cache import response_cache
 from app.models import Base, Member, Project
 
+@pytest.fixture(autouse=True)
+def reset_caches():
+    """Start every test with empty process-wide caches"""
+    if cache is not None:
+        cache.clear()
+    response_cache.clear()
+    if ratelimit.store is not None:
+        ratelimit.store.clear()
+    yield
+
 @pytest.fixture(scope="function")
 def test_engine():
-    """Create a test database engine for each test"""
+    """Create an in-memory test database engine for each test"""
+    engine = create_sqlite_engine("sqlite:///:memory:")
+    Base.metadata.create_all(bind=engine)
+    
+    yield engine
+    
+    engine.dispose()
+
+@pytest.fixture(scope="function")
+def file_engine():
+    """Create a file-backed test database engine for multi-connection tests"""
     # Create a temporary file for the test database
     with tempfile.NamedTemporaryFile(suffix='.db', delete=False) as tmp_file:
         test_db_path = tmp_file.name
     
-    # Create engine with the temporary database
-    engine = create_engine(
-        f"sqlite:///{test_db_path}",
-        connect_args={"check_same_thread": False}
-    )
-    
-    # Drop all tables if they exist and recreate them
-    Base.metadata.drop_all(bind=engine)
+    engine = create_sqlite_engine(f"sqlite:///{test_db_path}")
     Base.metadata.create_all(bind=engine)
     
     yield engine
     
     # Cleanup
-    try:
-        os.unlink(test_db_path)
-    except Exception:
-        pass
+    engine.dispose()
+    for suffix in ("", "-wal", "-shm"):
+        try:
+            os.unlink(test_db_path + suffix)
+        except Exception:
+            pass
 
 @pytest.fixture(scope="function")
 def db_session(test_engine):
     """Create a fresh database session for each test"""
-    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
+    TestingSessionLocal = create_session_factory(test_engine)
     
     session = TestingSessionLocal()
     try:
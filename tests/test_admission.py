@@ -0,0 +1,129 @@
+"""
+Test admission control, including a load test beyond saturation.
+"""
+import asyncio
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.admission import (
+    OTHER_GROUP, AdmissionControlMiddleware, in_flight_gauge, queue_depth_gauge, shed_counter
+)
+
+SERVICE_TIME = 0.02
+QUEUE_TIMEOUT = 0.1
+STREAM_TIME = 0.3
+
+
+def create_limited_app(max_in_flight=4, max_queue=8):
+    limited_app = FastAPI()
+
+    @limited_app.get("/projects/")
+    async def projects():
+        await asyncio.sleep(SERVICE_TIME)
+        return []
+
+    @limited_app.get("/events")
+    async def events():
+        # Stands in for an event stream that stays open
+        await asyncio.sleep(STREAM_TIME)
+        return []
+
+    @limited_app.get("/health")
+    async def health():
+        await asyncio.sleep(SERVICE_TIME)
+        return {"status": "healthy"}
+
+    limited_app.add_middleware(
+        AdmissionControlMiddleware,
+        max_in_flight=max_in_flight,
+        max_queue=max_queue,
+        queue_timeout=QUEUE_TIMEOUT,
+    )
+    return limited_app
+
+
+async def timed_get(ac, path):
+    started = time.perf_counter()
+    response = await ac.get(path)
+    return response.status_code, time.perf_counter() - started
+
+
+@pytest.mark.asyncio
+async def test_p99_stays_bounded_beyond_saturation():
+    """Load test: 25x the capacity keeps p99 near the queue timeout"""
+    async with httpx.AsyncClient(app=create_limited_app(), base_url="http://test") as ac:
+        results = await asyncio.gather(*(timed_get(ac, "/projects/") for _ in range(300)))
+
+    statuses = [status for status, _ in results]
+    latencies = sorted(latency for _, latency in results)
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+
+    assert statuses.count(200) >= 4
+    assert statuses.count(503) > 0
+    assert set(statuses) == {200, 503}
+    # Without admission control the last request would wait ~300 * 20ms / 4
+    assert p99 < QUEUE_TIMEOUT + 10 * SERVICE_TIME
+
+
+@pytest.mark.asyncio
+async def test_queue_full_is_shed_immediately():
+    """Test that requests beyond the queue are rejected without waiting"""
+    before = shed_counter.value(route="/projects", reason="queue_full")
+    async with httpx.AsyncClient(
+        app=create_limited_app(max_in_flight=1, max_queue=0), base_url="http://test"
+    ) as ac:
+        results = await asyncio.gather(*(timed_get(ac, "/projects/") for _ in range(5)))
+
+    assert sorted(status for status, _ in results) == [200, 503, 503, 503, 503]
+    assert shed_counter.value(route="/projects", reason="queue_full") - before == 4
+    assert queue_depth_gauge.value(route="/projects") == 0
+
+
+@pytest.mark.asyncio
+async def test_health_bypasses_limits():
+    """Test that health checks are never shed"""
+    async with httpx.AsyncClient(
+        app=create_limited_app(max_in_flight=1, max_queue=0), base_url="http://test"
+    ) as ac:
+        results = await asyncio.gather(*(timed_get(ac, "/health") for _ in range(10)))
+
+    assert all(status == 200 for status, _ in results)
+
+
+@pytest.mark.asyncio
+async def test_event_streams_do_not_hold_slots():
+    """Test that long-lived /events streams leave room for other requests"""
+    async def get_after_streams_opened(ac):
+        await asyncio.sleep(STREAM_TIME / 3)
+        return await timed_get(ac, "/projects/")
+
+    async with httpx.AsyncClient(
+        app=create_limited_app(max_in_flight=1, max_queue=0), base_url="http://test"
+    ) as ac:
+        *streams, (status, latency) = await asyncio.gather(
+            *(timed_get(ac, "/events") for _ in range(5)), get_after_streams_opened(ac)
+        )
+
+    assert all(stream_status == 200 for stream_status, _ in streams)
+    assert status == 200
+    assert latency < STREAM_TIME
+
+
+@pytest.mark.asyncio
+async def test_unknown_paths_share_one_group():
+    """Test that arbitrary paths do not create a limiter each"""
+    async with httpx.AsyncClient(app=create_limited_app(), base_url="http://test") as ac:
+        statuses = [(await ac.get(f"/x{i}")).status_code for i in range(200)]
+
+    assert set(statuses) == {404}
+    assert not any('route="/x' in line for line in in_flight_gauge.render())
+    assert in_flight_gauge.value(route=OTHER_GROUP) == 0
+
+
+def test_queue_depth_in_metrics(client):
+    """Test that admission gauges are exported"""
+    client.get("/projects/")
+    assert "lamfo_admission_queue_depth" in client.get("/metrics").text
@@ -139,8 +139,11 @@ def test_read_projects(client):
     for project_data in project_data_list:
         client.post("/projects/", json=project_data)
     
+    # Completed projects are archived and only listed on request
+    assert [p["title"] for p in client.get("/projects/").json()] == ["Project 1"]
+    
     # Now get the list of projects
-    response = client.get("/projects/")
+    response = client.get("/projects/", params={"include_archived": "true"})
     assert response.status_code == 200
     
     data = response.json()
@@ -0,0 +1,112 @@
+"""
+Test group commit of concurrent writes.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy import event, func, select
+
+import app.crud as crud
+import app.schemas as schemas
+from app import batching
+from app.database import create_session_factory, get_db
+from app.main import app
+from app.models import Member
+
+
+@pytest.fixture
+def batcher(file_engine):
+    # Long enough for every thread of a test to join the same batch
+    writer = batching.WriteBatcher(create_session_factory(file_engine), max_wait=0.2)
+    yield writer
+    writer.stop()
+
+
+def count_commits(engine):
+    commits = []
+    event.listen(engine, "commit", lambda conn: commits.append(conn))
+    return commits
+
+
+def create(batcher, email):
+    return batcher.submit(lambda db: crud.create_member(
+        db, schemas.MemberCreate(name="Batched", email=email)
+    ))
+
+
+def test_concurrent_writes_share_one_commit(batcher, file_engine):
+    commits = count_commits(file_engine)
+
+    with ThreadPoolExecutor(max_workers=10) as pool:
+        members = list(pool.map(
+            lambda i: create(batcher, f"batch{i}@example.com"), range(10)
+        ))
+
+    assert len({m.id for m in members}) == 10
+    assert len(commits) < 10
+    with create_session_factory(file_engine)() as db:
+        assert db.scalar(select(func.count()).select_from(Member)) == 10
+
+
+def test_failed_write_only_rolls_back_itself(batcher, file_engine):
+    start = threading.Barrier(3)
+
+    def create_after_barrier(email):
+        start.wait()
+        return create(batcher, email)
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        futures = [
+            pool.submit(create_after_barrier, email)
+            for email in ("same@example.com", "same@example.com", "other@example.com")
+        ]
+        errors = [f.exception() for f in futures]
+
+    assert sum(isinstance(e, crud.DuplicateEmailError) for e in errors) == 1
+    assert errors[2] is None
+    with create_session_factory(file_engine)() as db:
+        emails = set(db.scalars(select(Member.email)))
+    assert emails == {"same@example.com", "other@example.com"}
+
+
+def test_batch_max_items(file_engine):
+    writer = batching.WriteBatcher(
+        create_session_factory(file_engine), max_items=2, max_wait=0.2
+    )
+    commits = count_commits(file_engine)
+    try:
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            list(pool.map(lambda i: create(writer, f"max{i}@example.com"), range(4)))
+    finally:
+        writer.stop()
+
+    assert len(commits) >= 2
+
+
+def test_routes_write_through_batcher(client, file_engine, batcher, monkeypatch):
+    factory = create_session_factory(file_engine)
+
+    def get_file_db():
+        with factory() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = get_file_db
+    monkeypatch.setattr(batching, "batcher", batcher)
+    member = {"name": "Ada", "email": "ada@example.com"}
+
+    created = client.post("/members/", json=member)
+    duplicate = client.post("/members/", json=member)
+    project = client.post(
+        "/projects/", json={"title": "Engine", "member_ids": [created.json()["id"]]}
+    )
+    updated = client.put(
+        f"/members/{created.json()['id']}", json={"bio": "Mathematician"},
+        headers={"If-Match": "*"}
+    )
+
+    assert created.status_code == 201
+    assert duplicate.status_code == 400
+    assert project.json()["members"][0]["name"] == "Ada"
+    assert updated.json()["bio"] == "Mathematician"
+    assert [p["title"] for p in updated.json()["projects"]] == ["Engine"]
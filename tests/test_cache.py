@@ -0,0 +1,141 @@
+"""
+Test the read-through cache and its backends.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.cache import (
+    JSONCodec, MemoryCache, MsgpackCodec, ReadThroughCache, RedisCache, cache,
+    cache_backend_name
+)
+from app.database import settings
+from app.events import broker
+
+
+@pytest.mark.parametrize("events_backend, expected", [("memory", "none"), ("postgres", "memory")])
+def test_default_backend_follows_events_backend(monkeypatch, events_backend, expected):
+    """Test that a per-process cache is only the default when writes are relayed"""
+    monkeypatch.setattr(settings, "CACHE_BACKEND", "")
+    monkeypatch.setattr(settings, "EVENTS_BACKEND", events_backend)
+    assert cache_backend_name() == expected
+
+
+def test_memory_cache_ttl_and_lru():
+    """Test expiry and LRU eviction in the in-memory backend"""
+    backend = MemoryCache(max_entries=2)
+    backend.set("a", b"1", ttl=0)
+    backend.set("b", b"2", ttl=0)
+    backend.get("a")
+    backend.set("c", b"3", ttl=0)
+
+    assert backend.get("a") == b"1"
+    assert backend.get("b") is None  # least recently used
+
+    backend.set("short", b"x", ttl=1)
+    backend._data["short"] = (b"x", time.monotonic() - 1)
+    assert backend.get("short") is None
+
+
+def test_memory_cache_counters_survive_eviction():
+    """Test that the generation counter is never evicted"""
+    backend = MemoryCache(max_entries=1)
+    backend.incr("generation")
+    backend.set("a", b"1", ttl=0)
+    backend.set("b", b"2", ttl=0)
+    assert backend.get("generation") == b"1"
+
+
+def test_read_through_and_invalidate():
+    """Test that invalidation makes previously cached values unreachable"""
+    read_cache = ReadThroughCache(MemoryCache())
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return {"count": len(calls)}
+
+    assert read_cache.get_or_load("key", loader) == {"count": 1}
+    assert read_cache.get_or_load("key", loader) == {"count": 1}
+
+    read_cache.invalidate()
+    assert read_cache.get_or_load("key", loader) == {"count": 2}
+
+
+def test_concurrent_misses_are_coalesced():
+    """Test that concurrent misses on one key call the loader once"""
+    read_cache = ReadThroughCache(MemoryCache())
+    calls = []
+    barrier = threading.Barrier(10)
+
+    def loader():
+        calls.append(1)
+        time.sleep(0.05)
+        return [1, 2, 3]
+
+    def read():
+        barrier.wait()
+        return read_cache.get_or_load("projects", loader)
+
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        results = list(executor.map(lambda _: read(), range(10)))
+
+    assert results == [[1, 2, 3]] * 10
+    assert len(calls) == 1
+
+
+def test_codecs_round_trip():
+    """Test JSON and msgpack value encodings"""
+    value = {"id": 1, "name": "Test", "projects": [{"id": 2}], "bio": None}
+    assert JSONCodec().decode(JSONCodec().encode(value)) == value
+    pytest.importorskip("msgpack")
+    assert MsgpackCodec().decode(MsgpackCodec().encode(value)) == value
+
+
+def test_redis_backend_shares_entries():
+    """Test the Redis backend with two caches sharing one server"""
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    first = ReadThroughCache(RedisCache(fakeredis.FakeRedis(server=server)))
+    second = ReadThroughCache(RedisCache(fakeredis.FakeRedis(server=server)))
+
+    assert first.get_or_load("member:1", lambda: {"name": "A"}) == {"name": "A"}
+    assert second.get_or_load("member:1", lambda: {"name": "B"}) == {"name": "A"}
+
+    # An invalidation on one replica is seen by every other one
+    first.invalidate()
+    assert second.get_or_load("member:1", lambda: {"name": "B"}) == {"name": "B"}
+
+
+def test_redis_lock_is_exclusive():
+    """Test that only one process can hold the loader lock for a key"""
+    fakeredis = pytest.importorskip("fakeredis")
+    backend = RedisCache(fakeredis.FakeRedis())
+    with backend.lock("key", timeout=5) as first:
+        with backend.lock("key", timeout=5) as second:
+            assert first is True
+            assert second is False
+
+
+@pytest.mark.skipif(cache is None, reason="Cache disabled")
+def test_writes_invalidate_cached_reads(client, sample_member_data):
+    """Test that API reads reflect writes made after they were cached"""
+    member_id = client.post("/members/", json=sample_member_data).json()["id"]
+    response = client.get(f"/members/{member_id}")
+    assert response.json()["name"] == "Test User"
+
+    client.put(
+        f"/members/{member_id}", json={"name": "Updated Name"},
+        headers={"If-Match": response.headers["etag"]}
+    )
+    assert client.get(f"/members/{member_id}").json()["name"] == "Updated Name"
+
+
+@pytest.mark.skipif(cache is None, reason="Cache disabled")
+def test_change_events_invalidate_cache():
+    """Test that change events, including remote ones, invalidate the cache"""
+    cache.get_or_load("member:1", lambda: {"name": "Old"})
+    broker.dispatch({"entity": "member", "action": "updated", "id": 1})
+    assert cache.get_or_load("member:1", lambda: {"name": "New"}) == {"name": "New"}
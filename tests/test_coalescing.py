@@ -0,0 +1,107 @@
+"""
+Test single-flight coalescing of identical GET requests.
+"""
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.coalescing import CoalescingMiddleware, coalesced
+
+
+def create_slow_app(calls):
+    slow_app = FastAPI()
+
+    @slow_app.get("/projects/")
+    async def slow_projects(skip: int = 0):
+        calls.append(skip)
+        await asyncio.sleep(0.05)
+        return [{"id": skip}]
+
+    @slow_app.get("/projects/broken")
+    async def broken():
+        calls.append("broken")
+        await asyncio.sleep(0.05)
+        raise RuntimeError("boom")
+
+    slow_app.add_middleware(CoalescingMiddleware)
+    return slow_app
+
+
+@pytest.mark.asyncio
+async def test_identical_requests_share_one_execution():
+    """Test that identical concurrent GETs run the route once"""
+    calls = []
+    before = coalesced.value(path="/projects")
+    async with httpx.AsyncClient(app=create_slow_app(calls), base_url="http://test") as ac:
+        responses = await asyncio.gather(*(ac.get("/projects/") for _ in range(20)))
+
+    assert calls == [0]
+    assert all(r.status_code == 200 and r.json() == [{"id": 0}] for r in responses)
+    assert coalesced.value(path="/projects") - before == 19
+
+
+@pytest.mark.asyncio
+async def test_different_query_params_are_not_coalesced():
+    """Test that requests with different parameters run separately"""
+    calls = []
+    async with httpx.AsyncClient(app=create_slow_app(calls), base_url="http://test") as ac:
+        await asyncio.gather(ac.get("/projects/?skip=0"), ac.get("/projects/?skip=1"))
+
+    assert sorted(calls) == [0, 1]
+
+
+@pytest.mark.asyncio
+async def test_failed_leader_is_not_shared():
+    """Test that followers run the route themselves when the leader fails"""
+    calls = []
+    transport = httpx.ASGITransport(app=create_slow_app(calls), raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
+        responses = await asyncio.gather(*(ac.get("/projects/broken") for _ in range(3)))
+
+    assert all(r.status_code == 500 for r in responses)
+    assert len(calls) == 3
+
+
+@pytest.mark.asyncio
+async def test_leader_send_failure_is_not_shared():
+    """Test that followers get no partial response when the leader's client goes away"""
+    calls = []
+    app = create_slow_app(calls)
+    scope = {
+        "type": "http", "method": "GET", "path": "/projects/", "raw_path": b"/projects/",
+        "query_string": b"", "headers": [], "http_version": "1.1", "scheme": "http",
+        "server": ("test", 80), "client": ("1.2.3.4", 1), "root_path": "",
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def disconnected_send(message):
+        if message["type"] == "http.response.body":
+            raise OSError("client went away")
+
+    received = []
+
+    async def follower_send(message):
+        received.append(message)
+
+    leader = asyncio.ensure_future(app(dict(scope), receive, disconnected_send))
+    await asyncio.sleep(0.01)
+    await app(dict(scope), receive, follower_send)
+    with pytest.raises(OSError):
+        await leader
+
+    assert calls == [0, 0]
+    assert received[0]["status"] == 200
+    assert b"".join(m.get("body", b"") for m in received[1:]) == b'[{"id":0}]'
+
+
+def test_metrics_endpoint(client):
+    """Test that coalescing counters are exposed in the metrics endpoint"""
+    client.get("/projects/")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert "lamfo_coalescing_leaders_total" in response.text
+    assert "lamfo_coalesced_requests_total" in response.text
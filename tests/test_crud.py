@@ -1,8 +1,30 @@
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
 import pytest
-from sqlalchemy.orm import Session
+from sqlalchemy import event
+from sqlalchemy.orm import Session, sessionmaker
 import app.crud as crud
 import app.schemas as schemas
-from app.models import Member, Project
+from app.models import Member, Project, Tombstone
+
+
+@contextmanager
+def recorded_statements(db: Session):
+    """Collect the SQL statements `db` sends while the block runs"""
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
 
 class TestMemberCRUD:
     """Test member CRUD operations"""
@@ -22,6 +44,20 @@ class TestMemberCRUD:
         assert member.role == "Data Scientist"
         assert member.id is not None
     
+    def test_create_member_is_one_statement(self, db_session: Session):
+        """Test that server defaults come back with the INSERT"""
+        member_data = schemas.MemberCreate(name="Test User", email="test@example.com")
+        
+        with recorded_statements(db_session) as statements:
+            member = crud.create_member(db_session, member_data)
+            response = schemas.Member.model_validate(member)
+        
+        assert len(statements) == 1
+        assert statements[0].startswith("INSERT INTO members")
+        assert "RETURNING" in statements[0]
+        assert response.created_at is not None
+        assert response.projects == []
+    
     def test_get_member_by_email(self, db_session: Session):
         """Test getting member by email"""
         # Create member
@@ -91,6 +127,20 @@ class TestMemberCRUD:
         deleted_member = crud.get_member(db_session, member.id)
         assert deleted_member is None
 
+    def test_delete_prunes_old_tombstones(self, db_session: Session):
+        """Test that deleting prunes tombstones older than the retention"""
+        db_session.add(Tombstone(entity_type="member", entity_id=999,
+                                 deleted_at=datetime(2000, 1, 1)))
+        db_session.commit()
+        member = crud.create_member(db_session, schemas.MemberCreate(
+            name="Test User", email="test@example.com"
+        ))
+
+        crud.delete_member(db_session, member.id)
+
+        tombstones = db_session.query(Tombstone).all()
+        assert [t.entity_id for t in tombstones] == [member.id]
+
 class TestProjectCRUD:
     """Test project CRUD operations"""
     
@@ -109,6 +159,35 @@ class TestProjectCRUD:
         assert project.status == "active"
         assert project.id is not None
     
+    def test_create_project_does_not_reload(self, db_session: Session):
+        """Test that the created project is not read back after commit"""
+        project_data = schemas.ProjectCreate(title="Test Project")
+        
+        with recorded_statements(db_session) as statements:
+            project = crud.create_project(db_session, project_data)
+            response = schemas.Project.model_validate(project)
+        
+        inserts = [s for s in statements if s.startswith("INSERT INTO projects")]
+        assert len(inserts) == 1 and "RETURNING" in inserts[0]
+        # The listing is rendered from the inserted object, not read back
+        assert not any(s.startswith("SELECT projects.") for s in statements)
+        assert response.created_at is not None
+    
+    def test_create_project_with_members_does_not_reload(self, db_session: Session):
+        """Test that the listing of a new project is rendered from the session"""
+        member = crud.create_member(db_session, schemas.MemberCreate(
+            name="Test User", email="test@example.com"
+        ))
+        project_data = schemas.ProjectCreate(title="Test Project", member_ids=[member.id])
+        
+        with recorded_statements(db_session) as statements:
+            project = crud.create_project(db_session, project_data)
+        
+        assert not any(s.startswith("SELECT projects.") for s in statements)
+        listing = schemas.Project.model_validate_json(crud.get_project_listings(db_session)[0])
+        assert [m.name for m in listing.members] == ["Test User"]
+        assert listing.id == project.id
+    
     def test_create_project_with_members(self, db_session: Session):
         """Test creating a project with assigned members"""
         # Create a member first
@@ -160,4 +239,178 @@ class TestProjectCRUD:
         assert updated_project is not None
         assert updated_project.title == "Updated Title"
         assert updated_project.status == "completed"
-        assert updated_project.description == "Original description"  # Should remain unchanged
\ No newline at end of file
+        assert updated_project.description == "Original description"  # Should remain unchanged
+    def test_update_project_add_and_remove_members(self, db_session: Session):
+        """Test patching project members incrementally"""
+        members = [
+            crud.create_member(db_session, schemas.MemberCreate(
+                name=f"User {i}", email=f"user{i}@example.com"
+            ))
+            for i in range(3)
+        ]
+        project = crud.create_project(db_session, schemas.ProjectCreate(
+            title="Test Project", member_ids=[members[0].id, members[1].id]
+        ))
+        
+        update_data = schemas.ProjectUpdate(
+            add_member_ids=[members[2].id], remove_member_ids=[members[0].id]
+        )
+        updated_project = crud.update_project(db_session, project.id, update_data)
+        
+        assert {m.id for m in updated_project.members} == {members[1].id, members[2].id}
+        assert members[0].projects == []
+    
+    def test_update_project_replace_members(self, db_session: Session):
+        """Test replacing project members with a set diff"""
+        members = [
+            crud.create_member(db_session, schemas.MemberCreate(
+                name=f"User {i}", email=f"user{i}@example.com"
+            ))
+            for i in range(3)
+        ]
+        project = crud.create_project(db_session, schemas.ProjectCreate(
+            title="Test Project", member_ids=[members[0].id, members[1].id]
+        ))
+        
+        update_data = schemas.ProjectUpdate(member_ids=[members[1].id, members[2].id])
+        updated_project = crud.update_project(db_session, project.id, update_data)
+        
+        assert {m.id for m in updated_project.members} == {members[1].id, members[2].id}
+    
+    def test_update_project_unknown_members(self, db_session: Session):
+        """Test that unknown member IDs are rejected instead of dropped"""
+        project = crud.create_project(db_session, schemas.ProjectCreate(title="Test Project"))
+        
+        with pytest.raises(crud.UnknownMemberIdsError) as exc_info:
+            crud.update_project(
+                db_session, project.id, schemas.ProjectUpdate(add_member_ids=[999])
+            )
+        assert exc_info.value.member_ids == [999]
+
+
+class TestMemberEmailUniqueness:
+    """Test race-free email uniqueness on member creation"""
+    
+    def test_duplicate_email_raises(self, db_session: Session):
+        """Test that a duplicate email raises without a pre-check query"""
+        member_data = schemas.MemberCreate(name="Test User", email="test@example.com")
+        crud.create_member(db_session, member_data)
+        
+        with pytest.raises(crud.DuplicateEmailError):
+            crud.create_member(db_session, member_data)
+        
+        # The session is still usable after the failed insert
+        assert len(crud.get_members(db_session)) == 1
+    
+    def test_concurrent_duplicate_creates(self, file_engine):
+        """Test that parallel creates with the same email yield one member"""
+        SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=file_engine)
+        member_data = schemas.MemberCreate(name="Test User", email="race@example.com")
+        barrier = threading.Barrier(8)
+        
+        def create():
+            session = SessionLocal()
+            try:
+                barrier.wait()
+                crud.create_member(session, member_data)
+                return "created"
+            except crud.DuplicateEmailError:
+                return "duplicate"
+            finally:
+                session.close()
+        
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(lambda _: create(), range(8)))
+        
+        assert results.count("created") == 1
+        assert results.count("duplicate") == 7
+
+
+class TestOptimisticConcurrency:
+    """Test version checks on updates"""
+    
+    def test_update_bumps_version(self, db_session: Session):
+        """Test that every update increments the version"""
+        member = crud.create_member(
+            db_session, schemas.MemberCreate(name="Test User", email="test@example.com")
+        )
+        assert member.version == 1
+        
+        updated = crud.update_member(
+            db_session, member.id, schemas.MemberUpdate(bio="Bio"), expected_version=1
+        )
+        
+        assert updated.version == 2
+    
+    def test_expected_version_mismatch(self, db_session: Session):
+        """Test that an update based on an old version is refused"""
+        member = crud.create_member(
+            db_session, schemas.MemberCreate(name="Test User", email="test@example.com")
+        )
+        crud.update_member(db_session, member.id, schemas.MemberUpdate(bio="First"))
+        
+        with pytest.raises(crud.VersionConflictError):
+            crud.update_member(
+                db_session, member.id, schemas.MemberUpdate(bio="Second"), expected_version=1
+            )
+        assert crud.get_member(db_session, member.id).bio == "First"
+    
+    def test_concurrent_update_conflicts(self, file_engine):
+        """Test that a row changed after it was loaded is not overwritten"""
+        SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=file_engine)
+        with SessionLocal() as setup:
+            project_id = crud.create_project(setup, schemas.ProjectCreate(title="Project")).id
+        
+        with SessionLocal() as first, SessionLocal() as second:
+            stale = crud.get_project(second, project_id)
+            crud.update_project(first, project_id, schemas.ProjectUpdate(title="First"))
+            # The second session still holds version 1 and updates against it
+            assert stale.version == 1
+            with pytest.raises(crud.VersionConflictError):
+                crud.update_project(second, project_id, schemas.ProjectUpdate(title="Second"))
+        
+        with SessionLocal() as check:
+            assert crud.get_project(check, project_id).title == "First"
+    
+    def test_membership_change_bumps_member_version(self, db_session: Session):
+        """Test that a member's version changes when its projects do"""
+        member = crud.create_member(
+            db_session, schemas.MemberCreate(name="Test User", email="test@example.com")
+        )
+        crud.create_project(db_session, schemas.ProjectCreate(
+            title="Project", member_ids=[member.id]
+        ))
+        
+        assert crud.get_member(db_session, member.id).version == 2
+    
+    def test_orm_membership_change_bumps_both_sides(self, db_session: Session):
+        """Test that editing a collection, as the admin does, bumps versions once"""
+        member = crud.create_member(
+            db_session, schemas.MemberCreate(name="Test User", email="test@example.com")
+        )
+        project = crud.create_project(db_session, schemas.ProjectCreate(title="Project"))
+        renamed = crud.create_project(db_session, schemas.ProjectCreate(title="Other"))
+        
+        project.members = [member]
+        renamed.title = "Renamed"
+        renamed.members = [member]
+        db_session.commit()
+        
+        assert crud.get_project(db_session, project.id).version == 2
+        assert crud.get_project(db_session, renamed.id).version == 2
+        assert crud.get_member(db_session, member.id).version == 2
+        assert crud.get_project(db_session, project.id).updated_at is not None
+
+
+class TestBatchLookups:
+    """Test loading several rows by ID"""
+
+    def test_get_members_by_ids(self, db_session: Session):
+        """Test request order, de-duplication and missing IDs"""
+        a = crud.create_member(db_session, schemas.MemberCreate(name="A", email="a@example.com"))
+        b = crud.create_member(db_session, schemas.MemberCreate(name="B", email="b@example.com"))
+
+        members, missing = crud.get_members_by_ids(db_session, [b.id, 0, a.id, b.id])
+
+        assert [m.id for m in members] == [b.id, a.id]
+        assert missing == [0]
@@ -2,10 +2,14 @@
 Test database connection and CRUD operations.
 """
 import pytest
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, event, inspect, text
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.exc import OperationalError
-from app.database import settings
+from sqlalchemy.pool import StaticPool
+from app.database import (
+    add_missing_columns, create_missing_indexes, create_session_factory, create_sqlite_engine, get_db, settings
+)
+from app.main import app
 from app.models import Base, Member, Project
 from app import crud, schemas
 
@@ -146,3 +150,101 @@ def test_get_projects(test_db):
     assert "Project 1" in titles
     assert "Project 2" in titles
     assert "Project 3" in titles
+
+
+def test_sqlite_profile_pragmas(file_engine):
+    """Test that the tuned SQLite profile is applied to new connections."""
+    with file_engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert conn.execute(text("PRAGMA foreign_keys")).scalar() == 1
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == (
+            settings.SQLITE_BUSY_TIMEOUT_MS
+        )
+
+
+def test_sqlite_memory_engine_shares_connection():
+    """Test that in-memory engines use a single shared connection."""
+    engine = create_sqlite_engine("sqlite:///:memory:")
+    assert isinstance(engine.pool, StaticPool)
+    
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(bind=engine)
+    with SessionLocal() as writer:
+        crud.create_member(
+            writer, schemas.MemberCreate(name="Test User", email="test@example.com")
+        )
+    with SessionLocal() as reader:
+        assert len(crud.get_members(reader)) == 1
+
+
+def test_missing_indexes_are_created_on_existing_tables():
+    """Test that indexes added after a table was created still reach it."""
+    engine = create_sqlite_engine("sqlite:///:memory:")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX ix_members_updated_at"))
+        conn.execute(text("DROP INDEX ix_project_listings_hot"))
+
+    create_missing_indexes(engine)
+    create_missing_indexes(engine)
+
+    assert "ix_members_updated_at" in {i["name"] for i in inspect(engine).get_indexes("members")}
+    assert "ix_project_listings_hot" in {
+        i["name"] for i in inspect(engine).get_indexes("project_listings")
+    }
+
+
+def test_missing_columns_are_added_to_existing_tables():
+    """Test that a database created before a column existed gets it on startup."""
+    engine = create_sqlite_engine("sqlite:///:memory:")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE members DROP COLUMN version"))
+        conn.execute(text("INSERT INTO members (name, email) VALUES ('Ada', 'ada@example.com')"))
+
+    add_missing_columns(engine)
+    add_missing_columns(engine)
+
+    with sessionmaker(bind=engine)() as db:
+        assert db.query(Member).one().version == 1
+
+
+def test_connection_released_before_serialization(client, test_engine):
+    """Test that a handler's transaction ends before its response is rendered."""
+    sessions = []
+
+    def get_fresh_db():
+        db = create_session_factory(test_engine)()
+        sessions.append(db)
+        yield db
+
+    app.dependency_overrides[get_db] = get_fresh_db
+    member = client.post("/members/", json={"name": "Ada", "email": "ada@example.com"}).json()
+    client.post("/projects/", json={"title": "Engine", "member_ids": [member["id"]]})
+
+    response = client.put(
+        f"/members/{member['id']}", json={"bio": "Mathematician"}, headers={"If-Match": "*"}
+    )
+
+    assert response.status_code == 200
+    # Serializing the loaded projects did not begin a new transaction
+    assert [p["title"] for p in response.json()["projects"]] == ["Engine"]
+    assert not sessions[-1].in_transaction()
+
+
+def test_cached_read_checks_out_no_connection(client, test_engine):
+    """Test that sessions only take a connection from the pool when queried."""
+    member = client.post("/members/", json={"name": "Ada", "email": "ada@example.com"}).json()
+    client.get(f"/members/{member['id']}")
+    checkouts = []
+
+    def on_checkout(*args):
+        checkouts.append(args)
+
+    event.listen(test_engine, "checkout", on_checkout)
+    try:
+        assert client.get(f"/members/{member['id']}").status_code == 200
+    finally:
+        event.remove(test_engine, "checkout", on_checkout)
+    assert checkouts == []
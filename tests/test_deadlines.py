@@ -0,0 +1,115 @@
+"""
+Test per-request deadlines and timeout error handling.
+"""
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from sqlalchemy.exc import OperationalError
+
+from app.deadlines import DeadlineMiddleware, deadlines_exceeded
+from app.main import operational_error_handler, pool_timeout_handler
+
+
+def create_slow_app():
+    slow_app = FastAPI()
+
+    @slow_app.get("/projects/")
+    async def slow_projects(delay: float = 0):
+        await asyncio.sleep(delay)
+        return []
+
+    @slow_app.post("/projects/")
+    async def slow_create(delay: float = 0):
+        await asyncio.sleep(delay)
+        return {}
+
+    @slow_app.get("/projects/export")
+    async def slow_stream():
+        async def chunks():
+            for _ in range(3):
+                await asyncio.sleep(0.04)
+                yield b"chunk"
+
+        return StreamingResponse(chunks())
+
+    @slow_app.get("/events")
+    async def events(delay: float = 0):
+        await asyncio.sleep(delay)
+        return []
+
+    slow_app.add_middleware(
+        DeadlineMiddleware, timeout=0.05, route_timeouts={"/projects/slow": 1}
+    )
+    return slow_app
+
+
+@pytest.mark.asyncio
+async def test_request_past_deadline_gets_503():
+    """Test that a request over budget is answered with 503 and Retry-After"""
+    before = deadlines_exceeded.value()
+    async with httpx.AsyncClient(app=create_slow_app(), base_url="http://test") as ac:
+        response = await ac.get("/projects/", params={"delay": 0.5})
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert response.json() == {"detail": "Request deadline exceeded"}
+    assert deadlines_exceeded.value() - before == 1
+
+
+@pytest.mark.asyncio
+async def test_timed_out_post_is_not_told_to_retry():
+    """Test that a non-idempotent request past its deadline gets no Retry-After"""
+    async with httpx.AsyncClient(app=create_slow_app(), base_url="http://test") as ac:
+        response = await ac.post("/projects/", params={"delay": 0.5})
+
+    assert response.status_code == 503
+    assert "Retry-After" not in response.headers
+
+
+@pytest.mark.asyncio
+async def test_started_response_streams_past_deadline():
+    """Test that only the time until the response starts is limited"""
+    async with httpx.AsyncClient(app=create_slow_app(), base_url="http://test") as ac:
+        response = await ac.get("/projects/export")
+
+    assert response.status_code == 200
+    assert response.content == b"chunk" * 3
+
+
+@pytest.mark.asyncio
+async def test_request_within_deadline_passes():
+    """Test that fast requests are untouched"""
+    async with httpx.AsyncClient(app=create_slow_app(), base_url="http://test") as ac:
+        response = await ac.get("/projects/")
+    assert response.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_exempt_routes_have_no_deadline():
+    """Test that long-lived routes such as /events are never cut off"""
+    async with httpx.AsyncClient(app=create_slow_app(), base_url="http://test") as ac:
+        response = await ac.get("/events", params={"delay": 0.1})
+    assert response.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_statement_timeout_maps_to_503():
+    """Test that a PostgreSQL statement timeout becomes a 503"""
+    orig = SimpleNamespace(pgcode="57014")
+    exc = OperationalError("SELECT 1", {}, orig)
+    response = await operational_error_handler(
+        SimpleNamespace(url=SimpleNamespace(path="/projects/")), exc
+    )
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+@pytest.mark.asyncio
+async def test_pool_timeout_maps_to_503():
+    """Test that an exhausted connection pool becomes a 503"""
+    response = await pool_timeout_handler(None, Exception("QueuePool limit"))
+    assert response.status_code == 503
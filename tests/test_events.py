@@ -0,0 +1,106 @@
+"""
+Test change event publishing and fan-out.
+"""
+import asyncio
+import json
+
+import pytest
+
+from app import crud, schemas
+from app.events import EventBroker, PostgresRelay, broker, format_sse, record_change
+
+
+@pytest.fixture
+def received_events():
+    """Collect every event published by the global broker"""
+    events = []
+    broker.add_listener(events.append)
+    yield events
+    broker._listeners.remove(events.append)
+
+
+def test_crud_publishes_after_commit(db_session, received_events):
+    """Test that CRUD writes publish events once committed"""
+    member = crud.create_member(
+        db_session, schemas.MemberCreate(name="Test User", email="test@example.com")
+    )
+    crud.update_member(db_session, member.id, schemas.MemberUpdate(name="New Name"))
+    crud.delete_member(db_session, member.id)
+
+    actions = [(e["entity"], e["action"], e["id"]) for e in received_events]
+    assert actions == [
+        ("member", "created", member.id),
+        ("member", "updated", member.id),
+        ("member", "deleted", member.id),
+    ]
+
+
+def test_rollback_discards_events(db_session, received_events):
+    """Test that events recorded in a rolled back transaction are dropped"""
+    member = crud.create_member(
+        db_session, schemas.MemberCreate(name="Test User", email="test@example.com")
+    )
+    received_events.clear()
+
+    db_member = crud.get_member(db_session, member.id)
+    db_member.name = "Changed"
+    record_change(db_session, "member", "updated", member.id)
+    db_session.rollback()
+    db_session.commit()
+
+    assert received_events == []
+
+
+@pytest.mark.asyncio
+async def test_subscribers_receive_events():
+    """Test that published events reach every subscriber"""
+    local_broker = EventBroker()
+    first = local_broker.subscribe()
+    second = local_broker.subscribe()
+
+    local_broker.publish({"entity": "project", "action": "created", "id": 1})
+
+    for subscription in (first, second):
+        event = await asyncio.wait_for(subscription.get(), timeout=1)
+        assert event["entity"] == "project"
+        assert event["id"] == 1
+        subscription.close()
+    assert local_broker._subscriptions == set()
+
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_drops_oldest():
+    """Test that a full subscriber queue keeps only the newest events"""
+    local_broker = EventBroker(queue_size=2)
+    subscription = local_broker.subscribe()
+
+    for i in range(5):
+        local_broker.publish({"entity": "member", "action": "updated", "id": i})
+    await asyncio.sleep(0)
+
+    ids = [(await subscription.get())["id"] for _ in range(2)]
+    assert ids == [3, 4]
+
+
+def test_relay_ignores_own_notifications():
+    """Test that the PostgreSQL relay does not redeliver its own events"""
+    local_broker = EventBroker()
+    events = []
+    local_broker.add_listener(events.append)
+    relay = PostgresRelay(local_broker, dsn="postgresql://unused")
+
+    event = {"entity": "member", "action": "created", "id": 1}
+    relay._receive(json.dumps({"origin": relay.origin, "event": event}))
+    relay._receive(json.dumps({"origin": "other-replica", "event": event}))
+
+    assert len(events) == 1
+
+
+def test_format_sse():
+    """Test Server-Sent Events message formatting"""
+    message = format_sse({"entity": "member", "action": "created", "id": 7, "seq": 3})
+    lines = message.split("\n")
+    assert lines[0] == "id: 3"
+    assert lines[1] == "event: member.created"
+    assert json.loads(lines[2][len("data: "):])["id"] == 7
+    assert message.endswith("\n\n")
@@ -0,0 +1,101 @@
+"""
+Test Idempotency-Key handling on POST endpoints.
+"""
+from datetime import datetime, timedelta
+
+from app import crud, idempotency, schemas
+from app.models import IdempotencyKey
+
+
+def test_retry_replays_project_creation(client, db_session, sample_project_data):
+    """Test that a retried POST returns the stored response without a new write"""
+    headers = {"Idempotency-Key": "retry-1"}
+    first = client.post("/projects/", json=sample_project_data, headers=headers)
+    second = client.post("/projects/", json=sample_project_data, headers=headers)
+
+    assert first.status_code == 201
+    assert second.status_code == 201
+    assert second.json() == first.json()
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert len(crud.get_projects(db_session)) == 1
+
+
+def test_retry_replays_member_creation(client, sample_member_data):
+    """Test that a retried member creation does not hit the email conflict"""
+    headers = {"Idempotency-Key": "retry-2"}
+    first = client.post("/members/", json=sample_member_data, headers=headers)
+    second = client.post("/members/", json=sample_member_data, headers=headers)
+
+    assert second.status_code == 201
+    assert second.json()["id"] == first.json()["id"]
+
+
+def test_key_reused_with_different_payload(client, sample_project_data):
+    """Test that reusing a key for another request is rejected"""
+    headers = {"Idempotency-Key": "retry-3"}
+    client.post("/projects/", json=sample_project_data, headers=headers)
+
+    sample_project_data["title"] = "Another Project"
+    response = client.post("/projects/", json=sample_project_data, headers=headers)
+    assert response.status_code == 422
+
+
+def test_key_in_progress(client, db_session, sample_project_data):
+    """Test that a concurrent request with the same key gets a conflict"""
+    payload = schemas.ProjectCreate(**sample_project_data).model_dump_json()
+    idempotency.claim(
+        db_session, "retry-4", idempotency.fingerprint("POST", "/projects/", payload)
+    )
+
+    response = client.post(
+        "/projects/", json=sample_project_data, headers={"Idempotency-Key": "retry-4"}
+    )
+    assert response.status_code == 409
+
+
+def test_abandoned_claim_is_taken_over(client, db_session, sample_project_data):
+    """Test that a claim left without a response is retried after the lease"""
+    payload = schemas.ProjectCreate(**sample_project_data).model_dump_json()
+    db_session.add(IdempotencyKey(
+        key="retry-6", fingerprint=idempotency.fingerprint("POST", "/projects/", payload),
+        created_at=datetime.utcnow() - timedelta(minutes=5)
+    ))
+    db_session.commit()
+
+    response = client.post(
+        "/projects/", json=sample_project_data, headers={"Idempotency-Key": "retry-6"}
+    )
+    assert response.status_code == 201
+    assert len(crud.get_projects(db_session)) == 1
+
+
+def test_overlong_key_is_rejected(client, sample_project_data):
+    """Test that a key longer than the stored column is rejected"""
+    response = client.post(
+        "/projects/", json=sample_project_data, headers={"Idempotency-Key": "k" * 256}
+    )
+    assert response.status_code == 422
+
+
+def test_failed_request_releases_key(client, sample_project_data):
+    """Test that a failed write can be retried with the same key"""
+    headers = {"Idempotency-Key": "retry-5"}
+    sample_project_data["member_ids"] = [999]
+    response = client.post("/projects/", json=sample_project_data, headers=headers)
+    assert response.status_code == 422
+
+    sample_project_data["member_ids"] = []
+    response = client.post("/projects/", json=sample_project_data, headers=headers)
+    assert response.status_code == 201
+
+
+def test_expired_keys_are_purged(db_session):
+    """Test that keys older than the TTL are removed"""
+    db_session.add(IdempotencyKey(
+        key="old", fingerprint="x", created_at=datetime.utcnow() - timedelta(days=2)
+    ))
+    db_session.add(IdempotencyKey(key="new", fingerprint="x"))
+    db_session.commit()
+
+    assert idempotency.purge_expired(db_session) == 1
+    assert db_session.get(IdempotencyKey, "new") is not None
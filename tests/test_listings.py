@@ -0,0 +1,213 @@
+"""
+Test the denormalized project listings.
+"""
+import json
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+import app.crud as crud
+import app.schemas as schemas
+from app.listings import rebuild_project_listings, refresh_project_listings
+from app.models import Member, Project, ProjectListing
+
+
+def listing(db: Session, project_id: int):
+    payload = db.scalar(
+        select(ProjectListing.payload).where(ProjectListing.project_id == project_id)
+    )
+    return json.loads(payload) if payload else None
+
+
+def create_member(db: Session, name: str = "Ada"):
+    return crud.create_member(
+        db, schemas.MemberCreate(name=name, email=f"{name.lower()}@example.com")
+    )
+
+
+class TestProjectListings:
+    """Test that CRUD writes keep listings current"""
+
+    def test_create_project_writes_listing(self, db_session: Session):
+        member = create_member(db_session)
+        project = crud.create_project(
+            db_session, schemas.ProjectCreate(title="Alpha", member_ids=[member.id])
+        )
+
+        data = listing(db_session, project.id)
+        assert data["title"] == "Alpha"
+        assert [m["id"] for m in data["members"]] == [member.id]
+        assert data == json.loads(schemas.Project.model_validate(project).model_dump_json())
+
+    def test_membership_and_field_updates(self, db_session: Session):
+        ada = create_member(db_session, "Ada")
+        alan = create_member(db_session, "Alan")
+        project = crud.create_project(
+            db_session, schemas.ProjectCreate(title="Alpha", member_ids=[ada.id])
+        )
+
+        crud.update_project(db_session, project.id, schemas.ProjectUpdate(
+            title="Beta", add_member_ids=[alan.id], remove_member_ids=[ada.id]
+        ))
+
+        data = listing(db_session, project.id)
+        assert data["title"] == "Beta"
+        assert [m["id"] for m in data["members"]] == [alan.id]
+
+    def test_member_rename_updates_embedded_summary(self, db_session: Session):
+        member = create_member(db_session)
+        project = crud.create_project(
+            db_session, schemas.ProjectCreate(title="Alpha", member_ids=[member.id])
+        )
+
+        crud.update_member(db_session, member.id, schemas.MemberUpdate(name="Ada L."))
+
+        assert listing(db_session, project.id)["members"][0]["name"] == "Ada L."
+
+    def test_member_delete_updates_listing(self, db_session: Session):
+        member = create_member(db_session)
+        project = crud.create_project(
+            db_session, schemas.ProjectCreate(title="Alpha", member_ids=[member.id])
+        )
+
+        crud.delete_member(db_session, member.id)
+
+        assert listing(db_session, project.id)["members"] == []
+
+    def test_project_delete_removes_listing(self, db_session: Session):
+        project = crud.create_project(db_session, schemas.ProjectCreate(title="Alpha"))
+
+        crud.delete_project(db_session, project.id)
+
+        assert listing(db_session, project.id) is None
+
+    def test_refresh_locks_listings_before_reading(self, db_session: Session):
+        project = crud.create_project(db_session, schemas.ProjectCreate(title="Alpha"))
+        statements = []
+
+        def record(conn, cursor, sql, params, context, executemany):
+            statements.append(sql.split()[0])
+
+        engine = db_session.get_bind()
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            refresh_project_listings(db_session, [project.id])
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+
+        assert statements.index("DELETE") < statements.index("SELECT")
+
+    def test_rebuild(self, db_session: Session):
+        project = crud.create_project(db_session, schemas.ProjectCreate(title="Alpha"))
+        db_session.query(ProjectListing).delete()
+        db_session.commit()
+
+        assert rebuild_project_listings(db_session) == 1
+        assert listing(db_session, project.id)["title"] == "Alpha"
+        assert crud.get_project_listings(db_session) == [
+            schemas.Project.model_validate(project).model_dump_json()
+        ]
+
+
+class TestOrmWrites:
+    """Test that writes outside CRUD, e.g. the admin or populate_db, keep listings current"""
+
+    def test_new_project_with_members(self, db_session: Session):
+        project = Project(title="Alpha", members=[Member(name="Ada", email="ada@example.com")])
+        db_session.add(project)
+        db_session.commit()
+
+        assert [m["name"] for m in listing(db_session, project.id)["members"]] == ["Ada"]
+
+    def test_member_rename(self, db_session: Session):
+        member = create_member(db_session)
+        project = crud.create_project(
+            db_session, schemas.ProjectCreate(title="Alpha", member_ids=[member.id])
+        )
+        db_session.expunge_all()
+
+        renamed = db_session.get(Member, member.id)
+        renamed.name = "Ada L."
+        db_session.commit()
+
+        assert listing(db_session, project.id)["members"][0]["name"] == "Ada L."
+
+    def test_membership_removed_from_member_side(self, db_session: Session):
+        member = create_member(db_session)
+        project = crud.create_project(
+            db_session, schemas.ProjectCreate(title="Alpha", member_ids=[member.id])
+        )
+        db_session.expunge_all()
+
+        loaded = db_session.get(Member, member.id)
+        loaded.projects.clear()
+        db_session.commit()
+
+        assert listing(db_session, project.id)["members"] == []
+
+    def test_member_delete(self, db_session: Session):
+        member = create_member(db_session)
+        project = crud.create_project(
+            db_session, schemas.ProjectCreate(title="Alpha", member_ids=[member.id])
+        )
+        db_session.expunge_all()
+
+        db_session.delete(db_session.get(Member, member.id))
+        db_session.commit()
+
+        assert listing(db_session, project.id)["members"] == []
+
+    def test_rolled_back_changes_are_forgotten(self, db_session: Session):
+        db_session.add(Project(title="Alpha"))
+        db_session.flush()
+        db_session.rollback()
+
+        crud.create_member(db_session, schemas.MemberCreate(name="Ada", email="ada@example.com"))
+
+        assert crud.get_project_listings(db_session) == []
+
+
+class TestArchivedProjects:
+    """Test that completed and cancelled projects are only listed on request"""
+
+    def titles(self, db: Session, **kwargs):
+        return [json.loads(p)["title"] for p in crud.get_project_listings(db, **kwargs)]
+
+    def test_archived_projects_are_hidden_by_default(self, db_session: Session):
+        for title, status in [("Alpha", "active"), ("Beta", "completed"),
+                              ("Gamma", "cancelled"), ("Delta", "on_hold")]:
+            crud.create_project(db_session, schemas.ProjectCreate(title=title, status=status))
+
+        assert self.titles(db_session) == ["Alpha", "Delta"]
+        assert self.titles(db_session, include_archived=True) == [
+            "Alpha", "Beta", "Gamma", "Delta"
+        ]
+
+    def test_project_without_status_is_hot(self, db_session: Session):
+        crud.create_project(db_session, schemas.ProjectCreate(title="Alpha", status=None))
+
+        assert self.titles(db_session) == ["Alpha"]
+
+    def test_completing_a_project_archives_it(self, db_session: Session):
+        project = crud.create_project(db_session, schemas.ProjectCreate(title="Alpha"))
+        crud.update_project(db_session, project.id, schemas.ProjectUpdate(status="completed"))
+
+        assert self.titles(db_session) == []
+        assert self.titles(db_session, include_archived=True) == ["Alpha"]
+
+    def test_hot_listing_uses_partial_index(self, db_session: Session):
+        queries = []
+        engine = db_session.get_bind()
+
+        def listener(conn, cursor, sql, params, context, executemany):
+            queries.append((sql, params))
+
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            crud.get_project_listings(db_session)
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+
+        sql, params = queries[-1]
+        plan = db_session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}", params)
+        assert "ix_project_listings_hot" in " ".join(row[-1] for row in plan)
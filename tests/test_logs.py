@@ -0,0 +1,97 @@
+"""
+Test the queue-based JSON logging setup.
+"""
+import json
+import logging
+import queue
+import sys
+
+from app.logs import (
+    ACCESS_LOGGER, AccessSampler, DroppingQueueHandler, JSONFormatter, RequestIdFilter,
+    dropped_records, parse_levels, request_id_var
+)
+
+
+def make_record(name="app.test", level=logging.INFO, msg="hello %s", args=("world",), **extra):
+    record = logging.makeLogRecord({
+        "name": name, "levelno": level, "levelname": logging.getLevelName(level),
+        "msg": msg, "args": args,
+    })
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_formatter_is_compact_and_includes_extras():
+    record = make_record(request_id="abc", status=200)
+
+    line = JSONFormatter().format(record)
+
+    assert " " not in line.replace("hello world", "")
+    entry = json.loads(line)
+    assert entry["msg"] == "hello world"
+    assert entry["request_id"] == "abc"
+    assert entry["status"] == 200
+    assert entry["level"] == "INFO"
+
+
+def test_queue_handler_stamps_request_id_and_keeps_traceback():
+    log_queue = queue.Queue()
+    handler = DroppingQueueHandler(log_queue)
+    handler.addFilter(RequestIdFilter())
+    token = request_id_var.set("req-1")
+    try:
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            record = make_record(level=logging.ERROR)
+            record.exc_info = sys.exc_info()
+        handler.handle(record)
+    finally:
+        request_id_var.reset(token)
+
+    entry = json.loads(JSONFormatter().format(log_queue.get_nowait()))
+    assert entry["request_id"] == "req-1"
+    assert "ValueError: boom" in entry["exc"]
+
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = DroppingQueueHandler(queue.Queue(maxsize=1))
+    before = dropped_records.value()
+
+    handler.handle(make_record())
+    handler.handle(make_record())
+
+    assert dropped_records.value() == before + 1
+
+
+def test_access_sampler_keeps_failures():
+    sampler = AccessSampler(rate=0.0)
+
+    assert not sampler.filter(make_record(name=ACCESS_LOGGER, status=200))
+    assert sampler.filter(make_record(name=ACCESS_LOGGER, status=503))
+    assert sampler.filter(make_record(name="app.main"))
+
+
+def test_parse_levels():
+    assert parse_levels("app.database=warning, sqlalchemy.engine=INFO,,bogus") == {
+        "app.database": "WARNING",
+        "sqlalchemy.engine": "INFO",
+    }
+
+
+def test_requests_get_an_id(client, caplog):
+    with caplog.at_level(logging.INFO, logger=ACCESS_LOGGER):
+        response = client.get("/health")
+        echoed = client.get("/health", headers={"X-Request-ID": "from-proxy"})
+
+    assert len(response.headers["x-request-id"]) == 32
+    assert echoed.headers["x-request-id"] == "from-proxy"
+    access = [r for r in caplog.records if r.name == ACCESS_LOGGER]
+    assert access[-1].path == "/health"
+    assert access[-1].status == 200
+
+
+def test_unsafe_request_ids_are_replaced(client):
+    response = client.get("/health", headers={"X-Request-ID": "bad id\twith spaces"})
+
+    assert response.headers["x-request-id"] != "bad id\twith spaces"
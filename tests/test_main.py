@@ -1,6 +1,11 @@
+import asyncio
+import base64
 import pytest
 from fastapi.testclient import TestClient
+from app import crud, schemas
+from app.admin import MemberAdmin
 from app.main import app
+from app.models import Member
 
 
 def test_home_route(client):
@@ -85,8 +90,11 @@ class TestMemberEndpoints:
         member_id = create_response.json()["id"]
 
         # Update member
+        etag = client.get(f"/members/{member_id}").headers["etag"]
         update_data = {"name": "Updated Name", "role": "Senior Data Scientist"}
-        response = client.put(f"/members/{member_id}", json=update_data)
+        response = client.put(
+            f"/members/{member_id}", json=update_data, headers={"If-Match": etag}
+        )
         assert response.status_code == 200
 
         data = response.json()
@@ -195,8 +203,11 @@ class TestProjectEndpoints:
         project_id = create_response.json()["id"]
 
         # Update project
+        etag = client.get(f"/projects/{project_id}").headers["etag"]
         update_data = {"title": "Updated Project", "status": "completed"}
-        response = client.put(f"/projects/{project_id}", json=update_data)
+        response = client.put(
+            f"/projects/{project_id}", json=update_data, headers={"If-Match": etag}
+        )
         assert response.status_code == 200
 
         data = response.json()
@@ -244,3 +255,233 @@ class TestMemberProjectRelationship:
         member_ids = [member["id"] for member in project_data["members"]]
         assert member1_id in member_ids
         assert member2_id in member_ids
+
+    def test_patch_project_members(self, client, sample_member_data, sample_project_data):
+        """Test adding and removing project members without replacing the list"""
+        member1_id = client.post("/members/", json=sample_member_data).json()["id"]
+        sample_member_data["email"] = "test2@example.com"
+        member2_id = client.post("/members/", json=sample_member_data).json()["id"]
+
+        sample_project_data["member_ids"] = [member1_id]
+        project_id = client.post("/projects/", json=sample_project_data).json()["id"]
+
+        response = client.put(
+            f"/projects/{project_id}",
+            json={"add_member_ids": [member2_id], "remove_member_ids": [member1_id]},
+            headers={"If-Match": "*"}
+        )
+        assert response.status_code == 200
+        assert [m["id"] for m in response.json()["members"]] == [member2_id]
+
+    def test_unknown_member_ids_rejected(self, client, sample_project_data):
+        """Test that unknown member IDs return 422"""
+        sample_project_data["member_ids"] = [999]
+        response = client.post("/projects/", json=sample_project_data)
+        assert response.status_code == 422
+        assert "999" in response.json()["detail"]
+
+        sample_project_data.pop("member_ids")
+        project_id = client.post("/projects/", json=sample_project_data).json()["id"]
+        response = client.put(
+            f"/projects/{project_id}", json={"add_member_ids": [999]}, headers={"If-Match": "*"}
+        )
+        assert response.status_code == 422
+
+
+class TestConditionalUpdates:
+    """Test ETags and If-Match on updates"""
+
+    def test_put_requires_if_match(self, client, sample_member_data):
+        """Test that an update without If-Match is refused"""
+        member_id = client.post("/members/", json=sample_member_data).json()["id"]
+
+        response = client.put(f"/members/{member_id}", json={"name": "Updated Name"})
+
+        assert response.status_code == 428
+        assert client.get(f"/members/{member_id}").json()["name"] == "Test User"
+
+    def test_stale_etag_rejected(self, client, sample_project_data):
+        """Test that an update based on an old ETag returns 412"""
+        project_id = client.post("/projects/", json=sample_project_data).json()["id"]
+        etag = client.get(f"/projects/{project_id}").headers["etag"]
+
+        first = client.put(
+            f"/projects/{project_id}", json={"title": "First"}, headers={"If-Match": etag}
+        )
+        second = client.put(
+            f"/projects/{project_id}", json={"title": "Second"}, headers={"If-Match": etag}
+        )
+
+        assert first.status_code == 200
+        assert first.headers["etag"] != etag
+        assert first.headers["etag"] == client.get(f"/projects/{project_id}").headers["etag"]
+        assert second.status_code == 412
+        assert client.get(f"/projects/{project_id}").json()["title"] == "First"
+
+    def test_admin_edit_of_stale_form_rejected(self, client, db_session, sample_member_data):
+        """Test that an admin form rendered before an API update cannot overwrite it"""
+        member_id = client.post("/members/", json=sample_member_data).json()["id"]
+        client.put(f"/members/{member_id}", json={"bio": "From the API"}, headers={"If-Match": "*"})
+
+        # What SQLAdmin does on submit: reload the row, then apply the form
+        member = db_session.get(Member, member_id)
+        with pytest.raises(crud.VersionConflictError):
+            asyncio.run(MemberAdmin().on_model_change(
+                {"bio": "From the admin", "version": "1"}, member, False, None
+            ))
+
+        data = {"bio": "From the admin", "version": "2"}
+        asyncio.run(MemberAdmin().on_model_change(data, member, False, None))
+        assert "version" not in data
+
+
+class TestChangeFeed:
+    """Test the incremental change feed"""
+
+    def test_initial_sync_returns_everything(self, client, sample_member_data, sample_project_data):
+        """Test that a sync without a token returns all entities"""
+        member_id = client.post("/members/", json=sample_member_data).json()["id"]
+        sample_project_data["member_ids"] = [member_id]
+        project_id = client.post("/projects/", json=sample_project_data).json()["id"]
+
+        response = client.get("/changes")
+        assert response.status_code == 200
+
+        data = response.json()
+        assert [m["id"] for m in data["members"]] == [member_id]
+        assert [p["id"] for p in data["projects"]] == [project_id]
+        assert data["deleted"] == []
+        assert data["next_token"]
+
+    def test_empty_database(self, client):
+        """Test the change feed on an empty database"""
+        response = client.get("/changes")
+        assert response.status_code == 200
+        assert response.json()["next_token"] == ""
+
+    def test_deletions_are_reported(self, client, sample_member_data):
+        """Test that deleted entities show up as tombstones"""
+        member_id = client.post("/members/", json=sample_member_data).json()["id"]
+        token = client.get("/changes").json()["next_token"]
+
+        client.delete(f"/members/{member_id}")
+
+        data = client.get("/changes", params={"since": token}).json()
+        assert data["members"] == []
+        assert data["deleted"][0]["entity_type"] == "member"
+        assert data["deleted"][0]["entity_id"] == member_id
+
+    def test_admin_deletions_are_reported(self, client, db_session, sample_member_data,
+                                          sample_project_data):
+        """Test that deletions made in the admin write tombstones and touch related rows"""
+        member_id = client.post("/members/", json=sample_member_data).json()["id"]
+        sample_project_data["member_ids"] = [member_id]
+        project_id = client.post("/projects/", json=sample_project_data).json()["id"]
+        token = client.get("/changes").json()["next_token"]
+
+        # What SQLAdmin does to delete a row
+        member = db_session.get(Member, member_id)
+        asyncio.run(MemberAdmin().on_model_delete(member, None))
+        db_session.delete(member)
+        db_session.commit()
+
+        data = client.get("/changes", params={"since": token}).json()
+        assert [(d["entity_type"], d["entity_id"]) for d in data["deleted"]] == [
+            ("member", member_id)
+        ]
+        assert [p["id"] for p in data["projects"]] == [project_id]
+        assert data["projects"][0]["members"] == []
+
+    def test_old_changes_are_skipped(self, client, sample_member_data):
+        """Test that changes before the watermark are not returned"""
+        client.post("/members/", json=sample_member_data)
+        token = base64.urlsafe_b64encode(b"2999-01-01T00:00:00").decode()
+
+        data = client.get("/changes", params={"since": token}).json()
+        assert data["members"] == []
+        assert data["next_token"] == token
+
+    def test_pages_follow_each_other(self, client, sample_member_data):
+        """Test that paging through the feed with a limit returns every change once"""
+        ids = []
+        for i in range(3):
+            data = dict(sample_member_data, email=f"page{i}@example.com", github_username=f"page{i}")
+            ids.append(client.post("/members/", json=data).json()["id"])
+
+        first = client.get("/changes", params={"limit": 2}).json()
+        assert first["has_more"] is True
+        assert [m["id"] for m in first["members"]] == ids[:2]
+
+        second = client.get("/changes", params={"since": first["next_token"], "limit": 2}).json()
+        assert second["has_more"] is False
+        assert [m["id"] for m in second["members"]] == ids[2:]
+
+    def test_expired_token(self, client):
+        """Test that a token older than the kept deletions asks for a full sync"""
+        token = base64.urlsafe_b64encode(b"2000-01-01T00:00:00").decode()
+        response = client.get("/changes", params={"since": token})
+        assert response.status_code == 410
+
+    def test_invalid_token(self, client):
+        """Test that a malformed token is rejected"""
+        response = client.get("/changes", params={"since": "not-a-token"})
+        assert response.status_code == 400
+
+
+class TestBatchGet:
+    """Test fetching several members or projects in one request"""
+
+    def _create_members(self, client, sample_member_data, count):
+        ids = []
+        for i in range(count):
+            data = dict(sample_member_data, email=f"batch{i}@example.com",
+                        github_username=f"batch{i}")
+            ids.append(client.post("/members/", json=data).json()["id"])
+        return ids
+
+    def test_get_members_by_ids_preserves_order(self, client, sample_member_data):
+        """Test that items come back in request order with missing IDs reported"""
+        first, second = self._create_members(client, sample_member_data, 2)
+
+        response = client.get(f"/members?ids={second},999,{first}")
+        assert response.status_code == 200
+
+        data = response.json()
+        assert [m["id"] for m in data["items"]] == [second, first]
+        assert data["missing"] == [999]
+
+    def test_batch_get_members(self, client, sample_member_data):
+        """Test the POST variant for long ID lists"""
+        ids = self._create_members(client, sample_member_data, 3)
+
+        response = client.post("/members/batch-get", json={"ids": ids[::-1]})
+        assert response.status_code == 200
+        assert [m["id"] for m in response.json()["items"]] == ids[::-1]
+
+    def test_batch_get_projects_includes_members(self, client, sample_member_data, sample_project_data):
+        """Test that project lookups embed their members"""
+        member_id = self._create_members(client, sample_member_data, 1)[0]
+        sample_project_data["member_ids"] = [member_id]
+        project_id = client.post("/projects/", json=sample_project_data).json()["id"]
+
+        data = client.get(f"/projects?ids={project_id},{project_id},404").json()
+        assert [p["id"] for p in data["items"]] == [project_id]
+        assert data["items"][0]["members"][0]["id"] == member_id
+        assert data["missing"] == [404]
+
+        data = client.post("/projects/batch-get", json={"ids": [project_id]}).json()
+        assert data["missing"] == []
+
+    def test_invalid_ids(self, client):
+        """Test that malformed or oversized ID lists are rejected"""
+        assert client.get("/members?ids=1,abc").status_code == 422
+        too_many = ",".join(str(i) for i in range(schemas.MAX_BATCH_IDS + 1))
+        assert client.get(f"/projects?ids={too_many}").status_code == 422
+        assert client.post("/members/batch-get", json={"ids": []}).status_code == 422
+
+    def test_list_without_ids_redirects(self, client):
+        """Test that /members without ids still reaches the list route"""
+        response = client.get("/members?limit=5", follow_redirects=False)
+        assert response.status_code == 307
+        assert response.headers["location"].endswith("/members/?limit=5")
+        assert client.get("/projects").json() == []
@@ -0,0 +1,189 @@
+"""
+Test image uploads and media serving.
+"""
+import io
+import threading
+
+import pytest
+
+from app import media
+from app.database import settings
+
+TOKEN = "test-admin-token"
+PIL = pytest.importorskip("PIL.Image")
+
+
+def png_bytes(size=(600, 400), color=(200, 30, 30)):
+    out = io.BytesIO()
+    PIL.new("RGB", size, color).save(out, "PNG")
+    return out.getvalue()
+
+
+@pytest.fixture(autouse=True)
+def media_root(tmp_path, monkeypatch):
+    monkeypatch.setattr(media.storage, "root", str(tmp_path))
+    # Render variants inline so tests can inspect them right away
+    monkeypatch.setattr(media.storage, "schedule_variants", media.storage.render_variants)
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", TOKEN)
+    return tmp_path
+
+
+def upload(client, path, data, name="photo.png", token=TOKEN):
+    return client.post(
+        path, files={"file": (name, data, "image/png")},
+        headers={"Authorization": f"Bearer {token}"}
+    )
+
+
+class TestUpload:
+    """Test uploading images to members and projects"""
+
+    def test_upload_member_image(self, client, sample_member_data):
+        member_id = client.post("/members/", json=sample_member_data).json()["id"]
+
+        response = upload(client, f"/members/{member_id}/images", png_bytes())
+        assert response.status_code == 201
+
+        image = response.json()
+        assert image["content_type"] == "image/png"
+        assert (image["width"], image["height"]) == (600, 400)
+        assert image["url"] == f"/media/{image['digest']}.png"
+        assert client.get(f"/members/{member_id}/images").json() == [image]
+
+    def test_same_content_is_stored_once(self, client, sample_project_data, media_root):
+        project_id = client.post("/projects/", json=sample_project_data).json()["id"]
+        data = png_bytes()
+
+        first = upload(client, f"/projects/{project_id}/images", data).json()
+        second = upload(client, f"/projects/{project_id}/images", data).json()
+
+        assert first["digest"] == second["digest"]
+        assert first["id"] != second["id"]
+        originals = [p for p in media_root.rglob("*.png")]
+        assert len(originals) == 1
+
+    def test_rejects_non_images(self, client, sample_member_data):
+        member_id = client.post("/members/", json=sample_member_data).json()["id"]
+
+        response = upload(client, f"/members/{member_id}/images", b"<svg></svg>", "x.svg")
+        assert response.status_code == 415
+
+    def test_rejects_large_uploads(self, client, sample_member_data, monkeypatch):
+        monkeypatch.setattr(media.settings, "MEDIA_MAX_UPLOAD_BYTES", 100)
+        member_id = client.post("/members/", json=sample_member_data).json()["id"]
+
+        response = upload(client, f"/members/{member_id}/images", png_bytes())
+        assert response.status_code == 413
+
+    def test_requires_admin_token(self, client, sample_member_data, media_root):
+        member_id = client.post("/members/", json=sample_member_data).json()["id"]
+        path = f"/members/{member_id}/images"
+
+        anonymous = client.post(path, files={"file": ("photo.png", png_bytes(), "image/png")})
+
+        assert anonymous.status_code == 401
+        assert upload(client, path, png_bytes(), token="wrong").status_code == 401
+        assert list(media_root.iterdir()) == []
+
+    def test_unknown_owner(self, client):
+        assert upload(client, "/projects/999/images", png_bytes()).status_code == 404
+
+
+class TestDeletion:
+    """Test that images go with the member or project they belong to"""
+
+    def test_deleting_owner_removes_images(self, client, sample_member_data, media_root):
+        member_id = client.post("/members/", json=sample_member_data).json()["id"]
+        upload(client, f"/members/{member_id}/images", png_bytes())
+
+        assert client.delete(f"/members/{member_id}").status_code == 200
+        assert client.get(f"/members/{member_id}/images").json() == []
+        assert [p for p in media_root.rglob("*") if p.is_file()] == []
+
+    def test_shared_files_are_kept(self, client, sample_member_data, sample_project_data,
+                                   media_root):
+        member_id = client.post("/members/", json=sample_member_data).json()["id"]
+        project_id = client.post("/projects/", json=sample_project_data).json()["id"]
+        upload(client, f"/members/{member_id}/images", png_bytes())
+        image = upload(client, f"/projects/{project_id}/images", png_bytes()).json()
+
+        client.delete(f"/members/{member_id}")
+        assert client.get(image["url"]).status_code == 200
+
+
+class TestServing:
+    """Test serving stored images"""
+
+    def _upload(self, client, sample_member_data):
+        member_id = client.post("/members/", json=sample_member_data).json()["id"]
+        return upload(client, f"/members/{member_id}/images", png_bytes()).json()
+
+    def test_original_is_immutable(self, client, sample_member_data):
+        image = self._upload(client, sample_member_data)
+
+        response = client.get(image["url"])
+        assert response.status_code == 200
+        assert response.content == png_bytes()
+        assert response.headers["content-type"] == "image/png"
+        assert "immutable" in response.headers["cache-control"]
+        assert response.headers["etag"] == f'"{image["digest"]}"'
+
+        etag = response.headers["etag"]
+        assert client.get(image["url"], headers={"If-None-Match": etag}).status_code == 304
+
+    def test_thumbnail_variant(self, client, sample_member_data):
+        image = self._upload(client, sample_member_data)
+
+        response = client.get(image["thumbnail_url"])
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "image/webp"
+        assert PIL.open(io.BytesIO(response.content)).size == (256, 171)
+
+    def test_missing_variant_falls_back_to_original(self, client, sample_member_data, monkeypatch):
+        monkeypatch.setattr(media.storage, "schedule_variants", lambda *args: None)
+        image = self._upload(client, sample_member_data)
+
+        response = client.get(image["thumbnail_url"])
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "image/png"
+        assert "immutable" not in response.headers["cache-control"]
+
+    def test_variants_render_once_while_in_flight(self, media_root, monkeypatch):
+        storage = media.MediaStorage(str(media_root), workers=1)
+        release = threading.Event()
+        renders = []
+
+        def render(digest, extension):
+            renders.append(digest)
+            release.wait(5)
+
+        monkeypatch.setattr(storage, "render_variants", render)
+        first = storage.schedule_variants("a" * 64, "png")
+        assert storage.schedule_variants("a" * 64, "png") is first
+        release.set()
+        first.result()
+        storage.shutdown()
+        assert renders == ["a" * 64]
+
+    def test_range_requests(self, client, sample_member_data):
+        image = self._upload(client, sample_member_data)
+        data = png_bytes()
+
+        response = client.get(image["url"], headers={"Range": "bytes=10-19"})
+        assert response.status_code == 206
+        assert response.content == data[10:20]
+        assert response.headers["content-range"] == f"bytes 10-19/{len(data)}"
+
+        response = client.get(image["url"], headers={"Range": "bytes=-5"})
+        assert response.content == data[-5:]
+
+        response = client.get(image["url"], headers={"Range": f"bytes={len(data)}-"})
+        assert response.status_code == 416
+
+        response = client.get(image["url"], headers={"Range": "bytes=0-1", "If-Range": '"stale"'})
+        assert response.status_code == 200
+
+    def test_unknown_media(self, client):
+        assert client.get("/media/not-a-digest.png").status_code == 404
+        assert client.get(f"/media/{'0' * 64}.png").status_code == 404
+        assert client.get(f"/media/{'0' * 64}-thumb.webp").status_code == 404
@@ -0,0 +1,66 @@
+"""
+Test the memory diagnostics.
+"""
+import pytest
+from sqlalchemy import text
+
+import app.crud as crud
+import app.schemas as schemas
+from app import memory
+from app.database import settings
+
+TOKEN = "test-admin-token"
+
+
+@pytest.fixture
+def admin_token(monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", TOKEN)
+    yield {"Authorization": f"Bearer {TOKEN}"}
+    memory.stop()
+
+
+def test_sessions_and_identity_maps_are_counted(db_session):
+    before = memory.session_stats()
+    db_session.execute(text("SELECT 1"))
+    crud.create_member(db_session, schemas.MemberCreate(name="Ada", email="ada@example.com"))
+    # Identity maps are weak, so only referenced objects count
+    members = crud.get_members(db_session)
+
+    stats = memory.session_stats()
+
+    assert stats["live_sessions"] >= 1
+    assert stats["identity_map_objects"] >= before["identity_map_objects"] + 1
+    assert stats["largest_identity_map"] >= len(members)
+
+
+def test_gauges_are_exported(client):
+    body = client.get("/metrics").text
+
+    assert "lamfo_sessions_live" in body
+    assert "lamfo_session_identity_map_objects" in body
+    assert "lamfo_process_resident_memory_bytes" in body
+
+
+def test_snapshot_and_diff(client, admin_token):
+    assert client.get("/debug/memory/diff", headers=admin_token).status_code == 409
+
+    response = client.post("/debug/memory/snapshot", headers=admin_token)
+    assert response.status_code == 200
+    assert response.json()["tracing"] is True
+
+    retained = [bytearray(1024) for _ in range(1000)]
+    report = client.get(
+        "/debug/memory/diff", params={"limit": 5}, headers=admin_token
+    ).json()
+    growth = [t for t in report["top"] if "test_memory.py" in t["site"]]
+    assert growth and growth[0]["size_diff"] >= 1024 * 1000
+    del retained
+
+    assert client.delete("/debug/memory/snapshot", headers=admin_token).status_code == 200
+    assert client.get("/debug/memory", headers=admin_token).json()["tracing"] is False
+
+
+def test_memory_endpoints_require_token(client, monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", TOKEN)
+
+    assert client.get("/debug/memory").status_code == 401
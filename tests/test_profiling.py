@@ -0,0 +1,122 @@
+"""
+Test the sampling profiler and its admin-protected endpoint.
+"""
+import asyncio
+import threading
+import time
+
+import httpx
+import pytest
+
+from app import profiling
+from app.database import settings
+from app.main import app
+
+TOKEN = "test-admin-token"
+
+
+@pytest.fixture
+def admin_token(monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", TOKEN)
+    return {"Authorization": f"Bearer {TOKEN}"}
+
+
+def busy_loop(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_profiler_samples_running_threads():
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_loop, args=(stop,), name="busy-worker")
+    worker.start()
+    profiler = profiling.SamplingProfiler(interval=0.001)
+    profiler.start()
+    time.sleep(0.1)
+    profiler.stop()
+    stop.set()
+    worker.join()
+
+    assert profiler.samples > 0
+    lines = profiler.collapsed().splitlines()
+    busy = [line for line in lines if line.startswith("busy-worker;")]
+    assert busy and all("busy_loop (tests/test_profiling.py" in line for line in busy)
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+
+
+def test_one_profiler_per_process():
+    first = profiling.SamplingProfiler(interval=0.001)
+    assert first.interval == profiling.MIN_INTERVAL_SECONDS
+    first.start()
+    try:
+        with pytest.raises(profiling.ProfilerBusyError):
+            profiling.SamplingProfiler().start()
+    finally:
+        first.stop()
+
+    second = profiling.SamplingProfiler()
+    second.start()
+    second.stop()
+
+
+def test_speedscope_format():
+    profiler = profiling.SamplingProfiler(interval=0.01)
+    profiler.stacks[("main", "a (x.py:1)", "b (x.py:5)")] = 3
+    profiler.stacks[("main", "a (x.py:1)")] = 1
+
+    doc = profiler.speedscope()
+
+    frames = [f["name"] for f in doc["shared"]["frames"]]
+    assert frames == ["main", "a (x.py:1)", "b (x.py:5)"]
+    assert doc["profiles"][0]["samples"] == [[0, 1, 2], [0, 1]]
+    assert doc["profiles"][0]["weights"] == [0.03, 0.01]
+
+
+def test_profile_endpoint_is_disabled_without_token(client, monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "")
+
+    assert client.get("/debug/profile", params={"seconds": 0.01}).status_code == 404
+
+
+def test_profile_endpoint_rejects_bad_token(client, admin_token):
+    response = client.get(
+        "/debug/profile", params={"seconds": 0.01},
+        headers={"Authorization": "Bearer wrong"}
+    )
+    assert response.status_code == 401
+
+
+def test_profile_endpoint(client, admin_token):
+    response = client.get(
+        "/debug/profile", params={"seconds": 0.05, "interval": 0.005}, headers=admin_token
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert int(response.headers["x-profile-samples"]) > 0
+
+    response = client.get(
+        "/debug/profile", params={"seconds": 0.05, "format": "speedscope"}, headers=admin_token
+    )
+    assert response.json()["profiles"][0]["type"] == "sampled"
+
+
+@pytest.mark.asyncio
+async def test_profile_next_requests_to_route(admin_token):
+    async with httpx.AsyncClient(app=app, base_url="http://test") as ac:
+        profile = asyncio.create_task(ac.get(
+            "/debug/profile",
+            params={"seconds": 5, "route": "/health", "requests": 2, "interval": 0.001},
+            headers=admin_token,
+        ))
+        while profiling.session.active is None:
+            await asyncio.sleep(0.01)
+
+        busy = await ac.get("/debug/profile", params={"seconds": 0.01}, headers=admin_token)
+        started = time.perf_counter()
+        await ac.get("/health")
+        await ac.get("/health")
+        response = await profile
+
+    assert busy.status_code == 409
+    assert response.status_code == 200
+    assert time.perf_counter() - started < 5
@@ -0,0 +1,158 @@
+"""
+Test token-bucket rate limiting.
+"""
+import fakeredis
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.ratelimit import (
+    MemoryBucketStore, RateLimitMiddleware, RedisBucketStore, client_key, limited_counter,
+    parse_api_keys
+)
+
+
+def create_limited_app(store, capacity=3, rate=1.0, api_keys=()):
+    limited_app = FastAPI()
+
+    @limited_app.get("/members/")
+    def members():
+        return []
+
+    @limited_app.get("/health")
+    def health():
+        return {"status": "healthy"}
+
+    limited_app.add_middleware(
+        RateLimitMiddleware, store=store, capacity=capacity, rate=rate, api_keys=api_keys
+    )
+    return limited_app
+
+
+@pytest.fixture(params=["memory", "redis"])
+def store(request):
+    if request.param == "memory":
+        return MemoryBucketStore()
+    return RedisBucketStore(fakeredis.FakeRedis())
+
+
+def test_bucket_allows_burst_then_limits(store):
+    states = [store.hit("ip:1.2.3.4", capacity=3, rate=1.0) for _ in range(4)]
+
+    assert [s.allowed for s in states] == [True, True, True, False]
+    assert [s.remaining for s in states] == [2, 1, 0, 0]
+    assert 0 < states[-1].retry_after <= 1
+    assert states[-1].reset <= 3
+
+
+def test_buckets_are_per_client(store):
+    for _ in range(3):
+        store.hit("ip:1.2.3.4", capacity=3, rate=1.0)
+
+    assert not store.hit("ip:1.2.3.4", capacity=3, rate=1.0).allowed
+    assert store.hit("ip:5.6.7.8", capacity=3, rate=1.0).allowed
+
+
+def test_bucket_refills_over_time(monkeypatch):
+    store = MemoryBucketStore()
+    now = [1000.0]
+    monkeypatch.setattr("app.ratelimit.time.monotonic", lambda: now[0])
+    for _ in range(3):
+        store.hit("k", capacity=3, rate=1.0)
+    assert not store.hit("k", capacity=3, rate=1.0).allowed
+
+    now[0] += 2
+    assert store.hit("k", capacity=3, rate=1.0).remaining == 1
+
+
+def test_idle_buckets_are_evicted(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("app.ratelimit.time.monotonic", lambda: now[0])
+    store = MemoryBucketStore(evict_interval=10)
+    store.hit("idle", capacity=3, rate=1.0)
+    now[0] += 5
+    store.hit("active", capacity=3, rate=1.0)
+
+    now[0] += 6
+    store.hit("active", capacity=3, rate=1.0)
+
+    assert len(store) == 1
+
+
+def test_client_key_prefers_known_api_key():
+    scope = {"headers": [(b"x-api-key", b"secret")], "client": ("1.2.3.4", 1234)}
+
+    key = client_key(scope, parse_api_keys("other, secret"))
+
+    assert key.startswith("key:")
+    assert "secret" not in key
+    assert client_key(scope) == "ip:1.2.3.4"
+    assert client_key({"headers": [], "client": ("1.2.3.4", 1234)}) == "ip:1.2.3.4"
+
+
+def test_middleware_sets_headers_and_rejects_with_429():
+    client = TestClient(create_limited_app(MemoryBucketStore(), capacity=2))
+    rejected_before = limited_counter.value()
+
+    first = client.get("/members/")
+    client.get("/members/")
+    rejected = client.get("/members/")
+
+    assert first.status_code == 200
+    assert first.headers["ratelimit-limit"] == "2"
+    assert first.headers["ratelimit-remaining"] == "1"
+    assert rejected.status_code == 429
+    assert rejected.headers["ratelimit-remaining"] == "0"
+    assert int(rejected.headers["retry-after"]) >= 1
+    assert limited_counter.value() == rejected_before + 1
+
+
+def test_middleware_allows_requests_when_redis_is_down():
+    server = fakeredis.FakeServer()
+    server.connected = False
+    client = TestClient(create_limited_app(RedisBucketStore(fakeredis.FakeRedis(server=server))))
+
+    response = client.get("/members/")
+
+    assert response.status_code == 200
+    assert "ratelimit-limit" not in response.headers
+
+
+def test_middleware_ignores_other_paths():
+    client = TestClient(create_limited_app(MemoryBucketStore(), capacity=1))
+
+    responses = [client.get("/health") for _ in range(3)]
+
+    assert all(r.status_code == 200 for r in responses)
+    assert "ratelimit-limit" not in responses[0].headers
+
+
+def test_api_keys_get_separate_buckets():
+    client = TestClient(create_limited_app(
+        MemoryBucketStore(), capacity=1, api_keys=parse_api_keys("a,b")
+    ))
+
+    assert client.get("/members/", headers={"X-API-Key": "a"}).status_code == 200
+    assert client.get("/members/", headers={"X-API-Key": "a"}).status_code == 429
+    assert client.get("/members/", headers={"X-API-Key": "b"}).status_code == 200
+
+
+def test_rotating_unknown_api_keys_are_limited_by_ip():
+    client = TestClient(create_limited_app(
+        MemoryBucketStore(), capacity=3, api_keys=parse_api_keys("known")
+    ))
+
+    statuses = [
+        client.get("/members/", headers={"X-API-Key": f"random-{i}"}).status_code
+        for i in range(20)
+    ]
+
+    assert statuses[:3] == [200, 200, 200]
+    assert set(statuses[3:]) == {429}
+
+
+def test_api_responses_carry_rate_limit_headers(client):
+    response = client.get("/members/")
+
+    assert response.status_code == 200
+    assert "ratelimit-remaining" in response.headers
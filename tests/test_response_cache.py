@@ -0,0 +1,91 @@
+"""
+Test the encoded response cache for list pages.
+"""
+import time
+
+from app.response_cache import ResponseCache, hits, response_cache
+
+
+def test_list_page_served_from_cache(client, sample_project_data):
+    """Test that a repeated list request is served from encoded bytes"""
+    client.post("/projects/", json=sample_project_data)
+    first = client.get("/projects/")
+    before = hits.value(route="projects")
+    second = client.get("/projects/")
+
+    assert second.status_code == 200
+    assert second.content == first.content
+    assert second.headers["content-type"] == "application/json"
+    assert second.headers["ETag"] == first.headers["ETag"]
+    assert hits.value(route="projects") - before == 1
+
+
+def test_if_none_match_returns_304(client, sample_member_data):
+    """Test conditional requests against the cached ETag"""
+    client.post("/members/", json=sample_member_data)
+    etag = client.get("/members/").headers["ETag"]
+
+    response = client.get("/members/", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+
+
+def test_writes_bump_the_data_version(client, sample_project_data):
+    """Test that a write makes cached pages unreachable"""
+    client.post("/projects/", json=sample_project_data)
+    etag = client.get("/projects/").headers["ETag"]
+    version = response_cache.version
+
+    client.post("/projects/", json=sample_project_data)
+    response = client.get("/projects/", headers={"If-None-Match": etag})
+
+    assert response_cache.version > version
+    assert response.status_code == 200
+    assert len(response.json()) == 2
+
+
+def test_query_params_are_part_of_the_key(client, sample_project_data):
+    """Test that different pages are cached separately"""
+    for i in range(3):
+        sample_project_data["title"] = f"Project {i}"
+        client.post("/projects/", json=sample_project_data)
+
+    assert len(client.get("/projects/", params={"limit": 1}).json()) == 1
+    assert len(client.get("/projects/", params={"limit": 2}).json()) == 2
+
+
+def test_lru_eviction_keeps_cache_bounded():
+    """Test that the memory cap evicts least recently used pages"""
+    cache = ResponseCache(max_bytes=10)
+    first = cache.key("projects", {"skip": 0})
+    second = cache.key("projects", {"skip": 1})
+    cache.put(first, b"123456")
+    cache.put(second, b"123456")
+
+    assert cache.get(first) is None
+    assert cache.get(second).body == b"123456"
+    assert cache.size == 6
+
+
+def test_stale_build_is_not_stored():
+    """Test that a page built before a write is not cached under the old key"""
+    cache = ResponseCache()
+    key = cache.key("projects", {})
+    cache.bump_version()
+    cache.put(key, b"[]")
+    assert cache.get(key) is None
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    """Test that pages are rebuilt after the TTL even without a local write"""
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    cache = ResponseCache(ttl=300)
+    key = cache.key("projects", {})
+    cache.put(key, b"[]")
+
+    now[0] += 299
+    assert cache.get(key).body == b"[]"
+    now[0] += 1
+    assert cache.get(key) is None
+    assert cache.size == 0
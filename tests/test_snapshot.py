@@ -0,0 +1,96 @@
+"""
+Test the static snapshot export.
+"""
+import gzip
+import json
+import os
+from datetime import datetime
+
+import pytest
+
+from app import crud, schemas
+from app.models import Member, Project
+from app.snapshot import export_snapshot
+
+
+@pytest.fixture
+def old_catalogue(db_session):
+    """Members and projects last changed long before any snapshot"""
+    created_at = datetime(2020, 1, 1)
+    members = [
+        Member(name=f"User {i}", email=f"user{i}@example.com", created_at=created_at)
+        for i in range(3)
+    ]
+    project = Project(title="Project", members=members[:2], created_at=created_at)
+    other_project = Project(title="Other Project", created_at=created_at)
+    db_session.add_all(members + [project, other_project])
+    db_session.commit()
+    return members, project, other_project
+
+
+def read_json(output_dir, name):
+    with open(os.path.join(output_dir, name)) as f:
+        return json.load(f)
+
+
+def test_full_export(db_session, old_catalogue, tmp_path):
+    """Test that every public route is rendered with a gzip copy"""
+    members, project, _ = old_catalogue
+    counts = export_snapshot(db_session, str(tmp_path))
+
+    assert counts["written"] == 7
+    assert read_json(tmp_path, f"members/{members[0].id}.json")["email"] == "user0@example.com"
+    assert len(read_json(tmp_path, f"projects/{project.id}.json")["members"]) == 2
+    assert [m["id"] for m in read_json(tmp_path, "members/index.json")] == [
+        m.id for m in members
+    ]
+    with gzip.open(tmp_path / "projects" / "index.json.gz") as f:
+        assert len(json.load(f)) == 2
+
+    manifest = read_json(tmp_path, "manifest.json")
+    assert manifest["generated_at"]
+    assert manifest["files"]["members/index.json"]["etag"]
+
+
+def test_incremental_export_only_renders_changes(db_session, old_catalogue, tmp_path):
+    """Test that a second run re-renders only changed entities"""
+    members, project, other_project = old_catalogue
+    export_snapshot(db_session, str(tmp_path))
+
+    crud.update_member(db_session, members[0].id, schemas.MemberUpdate(name="Renamed"))
+    counts = export_snapshot(db_session, str(tmp_path))
+
+    # The member, the project embedding its summary and both list pages
+    assert counts == {"written": 4, "removed": 0}
+    project_members = read_json(tmp_path, f"projects/{project.id}.json")["members"]
+    assert "Renamed" in [m["name"] for m in project_members]
+
+    assert export_snapshot(db_session, str(tmp_path)) == {"written": 0, "removed": 0}
+
+
+def test_incremental_export_removes_deleted(db_session, old_catalogue, tmp_path):
+    """Test that deleted entities are removed from the snapshot"""
+    _, _, other_project = old_catalogue
+    export_snapshot(db_session, str(tmp_path))
+
+    crud.delete_project(db_session, other_project.id)
+    counts = export_snapshot(db_session, str(tmp_path))
+
+    assert counts["removed"] == 1
+    assert not os.path.exists(tmp_path / "projects" / f"{other_project.id}.json")
+    assert not os.path.exists(tmp_path / "projects" / f"{other_project.id}.json.gz")
+    assert f"projects/{other_project.id}.json" not in read_json(tmp_path, "manifest.json")["files"]
+
+
+def test_project_list_leaves_out_archived(db_session, old_catalogue, tmp_path):
+    """Test that the exported list matches GET /projects/ without include_archived"""
+    _, project, other_project = old_catalogue
+    completed = crud.create_project(
+        db_session, schemas.ProjectCreate(title="Done", status="completed")
+    )
+    export_snapshot(db_session, str(tmp_path))
+
+    assert [p["id"] for p in read_json(tmp_path, "projects/index.json")] == [
+        project.id, other_project.id
+    ]
+    assert read_json(tmp_path, f"projects/{completed.id}.json")["status"] == "completed"